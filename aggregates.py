@@ -0,0 +1,115 @@
+# aggregates.py
+"""
+Materialized dashboard aggregates for a user's portfolios.
+
+Totals, per-portfolio values and position counts, and each symbol's value
+across all portfolios are built once from the holdings and then kept
+current from position deltas: every Portfolio.add_stock/remove_stock (and
+so every Transaction.execute) reports the change in one position's value,
+which is applied here in O(1). Dashboards read these numbers instead of
+re-aggregating every position on each render.
+"""
+import heapq
+
+import numpy as np
+
+
+class PortfolioAggregates:
+    def __init__(self):
+        self.total_value = 0.0
+        self.total_positions = 0
+        self.portfolio_values = {}     # portfolio name -> value
+        self.portfolio_positions = {}  # portfolio name -> number of positions
+        self.exposure = {}             # symbol -> value across portfolios
+        self.holders = {}              # symbol -> number of portfolios holding it
+        self.source = None             # the {name: Portfolio} dict this describes
+        self._top = None
+
+    @classmethod
+    def build(cls, portfolios):
+        """Aggregate a {name: Portfolio} mapping from scratch"""
+        agg = cls()
+        agg.source = portfolios
+        for name, portfolio in portfolios.items():
+            values = portfolio.position_values()
+            agg.portfolio_values[name] = float(values.sum())
+            agg.portfolio_positions[name] = len(values)
+            for symbol, value in zip(portfolio.symbols(), values.tolist()):
+                agg.exposure[symbol] = agg.exposure.get(symbol, 0.0) + value
+                agg.holders[symbol] = agg.holders.get(symbol, 0) + 1
+        agg.total_value = float(sum(agg.portfolio_values.values()))
+        agg.total_positions = sum(agg.portfolio_positions.values())
+        return agg
+
+    def copy(self):
+        clone = PortfolioAggregates()
+        clone.total_value = self.total_value
+        clone.total_positions = self.total_positions
+        clone.portfolio_values = dict(self.portfolio_values)
+        clone.portfolio_positions = dict(self.portfolio_positions)
+        clone.exposure = dict(self.exposure)
+        clone.holders = dict(self.holders)
+        clone.source = self.source
+        clone._top = self._top
+        return clone
+
+    def add_portfolio(self, name):
+        self.portfolio_values.setdefault(name, 0.0)
+        self.portfolio_positions.setdefault(name, 0)
+
+    def apply(self, portfolio_name, symbol, d_value, d_positions):
+        """Apply one position change: its value moved by d_value, and it
+        opened (d_positions=1), closed (-1) or was resized (0)."""
+        self.total_value += d_value
+        self.total_positions += d_positions
+        self.portfolio_values[portfolio_name] = self.portfolio_values.get(portfolio_name, 0.0) + d_value
+        positions = self.portfolio_positions.get(portfolio_name, 0) + d_positions
+        self.portfolio_positions[portfolio_name] = positions
+        if not positions:
+            # don't let float drift leave an empty portfolio worth 1e-13
+            self.portfolio_values[portfolio_name] = 0.0
+        holders = self.holders.get(symbol, 0) + d_positions
+        if holders > 0:
+            self.holders[symbol] = holders
+            self.exposure[symbol] = self.exposure.get(symbol, 0.0) + d_value
+        else:
+            self.holders.pop(symbol, None)
+            self.exposure.pop(symbol, None)
+        self._top = None
+
+    def apply_all(self, deltas):
+        for delta in deltas:
+            self.apply(*delta)
+
+    def top_holdings(self, n=10):
+        """The n symbols with the largest value across portfolios, as [(symbol, value)]"""
+        if self._top is None or len(self._top) < min(n, len(self.exposure)):
+            self._top = heapq.nlargest(max(n, 10), self.exposure.items(), key=lambda kv: kv[1])
+        return self._top[:n]
+
+    def unique_symbols(self):
+        return len(self.exposure)
+
+    def average_position(self):
+        return self.total_value / self.total_positions if self.total_positions else 0.0
+
+    def portfolio_rows(self):
+        """[{'name', 'value', 'positions'}] per portfolio, in dict order"""
+        return [
+            {'name': name, 'value': value, 'positions': self.portfolio_positions.get(name, 0)}
+            for name, value in self.portfolio_values.items()
+        ]
+
+
+def exposure_matrix(portfolios):
+    """Portfolio x symbol value matrix as (portfolio names, symbols, 2-D float array)"""
+    names = list(portfolios)
+    columns = {}
+    for portfolio in portfolios.values():
+        for symbol in portfolio.symbols():
+            columns.setdefault(symbol, len(columns))
+    matrix = np.zeros((len(names), len(columns)))
+    for i, portfolio in enumerate(portfolios.values()):
+        cols = [columns[s] for s in portfolio.symbols()]
+        matrix[i, cols] = portfolio.position_values()
+    return names, list(columns), matrix
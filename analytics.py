@@ -0,0 +1,328 @@
+# analytics.py
+"""
+Risk and performance metrics for the current holdings.
+
+Metrics describe the portfolio as it stands: today's quantities applied to
+the stored price history (history_store), i.e. the returns the current
+positions would have had over the period. Closes are aligned across symbols
+and with the ^GSPC benchmark as of each bar (valuation.close_asof).
+
+Returns feed a RollingWindow over the period's completed bars that keeps
+running sums. Sliding it by one bar costs O(1) for volatility, Sharpe,
+Sortino and beta; the historical VaR quantile comes from a sorted copy of
+the window, where finding a return's slot is a binary search but inserting
+and deleting shift the list, O(n) (a memmove, cheap at a year of bars).
+Drawdown is one vectorized pass over the window's values. States are cached
+per (user, portfolio, period, interval): while the holdings are unchanged,
+new bars are pushed into the existing window instead of rebuilding it.
+Within market_cache.ttl_for the cached metrics are returned without touching
+the price store at all, so they are as of their last computation: hhi,
+diversification and effective_positions (from position values) do not
+follow price moves until the TTL expires. With fetch=False (page renders)
+only stored bars are read, and anything missing or stale is fetched by a
+background thread for a later call.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+import numpy as np
+
+import history_store
+import valuation
+
+BENCHMARK = "^GSPC"
+RISK_FREE_RATE = 0.04     # annual, for Sharpe/Sortino
+VAR_LEVEL = 0.95
+# Annualized volatility that scores 10/10 on the risk score
+FULL_RISK_VOLATILITY = 0.50
+MAX_STATES = 128
+PERIODS_PER_YEAR = {"1d": 252, "5d": 50.4, "1wk": 52, "1mo": 12, "3mo": 4}
+
+_lock = threading.Lock()
+_states = OrderedDict()  # (user, portfolio name or None, period, interval) -> _State
+_pending = set()  # (symbols, period, interval) being refreshed in the background
+
+
+def periods_per_year(interval):
+    """Bars per year at an interval (intraday bars over a 6.5h session)"""
+    if interval in PERIODS_PER_YEAR:
+        return PERIODS_PER_YEAR[interval]
+    return 252 * 6.5 * 3600 / history_store.INTERVAL_SECONDS.get(interval, history_store.DAY)
+
+
+class RollingWindow:
+    """The last `size` bar returns (with benchmark returns and values) and
+    running sums over them. Pushing a bar is O(1) for the sums plus an O(n)
+    update of the sorted returns (bisect, then a list insert and delete)."""
+
+    def __init__(self, size):
+        self.size = max(int(size), 2)
+        self.count = 0
+        self._pos = 0
+        self._pushes = 0
+        self._r = np.zeros(self.size)
+        self._m = np.zeros(self.size)
+        self._v = np.zeros(self.size)
+        self._sorted = []
+        self._sums = [0.0] * 6  # r, r^2, min(r, 0)^2, m, m^2, r*m
+
+    def _add(self, r, m, sign):
+        down = min(r, 0.0)
+        for i, x in enumerate((r, r * r, down * down, m, m * m, r * m)):
+            self._sums[i] += sign * x
+
+    def push(self, r, m, value):
+        """Add one bar: portfolio return r, benchmark return m, value at its close"""
+        if self.count == self.size:
+            old = self._r[self._pos]
+            self._add(old, self._m[self._pos], -1)
+            del self._sorted[bisect_left(self._sorted, old)]
+        else:
+            self.count += 1
+        self._r[self._pos], self._m[self._pos], self._v[self._pos] = r, m, value
+        self._add(r, m, 1)
+        insort(self._sorted, r)
+        self._pos = (self._pos + 1) % self.size
+        self._pushes += 1
+        if self._pushes % self.size == 0:
+            # Re-add from the buffers now and then so subtraction error can't build up
+            self._sums = [0.0] * 6
+            for r, m in zip(self._ordered(self._r).tolist(), self._ordered(self._m).tolist()):
+                self._add(r, m, 1)
+
+    def _ordered(self, buffer):
+        if self.count < self.size:
+            return buffer[:self.count]
+        return np.concatenate([buffer[self._pos:], buffer[:self._pos]])
+
+    def mean(self):
+        return self._sums[0] / self.count if self.count else 0.0
+
+    def variance(self, which=0):
+        """Sample variance of the returns (which=0) or benchmark returns (which=3)"""
+        n = self.count
+        if n < 2:
+            return 0.0
+        total, squares = self._sums[which], self._sums[which + 1]
+        return max(squares - total * total / n, 0.0) / (n - 1)
+
+    def downside_deviation(self):
+        return math.sqrt(self._sums[2] / self.count) if self.count else 0.0
+
+    def beta(self):
+        n = self.count
+        market = self.variance(3)
+        if n < 2 or market <= 0:
+            return None
+        covariance = (self._sums[5] - self._sums[0] * self._sums[3] / n) / (n - 1)
+        return covariance / market
+
+    def quantile(self, q):
+        """Linear-interpolated quantile of the window's returns"""
+        if not self._sorted:
+            return 0.0
+        pos = q * (len(self._sorted) - 1)
+        lo = int(pos)
+        hi = min(lo + 1, len(self._sorted) - 1)
+        return self._sorted[lo] + (self._sorted[hi] - self._sorted[lo]) * (pos - lo)
+
+    def values(self):
+        return self._ordered(self._v)
+
+
+class _State:
+    # `lock` serializes pushes into one state's window; _lock only guards _states
+    __slots__ = ('quantities', 'window', 'last_ts', 'checked_at', 'result', 'lock')
+
+    def __init__(self, quantities, window, last_ts):
+        self.quantities = quantities
+        self.window = window
+        self.last_ts = last_ts
+        self.checked_at = 0.0
+        self.result = None
+        self.lock = threading.Lock()
+
+
+def _bar_values(quantities, bars, benchmark, start):
+    """(timestamps, portfolio value, benchmark close) from start on, for bars
+    where every held symbol has a price"""
+    stamps = valuation.union_timeline(bars, start)
+    value = np.zeros(len(stamps))
+    missing = np.zeros(len(stamps), dtype=bool)
+    for symbol, series in bars.items():
+        close = valuation.close_asof(series, stamps)
+        missing |= np.isnan(close)
+        value += quantities[symbol] * np.nan_to_num(close)
+    if benchmark is not None and len(benchmark):
+        bench = valuation.close_asof(benchmark, stamps)
+    else:
+        bench = np.full(len(stamps), np.nan)
+    keep = ~missing
+    return stamps[keep], value[keep], bench[keep]
+
+
+def _returns(values):
+    previous = values[:-1]
+    return np.divide(values[1:] - previous, previous, out=np.zeros(len(previous)), where=previous != 0)
+
+
+def _concentration(values):
+    """(Herfindahl index, diversification 0..1, effective number of positions)"""
+    weights = np.array([v for v in values if v > 0], dtype=float)
+    if not len(weights):
+        return None, 0.0, 0.0
+    weights /= weights.sum()
+    hhi = float(np.dot(weights, weights))
+    diversification = (1 - hhi) / (1 - 1 / len(weights)) if len(weights) > 1 else 0.0
+    return hhi, diversification, 1 / hhi
+
+
+def _summary(window, interval, position_values):
+    hhi, diversification, effective = _concentration(position_values.values())
+    result = {
+        'observations': window.count if window else 0,
+        'volatility': None, 'sharpe': None, 'sortino': None, 'beta': None,
+        'max_drawdown': None, 'var': None, 'var_value': None,
+        'growth': None, 'risk_score': None,
+        'hhi': hhi, 'diversification': diversification, 'effective_positions': effective,
+    }
+    if window is None or window.count < 2:
+        return result
+
+    ppy = periods_per_year(interval)
+    annual_return = window.mean() * ppy
+    volatility = math.sqrt(window.variance() * ppy)
+    downside = window.downside_deviation() * math.sqrt(ppy)
+    values = window.values()
+    peaks = np.maximum.accumulate(values)
+    var = -window.quantile(1 - VAR_LEVEL)
+    result.update({
+        'volatility': volatility,
+        'sharpe': (annual_return - RISK_FREE_RATE) / volatility if volatility else None,
+        'sortino': (annual_return - RISK_FREE_RATE) / downside if downside else None,
+        'beta': window.beta(),
+        'max_drawdown': float(np.min(values / peaks - 1)) if len(values) else None,
+        'var': var,
+        'var_value': var * float(values[-1]),
+        'growth': float(values[-1] / values[0] - 1) if values[0] else None,
+        'risk_score': round(10 * min(1.0, volatility / FULL_RISK_VOLATILITY), 1),
+    })
+    return result
+
+
+def _refresh_later(symbols, period, interval):
+    """history_store.refresh on a daemon thread, one at a time per request"""
+    key = (tuple(symbols), period, interval)
+    with _lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+
+    def run():
+        try:
+            history_store.refresh(list(symbols), period, interval)
+        except Exception as e:
+            print(f"Background history refresh failed: {e}")
+        finally:
+            with _lock:
+                _pending.discard(key)
+
+    threading.Thread(target=run, name="analytics-history", daemon=True).start()
+
+
+def _metrics(key, quantities, position_values, period, interval, fetch=True):
+    with _lock:
+        state = _states.get(key)
+    now = time.time()
+    import market_cache
+    if state is not None and state.quantities == quantities and now - state.checked_at < market_cache.ttl_for(interval):
+        return state.result
+
+    symbols = sorted(s for s, q in quantities.items() if q)
+    if not symbols:
+        return _summary(None, interval, position_values)
+    if fetch:
+        history_store.refresh(symbols + [BENCHMARK], period, interval)
+    else:
+        _refresh_later(symbols + [BENCHMARK], period, interval)
+    bars = {s: history_store.read_array(s, interval) for s in symbols}
+    benchmark = history_store.read_array(BENCHMARK, interval)
+    if not fetch and (not len(benchmark) or not all(len(series) for series in bars.values())):
+        # Not stored yet: a partial window would be cached as the holdings'
+        # metrics, so report none until the background refresh has them
+        return _summary(None, interval, position_values)
+    bars = {s: series for s, series in bars.items() if len(series)}
+    if not bars:
+        return _summary(None, interval, position_values)
+
+    # Re-read: another session may have advanced the state meanwhile
+    with _lock:
+        state = _states.get(key)
+    if state is None or state.quantities != quantities:
+        # Not shared until stored below, so no other thread can push into it
+        state = _State(quantities, None, None)
+
+    with state.lock:
+        if state.window is None:
+            span = history_store.PERIOD_SECONDS.get(period)
+            latest = max(int(series['ts'][-1]) for series in bars.values())
+            stamps, values, bench = _bar_values(quantities, bars, benchmark, latest - span if span else None)
+            state.window = RollingWindow(len(stamps) - 2)
+        else:
+            # Only bars after the last one pushed (which is recomputed as their base)
+            stamps, values, bench = _bar_values(quantities, bars, benchmark, state.last_ts)
+
+        # The newest bar may still be forming; only completed bars enter the window
+        stamps, values, bench = stamps[:-1], values[:-1], bench[:-1]
+        if len(stamps) >= 2:
+            returns = _returns(values)
+            market = np.nan_to_num(_returns(bench))
+            for r, m, v in zip(returns.tolist(), market.tolist(), values[1:].tolist()):
+                state.window.push(r, m, v)
+            state.last_ts = int(stamps[-1])
+
+        state.checked_at = now
+        result = state.result = _summary(state.window, interval, position_values)
+
+    with _lock:
+        _states[key] = state
+        _states.move_to_end(key)
+        while len(_states) > MAX_STATES:
+            _states.popitem(last=False)
+    return result
+
+
+def portfolio_metrics(username, portfolio, period="1y", interval="1d", fetch=True):
+    """Risk metrics of one portfolio's current holdings (see module docstring).
+
+    Returns a dict with volatility (annualized), sharpe, sortino, beta (vs
+    ^GSPC), max_drawdown (<= 0), var (one-bar 95% historical VaR as a
+    fraction) and var_value, growth over the period, risk_score (0-10),
+    hhi, diversification (0-1) and effective_positions. Return-based
+    entries are None without enough price history. With fetch=False the
+    price store is not refreshed first (see module docstring).
+    """
+    quantities = {s: h.quantity for s, h in portfolio.stocks.items()}
+    values = dict(zip(portfolio.symbols(), portfolio.position_values().tolist()))
+    return _metrics((username, portfolio.name, period, interval), quantities, values, period, interval, fetch)
+
+
+def combined_metrics(username, portfolios, period="1y", interval="1d", fetch=True):
+    """portfolio_metrics for all of a user's portfolios held as one"""
+    quantities, values = {}, {}
+    for portfolio in portfolios.values():
+        for symbol, holding in portfolio.stocks.items():
+            quantities[symbol] = quantities.get(symbol, 0) + holding.quantity
+        for symbol, value in zip(portfolio.symbols(), portfolio.position_values().tolist()):
+            values[symbol] = values.get(symbol, 0.0) + value
+    return _metrics((username, None, period, interval), quantities, values, period, interval, fetch)
+
+
+def invalidate(username=None):
+    """Drop cached states (all of them, or one user's)"""
+    with _lock:
+        for key in [k for k in _states if username is None or k[0] == username]:
+            del _states[key]
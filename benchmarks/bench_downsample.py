@@ -0,0 +1,67 @@
+# benchmarks/bench_downsample.py
+"""
+Chart downsampling: time and Plotly payload, full series vs downsampled.
+
+    python benchmarks/bench_downsample.py [--bars 10000 100000 500000] [--width 1200]
+
+For each length, a random-walk series of 1-minute bars is reduced with LTTB
+(line) and OHLC bucketing (candles) to the chart width, and the Plotly
+figure JSON for the full and the reduced series is compared.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bars", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--width", type=int, default=1200)
+    args = parser.parse_args()
+
+    import numpy as np
+    import pandas as pd
+    import plotly.graph_objects as go
+
+    import chart_cache
+    import downsample
+
+    print(f"{'bars':>9} {'kind':<7} {'points':>7} {'reduce ms':>10} {'cached ms':>10} {'full KB':>9} {'reduced KB':>11}")
+    rng = np.random.default_rng(0)
+    for n in args.bars:
+        index = pd.date_range("2024-01-02 14:30", periods=n, freq="min", tz="UTC")
+        close = 100 * np.exp(np.cumsum(rng.standard_normal(n) * 0.001))
+        spread = np.abs(rng.standard_normal((2, n))) * 0.001 * close
+        frame = pd.DataFrame({'Open': np.r_[close[0], close[:-1]], 'High': close + spread[0],
+                              'Low': close - spread[1], 'Close': close,
+                              'Volume': rng.integers(100, 10_000, n).astype(float)}, index=index)
+
+        for kind in ("line", "ohlc"):
+            reduce = downsample.line if kind == "line" else downsample.ohlc
+            source = frame['Close'] if kind == "line" else frame
+            key = (f"BENCH{n}", "1m")
+            downsample.invalidate(key[0])
+            start = time.perf_counter()
+            reduced = reduce(source, args.width, key=key)
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            reduce(source, args.width, key=key)
+            cached = time.perf_counter() - start
+
+            def figure(data):
+                if kind == "line":
+                    return go.Figure(go.Scatter(x=data.index, y=data.to_numpy(), mode='lines'))
+                return go.Figure(go.Candlestick(x=data.index, open=data['Open'], high=data['High'],
+                                                low=data['Low'], close=data['Close']))
+
+            full_kb = len(chart_cache.figure_json(figure(source))) / 1024
+            reduced_kb = len(chart_cache.figure_json(figure(reduced))) / 1024
+            print(f"{n:>9,} {kind:<7} {len(reduced):>7,} {first * 1e3:>10.1f} {cached * 1e3:>10.2f} "
+                  f"{full_kb:>9,.0f} {reduced_kb:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
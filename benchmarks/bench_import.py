@@ -0,0 +1,110 @@
+# benchmarks/bench_import.py
+"""
+Throughput of the bulk trade importer (importer.py).
+
+    python benchmarks/bench_import.py [--rows 1000000] [--format csv|ofx] [--chunksize 100000]
+
+Writes a synthetic broker export of --rows fills (buys with periodic partial
+sells across 500 symbols and 3 accounts) to a temporary directory, imports it
+into a fresh database and reports rows/sec and the ledger size. With --trace
+the peak of Python/NumPy allocations during the import is reported too (it
+stays flat as --rows grows since the file is streamed; tracing slows the
+import several times over). Peak RSS also counts the SQLite pages mapped by
+db_pool's mmap_size, so it grows with the database.
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYMBOLS = 500
+ACCOUNTS = ("Brokerage", "IRA", "Roth IRA")
+WRITE_BATCH = 50_000
+
+
+def fills(rows):
+    """Synthetic fills as DataFrames of up to WRITE_BATCH rows, oldest first"""
+    start = pd.Timestamp("2015-01-02 14:30:00")
+    for lo in range(0, rows, WRITE_BATCH):
+        i = np.arange(lo, min(rows, lo + WRITE_BATCH))
+        # every symbol is bought 3 times (10 shares) then partly sold (5)
+        sell = (i // (SYMBOLS * len(ACCOUNTS))) % 4 == 3
+        yield pd.DataFrame({
+            "Date": (start + pd.to_timedelta(i * 7, unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+            "Account": np.array(ACCOUNTS)[i % len(ACCOUNTS)],
+            "Symbol": np.char.add("SYM", ((i // len(ACCOUNTS)) % SYMBOLS).astype(str)),
+            "Action": np.where(sell, "SELL", "BUY"),
+            "Quantity": np.where(sell, 5, 10),
+            "Price": np.round(50 + (i % 997) * 0.13, 2),
+        })
+
+
+def write_csv(path, rows):
+    header = True
+    for frame in fills(rows):
+        frame.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
+
+
+def write_ofx(path, rows):
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><INVSTMTMSGSRSV1><INVSTMTTRNRS><INVSTMTRS>"
+                 "<INVACCTFROM><BROKERID>bench<ACCTID>Brokerage</INVACCTFROM><INVTRANLIST>\n")
+        for frame in fills(rows):
+            dates = pd.to_datetime(frame["Date"]).dt.strftime("%Y%m%d%H%M%S").tolist()
+            for date, symbol, action, qty, price in zip(dates, frame["Symbol"], frame["Action"],
+                                                        frame["Quantity"], frame["Price"]):
+                kind, body = ("BUYSTOCK", "INVBUY") if action == "BUY" else ("SELLSTOCK", "INVSELL")
+                units = qty if action == "BUY" else -qty
+                fh.write(f"<{kind}><{body}><INVTRAN><FITID>x<DTTRADE>{date}</INVTRAN><SECID><UNIQUEID>{symbol}"
+                         f"<UNIQUEIDTYPE>TICKER</SECID><UNITS>{units}<UNITPRICE>{price}</{body}></{kind}>\n")
+        fh.write("</INVTRANLIST></INVSTMTRS></INVSTMTTRNRS></INVSTMTMSGSRSV1></OFX>\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=("csv", "ofx"), default="csv")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--trace", action="store_true", help="report peak traced allocations (slow)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        import database
+        import importer
+
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        path = os.path.join(tmp, f"fills.{args.format}")
+        start = time.perf_counter()
+        (write_ofx if args.format == "ofx" else write_csv)(path, args.rows)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"wrote {args.rows:,} fills ({size_mb:,.1f} MB {args.format}) in {time.perf_counter() - start:.1f}s")
+
+        if args.trace:
+            tracemalloc.start()
+        stats = importer.import_file(path, "bench", chunksize=args.chunksize)
+        traced = tracemalloc.get_traced_memory()[1] if args.trace else None
+        tracemalloc.stop()
+        with database._pool().connection() as conn:
+            ledger = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            holdings = conn.execute("SELECT COUNT(*) FROM holdings").fetchone()[0]
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"imported {stats['imported']:,} rows ({stats['rejected']:,} rejected) in {stats['seconds']:.2f}s "
+          f"-> {stats['rows_per_sec']:,.0f} rows/s")
+    print(f"ledger rows {ledger:,}, holdings {holdings:,}, peak RSS {peak_mb:,.0f} MB")
+    if traced is not None:
+        print(f"peak traced allocations during import {traced / 2**20:,.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_load_portfolios.py
+"""
+Compare the bulk portfolio loader against the previous N+1 loader.
+
+    python benchmarks/bench_load_portfolios.py [--repeat 5]
+
+Each size is loaded from a fresh temporary database; holdings are spread
+across up to 500 portfolios so the N+1 cost is visible.
+"""
+import argparse
+import gc
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from portfolio import Portfolio  # noqa: E402
+from stock import Stock  # noqa: E402
+
+SIZES = (10, 1_000, 100_000)
+USER = "bench"
+
+
+def legacy_load_portfolios(username):
+    """The loader as it was before: one holdings query per portfolio"""
+    conn = sqlite3.connect(database.DB_FILE)
+    cursor = conn.cursor()
+    user_id = database._get_or_create_user_id(conn, username)
+    cursor.execute('SELECT id, name FROM portfolios WHERE user_id = ?', (user_id,))
+    rows = cursor.fetchall()
+    portfolios = []
+    for pid, name in rows:
+        p = Portfolio(name)
+        cursor.execute('SELECT symbol, quantity, price FROM holdings WHERE portfolio_id = ?', (pid,))
+        for sym, qty, price in cursor.fetchall():
+            p.add_stock(Stock(sym, "Saved Stock", float(price)), int(qty))
+        portfolios.append(p)
+    conn.close()
+    return portfolios
+
+
+def populate(holdings):
+    n_portfolios = min(500, holdings)
+    with database._pool().transaction() as conn:
+        user_id = database._get_or_create_user_id(conn, USER)
+        conn.executemany(
+            'INSERT INTO portfolios (user_id, name) VALUES (?, ?)',
+            [(user_id, f"P{i}") for i in range(n_portfolios)]
+        )
+        ids = [r[0] for r in conn.execute('SELECT id FROM portfolios WHERE user_id = ?', (user_id,))]
+        conn.executemany(
+            'INSERT INTO holdings (portfolio_id, symbol, quantity, price) VALUES (?, ?, ?, ?)',
+            ((ids[i % n_portfolios], f"S{i}", 10, 100.0 + i % 50) for i in range(holdings))
+        )
+    return n_portfolios
+
+
+def best_of(loaders, repeat):
+    """Best wall time of each loader over `repeat` rounds, plus the number of
+    holdings it loaded. Loaders alternate within a round so drift in machine
+    load hits them alike."""
+    best = [float("inf")] * len(loaders)
+    counts = [0] * len(loaders)
+    for _ in range(repeat):
+        for i, fn in enumerate(loaders):
+            # Drop the previous result first so both loaders see the same heap,
+            # and keep the collector out of the timed region (as timeit does)
+            result = None
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                result = fn(USER)
+                best[i] = min(best[i], time.perf_counter() - start)
+            finally:
+                gc.enable()
+            counts[i] = sum(len(p.stocks) for p in result)
+    return best, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'holdings':>10} {'portfolios':>10} {'legacy ms':>10} {'bulk ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_FILE = os.path.join(tmp, "bench.db")
+            database.init_database()
+            n_portfolios = populate(size)
+
+            (legacy, bulk), (legacy_count, bulk_count) = best_of(
+                (legacy_load_portfolios, database.load_portfolios), args.repeat)
+            assert legacy_count == bulk_count == size
+
+            print(f"{size:>10,} {n_portfolios:>10} {legacy * 1000:>10.2f} {bulk * 1000:>10.2f} {legacy / bulk:>7.2f}x")
+            database._pool().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_memory.py
+"""
+Memory held by a session's portfolios: dict-based holdings vs slotted ones.
+
+    python benchmarks/bench_memory.py [--positions 1000000] [--portfolios 1000]
+
+Each variant runs in a fresh interpreter and reports the growth in resident
+set size (and in traced Python allocations) from building the portfolios,
+i.e. what one Streamlit session keeps alive in st.session_state.pm.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class LegacyStock:
+    """stock.Stock as it was before: a plain, dict-backed object"""
+
+    def __init__(self, symbol, name, price):
+        self.symbol = symbol
+        self.name = name
+        self.price = price
+
+
+class LegacyPortfolio:
+    """Holdings stored as {'stock': ..., 'quantity': ...} dicts"""
+
+    def __init__(self, name):
+        self.name = name
+        self.stocks = {}
+
+    def add_stock(self, stock, quantity):
+        if stock.symbol in self.stocks:
+            self.stocks[stock.symbol]['quantity'] += quantity
+        else:
+            self.stocks[stock.symbol] = {'stock': stock, 'quantity': quantity}
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is a peak, in KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def build(variant, positions, n_portfolios, traced):
+    if variant == "legacy":
+        portfolio_cls, stock_cls = LegacyPortfolio, LegacyStock
+    else:
+        from portfolio import Portfolio
+        from stock import Stock
+        portfolio_cls, stock_cls = Portfolio, Stock
+
+    # Symbols are created up front: both variants share them, as the loader
+    # gets them from SQLite either way.
+    symbols = [f"S{i}" for i in range(positions)]
+    gc.collect()
+    if traced:
+        tracemalloc.start()
+    before = rss_bytes()
+    portfolios = [portfolio_cls(f"P{i}") for i in range(n_portfolios)]
+    for i, symbol in enumerate(symbols):
+        portfolios[i % n_portfolios].add_stock(stock_cls(symbol, "Saved Stock", 100.0 + i % 50), 10)
+    gc.collect()
+    after = rss_bytes()
+    traced_bytes = tracemalloc.get_traced_memory()[0] if traced else None
+    assert sum(len(p.stocks) for p in portfolios) == positions
+    return {"rss": after - before, "traced": traced_bytes}
+
+
+def run_child(variant, args, traced):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", variant,
+           "--positions", str(args.positions), "--portfolios", str(args.portfolios)]
+    if traced:
+        cmd.append("--traced")
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--positions", type=int, default=1_000_000)
+    parser.add_argument("--portfolios", type=int, default=1_000)
+    parser.add_argument("--child", choices=("legacy", "slotted"))
+    parser.add_argument("--traced", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(build(args.child, args.positions, args.portfolios, args.traced)))
+        return
+
+    mib = 1024 * 1024
+    print(f"{args.positions:,} positions in {args.portfolios:,} portfolios")
+    print(f"{'variant':>8} {'RSS MiB':>9} {'traced MiB':>11} {'B/position':>11}")
+    results = {}
+    for variant in ("legacy", "slotted"):
+        # RSS and tracemalloc are measured in separate runs: tracing itself
+        # costs memory per allocation and would inflate the RSS figure.
+        rss = run_child(variant, args, traced=False)["rss"]
+        traced = run_child(variant, args, traced=True)["traced"]
+        results[variant] = rss
+        print(f"{variant:>8} {rss / mib:>9.1f} {traced / mib:>11.1f} {rss / args.positions:>11.0f}")
+    if results["slotted"] > 0:
+        print(f"RSS reduction: {results['legacy'] / results['slotted']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
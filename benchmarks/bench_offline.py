@@ -0,0 +1,91 @@
+# benchmarks/bench_offline.py
+"""
+End-to-end timings on synthetic market data, without network access.
+
+    python benchmarks/bench_offline.py [--symbols 10000] [--period 1y] [--cov-symbols 1000]
+
+Installs providers.SyntheticProvider (seeded, with its clock pinned to the
+start of the run) and, in a temporary directory, times: filling the
+history store for every symbol through market_fetch's batches, a repeat
+refresh, a price refresher pass over one portfolio holding all of them,
+the portfolio's value series and risk metrics, and the covariance of the
+first --cov-symbols holdings.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(label, fn, count=None, unit="symbols"):
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    rate = f"  ({count / seconds:,.0f} {unit}/s)" if count else ""
+    print(f"{label:<38} {seconds:8.3f}s{rate}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=10_000)
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--cov-symbols", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # The stores compare fetch times with the wall clock, so the synthetic
+    # "now" is the real one (fixed for the run)
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        import providers
+        providers.use(providers.SyntheticProvider(seed=args.seed, now=now))
+
+        import analytics
+        import covariance
+        import database
+        import history_store
+        import portfolio_store
+        import price_refresher
+        import valuation
+        from stock import Stock
+
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        symbols = [f"SYN{i:05d}" for i in range(args.symbols)]
+
+        timed("history_store.refresh (cold)",
+              lambda: history_store.refresh(symbols, args.period, "1d", now=now), args.symbols)
+        bars = sum(len(history_store.read_array(s, "1d")) for s in symbols)
+        print(f"{'':<38} {bars:,} bars stored")
+        timed("history_store.refresh (warm)",
+              lambda: history_store.refresh(symbols, args.period, "1d", now=now + 60), args.symbols)
+
+        with portfolio_store.edit("bench") as draft:
+            draft.add_portfolio("All")
+            portfolio = draft.get_portfolio("All")
+            for i, symbol in enumerate(symbols):
+                portfolio.add_stock(Stock(symbol, "Synthetic", 100.0), 1 + i % 50)
+            database.save_portfolio(portfolio, "bench")
+
+        timed("price_refresher.refresh_once", price_refresher.refresh_once, args.symbols)
+        portfolio = portfolio_store.get_manager("bench").get_portfolio("All")
+        print(f"{'':<38} portfolio value ${portfolio.calculate_portfolio_value():,.0f}")
+
+        series = timed("valuation.value_series",
+                       lambda: valuation.value_series("bench", portfolio, args.period, "1d"), args.symbols)
+        print(f"{'':<38} {len(series)} points")
+        metrics = timed("analytics.portfolio_metrics",
+                        lambda: analytics.portfolio_metrics("bench", portfolio, args.period, "1d"), args.symbols)
+        print(f"{'':<38} volatility {metrics['volatility']:.1%}, sharpe {metrics['sharpe']:.2f}")
+
+        subset = symbols[:args.cov_symbols]
+        timed(f"covariance.covariance ({len(subset)} symbols)",
+              lambda: covariance.covariance(subset, args.period, "1d"), len(subset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/load_test_web.py
+"""
+In-process load test for the FastAPI app (web_app.py).
+
+    python benchmarks/load_test_web.py [--clients 100] [--requests 20] [--users 10] [--writes 2]
+
+Simulated clients talk to the app over httpx's ASGI transport, so no server
+or network is needed. Each client sends a mix of dashboard and portfolio page
+views and stock purchases as one of a handful of profiles, with `--clients`
+requests in flight at once. Prints throughput and latency percentiles per
+route and overall.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (method, path, weight); the /add_stock weight is set by --writes
+MIX = (
+    ("GET", "/", 3),
+    ("GET", "/portfolios", 5),
+    ("POST", "/add_stock", 2),
+)
+SYMBOLS = ("AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "TSLA", "JPM")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def seed(users, portfolios_per_user):
+    import database
+    from portfolio import Portfolio
+    from stock import Stock
+
+    database.init_database()
+    for u in range(users):
+        for i in range(portfolios_per_user):
+            p = Portfolio(f"Portfolio {i}")
+            for j, symbol in enumerate(SYMBOLS):
+                p.add_stock(Stock(symbol, "Saved Stock", 100.0 + j), 10)
+            database.save_portfolio(p, f"user{u}")
+
+
+async def client(http, user, n_requests, portfolios_per_user, rng, latencies, errors, writes):
+    routes = [r for r in MIX for _ in range(writes if r[0] == "POST" else r[2])]
+    for _ in range(n_requests):
+        method, path, _ = rng.choice(routes)
+        start = time.perf_counter()
+        if method == "GET":
+            response = await http.get(path, params={"user": user})
+        else:
+            response = await http.post(path, params={"user": user}, data={
+                "portfolio_name": f"Portfolio {rng.randrange(portfolios_per_user)}",
+                "symbol": rng.choice(SYMBOLS),
+                "quantity": str(rng.randint(1, 5)),
+            })
+        latencies.setdefault(path, []).append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors.append((path, response.status_code))
+
+
+async def run(args):
+    import httpx
+    import web_app
+
+    transport = httpx.ASGITransport(app=web_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", follow_redirects=False) as http:
+        # Warm-up: load every profile and the market quote cache once
+        for u in range(args.users):
+            await http.get("/", params={"user": f"user{u}"})
+
+        latencies, errors = {}, []
+        rng = random.Random(42)
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client(http, f"user{c % args.users}", args.requests, args.portfolios,
+                   random.Random(rng.random()), latencies, errors, args.writes)
+            for c in range(args.clients)
+        ))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--portfolios", type=int, default=3, help="portfolios per user")
+    parser.add_argument("--writes", type=int, default=2, help="weight of /add_stock in the mix (0 = read-only)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keeps the database and market history files out of the repo
+        import database
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        seed(args.users, args.portfolios)
+
+        latencies, errors, elapsed = asyncio.run(run(args))
+
+    total = sum(len(v) for v in latencies.values())
+    everything = [x for v in latencies.values() for x in v]
+    print(f"{args.clients} concurrent clients, {total} requests in {elapsed:.2f}s "
+          f"-> {total / elapsed:,.0f} req/s, {len(errors)} errors")
+    print(f"{'route':<14} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for path, samples in sorted(latencies.items()) + [("all", everything)]:
+        print(f"{path:<14} {len(samples):>6} {percentile(samples, 50) * 1000:>8.1f} "
+              f"{percentile(samples, 95) * 1000:>8.1f} {percentile(samples, 99) * 1000:>8.1f}")
+
+    import chart_cache
+    charts = chart_cache.stats()
+    print(f"chart cache: {charts['hits']} hits, {charts['misses']} misses, {charts['bytes'] / 1024:,.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
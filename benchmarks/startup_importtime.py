@@ -0,0 +1,97 @@
+# benchmarks/startup_importtime.py
+"""
+Cold-start import cost of the web app and each Streamlit page.
+
+    python benchmarks/startup_importtime.py [--repeat 3] [--top 8]
+
+For every target a fresh interpreter runs `python -X importtime` on what
+that target imports when it starts: `web_app` itself (what `uvicorn
+web_app:app` loads), and for each page the modules imported at the top
+level of its script (collected with ast, since Streamlit runs pages as
+scripts). Reports the best cumulative import time over --repeat runs and
+the slowest top-level packages, so regressions in startup latency show up
+before they reach the container autoscaler.
+"""
+import argparse
+import ast
+import glob
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def top_level_imports(path):
+    """Modules a script imports at module level (not inside functions or blocks)"""
+    with open(path, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read(), filename=path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def targets():
+    yield "web_app", ["web_app"]
+    yield "home.py", top_level_imports(os.path.join(ROOT, "home.py"))
+    for page in sorted(glob.glob(os.path.join(ROOT, "pages", "*.py"))):
+        yield os.path.join("pages", os.path.basename(page)), top_level_imports(page)
+
+
+def measure(modules):
+    """(total microseconds, {top-level package: cumulative microseconds}) for one cold import"""
+    code = "; ".join(f"import {m}" for m in modules) or "pass"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total = 0
+    packages = {}
+    children = []  # level-1 entries seen since the last top-level one
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative, depth, name = int(match.group(1)), int(match.group(2)), len(match.group(3)), match.group(4)
+        if depth == 2:
+            children.append((name, cumulative))
+        if depth:
+            continue
+        total += cumulative
+        # Our own modules are broken down into what they import; the
+        # children of an entry are printed just before it.
+        if os.path.exists(os.path.join(ROOT, name.split(".")[0] + ".py")):
+            for child, child_us in children:
+                root = child.split(".")[0]
+                packages[root] = packages.get(root, 0) + child_us
+            packages[name] = packages.get(name, 0) + self_us
+        else:
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0) + cumulative
+        children = []
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="slowest packages to list per target")
+    args = parser.parse_args()
+
+    print(f"{'target':<28} {'import ms':>10}  slowest packages (ms)")
+    for name, modules in targets():
+        runs = [measure(modules) for _ in range(args.repeat)]
+        total, packages = min(runs, key=lambda r: r[0])
+        slowest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        detail = ", ".join(f"{pkg} {us / 1000:.0f}" for pkg, us in slowest if us >= 1000)
+        print(f"{name:<28} {total / 1000:>10.1f}  {detail}")
+
+
+if __name__ == "__main__":
+    main()
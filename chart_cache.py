@@ -0,0 +1,64 @@
+# chart_cache.py
+"""
+Cache of serialized Plotly figures.
+
+Building and serializing a figure costs tens of milliseconds, and the web
+dashboard used to pay that on every request. Charts are cached here under a
+key that changes whenever the data behind them does (e.g. the user's
+portfolio_store version), so unchanged dashboards are served straight from
+memory. The cache is bounded by size with LRU eviction (it reuses
+market_cache.MarketDataCache).
+
+Figures are serialized with plotly.io.to_json, which encodes numeric arrays
+as base64 typed arrays ("bdata", plotly.js >= 2.28). With CHART_JSON_COMPACT
+on (the default) the orjson engine is used when installed.
+"""
+import os
+from functools import lru_cache
+
+from market_cache import MarketDataCache
+
+MAX_BYTES = 16 * 1024 * 1024
+# Entries are keyed by data version, so expiry only reclaims idle users
+TTL = 60 * 60
+COMPACT = os.environ.get("CHART_JSON_COMPACT", "1").lower() not in ("0", "false", "no")
+
+cache = MarketDataCache(max_bytes=MAX_BYTES)
+
+
+def _engine():
+    try:
+        import orjson  # noqa: F401
+        return "orjson"
+    except ImportError:
+        return "json"
+
+
+def figure_json(fig, compact=None):
+    """Serialize a figure for Plotly.newPlot; the output is safe to inline in a <script>"""
+    import plotly.io as pio
+
+    compact = COMPACT if compact is None else compact
+    if compact:
+        return pio.to_json(fig, engine=_engine(), validate=False, pretty=False)
+    return pio.to_json(fig, engine="json", validate=True, pretty=False)
+
+
+@lru_cache(maxsize=None)
+def plotly_js_url():
+    """CDN URL of the plotly.js release matching the installed plotly (typed-array aware)"""
+    from plotly.offline import get_plotlyjs_version
+    return f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+
+def get(key, builder):
+    """Cached charts for key, calling builder() once on a miss"""
+    return cache.get(key, builder, TTL)
+
+
+def invalidate(key=None):
+    cache.invalidate(key)
+
+
+def stats():
+    return cache.stats()
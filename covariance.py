@@ -0,0 +1,160 @@
+# covariance.py
+"""
+Exponentially weighted covariance of holdings' returns.
+
+The matrix follows the RiskMetrics recursion C <- DECAY * C + (1 - DECAY) * r r'
+over bar returns (zero mean), divided by the accumulated weight so a short
+history isn't biased low. Returns come from the stored price history
+(history_store) with closes aligned as of each bar (valuation.close_asof);
+a symbol without a price yet contributes a zero return. The first build is
+one weighted matrix product over the period; after that each newly
+completed bar is a rank-1 update, O(n^2) for n symbols, without re-reading
+older bars. Matrices are kept as float32 (n x n), cached per (symbol set,
+period, interval) and shared by every portfolio holding those symbols.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import history_store
+import valuation
+
+DECAY = 0.94
+MAX_MATRICES = 32
+
+_lock = threading.Lock()
+_matrices = OrderedDict()  # (symbols, period, interval) -> _Matrix
+
+
+class _Matrix:
+    __slots__ = ('symbols', 'raw', 'weight', 'closes', 'last_ts', 'checked_at')
+
+    def __init__(self, symbols):
+        n = len(symbols)
+        self.symbols = symbols
+        self.raw = np.zeros((n, n), dtype=np.float32)  # weighted sum of r r'
+        self.weight = 0.0                              # sum of the weights in raw
+        self.closes = np.full(n, np.nan)               # closes at last_ts
+        self.last_ts = None
+        self.checked_at = 0.0
+
+    def covariance(self):
+        return self.raw / np.float32(self.weight) if self.weight else self.raw.copy()
+
+
+def _closes(bars, symbols, stamps):
+    """(len(stamps), n) matrix of closes as of each stamp, NaN before a symbol's first bar"""
+    out = np.full((len(stamps), len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        if symbol in bars:
+            out[:, j] = valuation.close_asof(bars[symbol], stamps)
+    return out
+
+
+def _update(matrix, bars, start):
+    """Fold the completed bars after matrix.last_ts (or from start) into the matrix"""
+    stamps = valuation.union_timeline(bars, matrix.last_ts if matrix.last_ts is not None else start)
+    # The newest bar may still be forming; it enters once the next one exists
+    stamps = stamps[:-1]
+    if matrix.last_ts is not None:
+        stamps = stamps[stamps > matrix.last_ts]
+    if not len(stamps):
+        return
+    closes = _closes(bars, matrix.symbols, stamps)
+    if matrix.last_ts is not None:
+        closes = np.vstack([matrix.closes, closes])
+    matrix.closes = closes[-1]
+    matrix.last_ts = int(stamps[-1])
+    if len(closes) < 2:
+        return
+    previous = closes[:-1]
+    returns = np.nan_to_num(np.divide(closes[1:] - previous, previous, where=previous > 0,
+                                      out=np.full(previous.shape, np.nan)))
+    # C_T = DECAY^k C_0 + sum_t (1 - DECAY) DECAY^(k-1-t) r_t r_t', in one product
+    k = len(returns)
+    weights = (1 - DECAY) * DECAY ** np.arange(k - 1, -1, -1)
+    update = (returns * weights[:, None]).T @ returns
+    matrix.raw = (DECAY ** k * matrix.raw + update).astype(np.float32)
+    matrix.weight = DECAY ** k * matrix.weight + weights.sum()
+
+
+def covariance(symbols, period="1y", interval="1d"):
+    """(symbols, float32 covariance matrix of bar returns) for the given symbols"""
+    import market_cache
+
+    symbols = tuple(sorted(set(symbols)))
+    key = (symbols, period, interval)
+    now = time.time()
+    with _lock:
+        matrix = _matrices.get(key)
+        if matrix is not None and now - matrix.checked_at < market_cache.ttl_for(interval):
+            return list(symbols), matrix.covariance()
+
+    if symbols:
+        history_store.refresh(list(symbols), period, interval)
+    bars = {s: history_store.read_array(s, interval) for s in symbols}
+    bars = {s: series for s, series in bars.items() if len(series)}
+
+    with _lock:
+        matrix = _matrices.get(key) or _Matrix(symbols)
+        if bars:
+            span = history_store.PERIOD_SECONDS.get(period)
+            latest = max(int(series['ts'][-1]) for series in bars.values())
+            _update(matrix, bars, latest - span if span else None)
+        matrix.checked_at = now
+        _matrices[key] = matrix
+        _matrices.move_to_end(key)
+        while len(_matrices) > MAX_MATRICES:
+            _matrices.popitem(last=False)
+        return list(symbols), matrix.covariance()
+
+
+def correlation(symbols, period="1y", interval="1d"):
+    """(symbols, float32 correlation matrix); symbols without variance get 0 off the diagonal"""
+    symbols, cov = covariance(symbols, period, interval)
+    std = np.sqrt(np.diag(cov))
+    scale = np.divide(1.0, std, out=np.zeros_like(std), where=std > 0)
+    corr = cov * scale[:, None] * scale[None, :]
+    np.fill_diagonal(corr, 1.0)
+    return symbols, np.clip(corr, -1.0, 1.0)
+
+
+def risk_contributions(portfolio, period="1y", interval="1d"):
+    """Each holding's share of the portfolio's volatility, as a DataFrame.
+
+    Columns: Symbol, Weight, Volatility (the symbol's own, annualized),
+    Marginal (d sigma_p / d w, annualized), Contribution (w * Marginal;
+    these sum to the portfolio volatility) and Share (Contribution / sigma_p).
+    Sorted by Contribution, largest first.
+    """
+    import pandas as pd
+    from analytics import periods_per_year
+
+    symbols, cov = covariance(portfolio.symbols(), period, interval)
+    values = dict(zip(portfolio.symbols(), portfolio.position_values().tolist()))
+    weights = np.array([values[s] for s in symbols], dtype=float)
+    total = weights.sum()
+    if total > 0:
+        weights /= total
+    cov = cov.astype(float) * periods_per_year(interval)
+    sigma = float(np.sqrt(max(weights @ cov @ weights, 0.0)))
+    marginal = cov @ weights / sigma if sigma else np.zeros(len(symbols))
+    contribution = weights * marginal
+    frame = pd.DataFrame({
+        'Symbol': symbols,
+        'Weight': weights,
+        'Volatility': np.sqrt(np.diag(cov)),
+        'Marginal': marginal,
+        'Contribution': contribution,
+        'Share': contribution / sigma if sigma else np.zeros(len(symbols)),
+    })
+    frame.attrs['volatility'] = sigma
+    return frame.sort_values('Contribution', ascending=False, ignore_index=True)
+
+
+def invalidate():
+    """Drop every cached matrix"""
+    with _lock:
+        _matrices.clear()
@@ -1,12 +1,27 @@
 # database.py
-import sqlite3
+import numpy as np
+
 from portfolio import Portfolio
-from stock import Stock
+import db_pool
+import symbols
 
 DB_FILE = 'portfolio.db'
 
+# Rows pulled per fetchmany() while streaming holdings in load_portfolios
+_LOAD_BATCH = 4096
+
+# Ledger rows between position checkpoints; bounds the work of replay_positions
+CHECKPOINT_EVERY = 500
+
+def _pool():
+    # Resolved per call so callers (and scripts) can repoint DB_FILE.
+    return db_pool.get_pool(DB_FILE)
+
 def init_database():
-    conn = sqlite3.connect(DB_FILE)
+    with _pool().connection() as conn:
+        _init_schema(conn)
+
+def _init_schema(conn):
     cursor = conn.cursor()
 
     # Detect legacy single-column portfolios table and migrate
@@ -20,7 +35,6 @@ def init_database():
             legacy_rows = [r[0] for r in cursor.fetchall()]
             # rename legacy table
             cursor.execute('ALTER TABLE portfolios RENAME TO portfolios_legacy')
-            conn.commit()
             # new tables will be created below, then we will import legacy data into default user
     except Exception:
         pass
@@ -56,7 +70,94 @@ def init_database():
         )
     ''')
 
-    conn.commit()
+    # One row per (portfolio, symbol) so saves can upsert changed holdings.
+    # Older databases may hold duplicates from before the index existed.
+    # Its portfolio_id prefix also serves per-portfolio holdings lookups, just
+    # as UNIQUE(user_id, name) serves portfolios-by-user lookups.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_holdings_portfolio_symbol'")
+    if not cursor.fetchone():
+        cursor.execute('''
+            DELETE FROM holdings WHERE id NOT IN (
+                SELECT MAX(id) FROM holdings GROUP BY portfolio_id, symbol
+            )
+        ''')
+        cursor.execute('CREATE UNIQUE INDEX idx_holdings_portfolio_symbol ON holdings(portfolio_id, symbol)')
+
+    # Per-portfolio value and position count as of the last save, written in
+    # the same transaction as the holdings (see aggregates.py for the
+    # in-memory side). Lets totals be read without loading every holding.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_stats (
+            portfolio_id INTEGER PRIMARY KEY,
+            total_value REAL NOT NULL,
+            positions INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (portfolio_id) REFERENCES portfolios(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Append-only trade ledger. Rows are only ever inserted (in batches, by
+    # save_portfolio); holdings is the current state it adds up to.
+    # (portfolio_id, executed_at, id) serves the paginated history query and
+    # (portfolio_id, id) the replay of trades after a checkpoint.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='transactions'")
+    new_ledger = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            portfolio_id INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            side TEXT NOT NULL CHECK (side IN ('buy', 'sell')),
+            quantity REAL NOT NULL,
+            price REAL NOT NULL,
+            executed_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (portfolio_id) REFERENCES portfolios(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_portfolio_time ON transactions(portfolio_id, executed_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_portfolio_id ON transactions(portfolio_id, id)')
+
+    # Positions as of ledger row txn_id, so a replay starts there instead of
+    # at the first trade. Written every CHECKPOINT_EVERY trades.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            portfolio_id INTEGER NOT NULL,
+            txn_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (portfolio_id, txn_id),
+            FOREIGN KEY (portfolio_id) REFERENCES portfolios(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS checkpoint_positions (
+            portfolio_id INTEGER NOT NULL,
+            txn_id INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            price REAL NOT NULL,
+            PRIMARY KEY (portfolio_id, txn_id, symbol),
+            FOREIGN KEY (portfolio_id, txn_id) REFERENCES checkpoints(portfolio_id, txn_id) ON DELETE CASCADE
+        )
+    ''')
+    if new_ledger:
+        # Holdings saved before the ledger existed have no trades behind
+        # them; record them as each portfolio's starting checkpoint.
+        cursor.execute('INSERT OR IGNORE INTO checkpoints (portfolio_id, txn_id) SELECT id, 0 FROM portfolios')
+        cursor.execute('''
+            INSERT OR IGNORE INTO checkpoint_positions (portfolio_id, txn_id, symbol, quantity, price)
+            SELECT portfolio_id, 0, symbol, quantity, price FROM holdings
+        ''')
+
+    # Latest price per symbol, shared by every user and written by
+    # price_refresher. Loaded holdings are valued at these prices.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quotes (
+            symbol TEXT PRIMARY KEY,
+            price REAL NOT NULL,
+            previous_close REAL,
+            updated_at REAL NOT NULL
+        )
+    ''')
 
     # If legacy table was renamed, import its data into default user portfolios
     try:
@@ -72,13 +173,10 @@ def init_database():
                 cursor.execute('INSERT OR IGNORE INTO portfolios (user_id, name) VALUES (?, ?)', (default_id, pname))
             # Drop legacy table
             cursor.execute('DROP TABLE portfolios_legacy')
-            conn.commit()
     except Exception:
         # If anything goes wrong, ignore to avoid blocking app startup
         pass
 
-    conn.close()
-
 def _get_or_create_user_id(conn, username: str) -> int:
     cur = conn.cursor()
     cur.execute('INSERT OR IGNORE INTO users (username) VALUES (?)', (username,))
@@ -87,64 +185,337 @@ def _get_or_create_user_id(conn, username: str) -> int:
     return row[0]
 
 def save_portfolio(portfolio: Portfolio, username: str):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    user_id = _get_or_create_user_id(conn, username)
-
-    # Upsert portfolio
-    cursor.execute('INSERT OR IGNORE INTO portfolios (user_id, name) VALUES (?, ?)', (user_id, portfolio.name))
-    cursor.execute('SELECT id FROM portfolios WHERE user_id = ? AND name = ?', (user_id, portfolio.name))
-    row = cursor.fetchone()
-    if not row:
-        conn.commit()
-        conn.close()
+    """Persist a portfolio, writing only the holdings that changed since the last sync"""
+    storage_key = portfolio.storage_key
+    incremental = storage_key is not None and storage_key[:2] == (DB_FILE, username)
+    if incremental and not portfolio.changed_symbols() and not portfolio.pending_trades():
         return
-    portfolio_id = row[0]
-
-    # Replace holdings for this portfolio
-    cursor.execute('DELETE FROM holdings WHERE portfolio_id = ?', (portfolio_id,))
-    for sym, data in portfolio.stocks.items():
-        stock: Stock = data['stock']
-        qty = data['quantity']
-        cursor.execute(
+
+    with _pool().transaction() as conn:
+        synced = _write_portfolio(conn, portfolio, username)
+    if synced:
+        portfolio.mark_synced(*synced)
+
+def _upsert_portfolio(conn, user_id, name):
+    conn.execute('INSERT OR IGNORE INTO portfolios (user_id, name) VALUES (?, ?)', (user_id, name))
+    row = conn.execute('SELECT id FROM portfolios WHERE user_id = ? AND name = ?', (user_id, name)).fetchone()
+    return row[0] if row else None
+
+def _write_portfolio(conn, portfolio, username, checkpoint=True):
+    """Write a portfolio's changes on an open transaction.
+
+    Returns the arguments for portfolio.mark_synced, to be applied once the
+    transaction commits, or None if the portfolio row could not be found.
+    """
+    storage_key = portfolio.storage_key
+    incremental = storage_key is not None and storage_key[:2] == (DB_FILE, username)
+    changed = portfolio.changed_symbols()
+    trades = portfolio.pending_trades()
+
+    cursor = conn.cursor()
+    if incremental:
+        portfolio_id = storage_key[2]
+    else:
+        portfolio_id = _upsert_portfolio(conn, _get_or_create_user_id(conn, username), portfolio.name)
+        if portfolio_id is None:
+            return None
+
+    if incremental:
+        upserts = []
+        deletes = []
+        for sym in changed:
+            data = portfolio.stocks.get(sym)
+            if data is None:
+                deletes.append((portfolio_id, sym))
+            else:
+                upserts.append((portfolio_id, sym, data['quantity'], float(data['stock'].price)))
+        if deletes:
+            cursor.executemany('DELETE FROM holdings WHERE portfolio_id = ? AND symbol = ?', deletes)
+        if upserts:
+            cursor.executemany(
+                'INSERT INTO holdings (portfolio_id, symbol, quantity, price) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(portfolio_id, symbol) DO UPDATE SET quantity = excluded.quantity, price = excluded.price',
+                upserts
+            )
+    else:
+        # First save of this object: replace holdings for this portfolio
+        cursor.execute('DELETE FROM holdings WHERE portfolio_id = ?', (portfolio_id,))
+        cursor.executemany(
             'INSERT INTO holdings (portfolio_id, symbol, quantity, price) VALUES (?, ?, ?, ?)',
-            (portfolio_id, stock.symbol, qty, float(stock.price))
+            [(portfolio_id, data['stock'].symbol, data['quantity'], float(data['stock'].price))
+             for data in portfolio.stocks.values()]
+        )
+
+    cursor.execute(
+        'INSERT INTO portfolio_stats (portfolio_id, total_value, positions, updated_at) '
+        'VALUES (?, ?, ?, CURRENT_TIMESTAMP) '
+        'ON CONFLICT(portfolio_id) DO UPDATE SET total_value = excluded.total_value, '
+        'positions = excluded.positions, updated_at = excluded.updated_at',
+        (portfolio_id, portfolio.calculate_portfolio_value(), len(portfolio.stocks))
+    )
+
+    if trades:
+        cursor.executemany(
+            'INSERT INTO transactions (portfolio_id, symbol, side, quantity, price, executed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(portfolio_id,) + trade for trade in trades]
+        )
+        if checkpoint:
+            _maybe_checkpoint(conn, portfolio_id)
+
+    return (DB_FILE, username, portfolio_id), changed, len(trades)
+
+def import_trades(username: str, batches, portfolios):
+    """Append imported trades to the ledger and save the portfolios they were
+    applied to, all in one transaction.
+
+    batches yields (portfolio name, rows) with rows of (symbol, side,
+    quantity, price, executed_at); each is written with one executemany as it
+    arrives, so the import is never held in memory as a whole. portfolios is
+    the {name: Portfolio} mapping the trades were applied to, read once the
+    batches are exhausted. Returns the number of ledger rows written.
+    """
+    written = 0
+    synced = []
+    with _pool().transaction() as conn:
+        user_id = _get_or_create_user_id(conn, username)
+        ids = {}
+        for name, rows in batches:
+            portfolio_id = ids.get(name)
+            if portfolio_id is None:
+                portfolio_id = ids[name] = _upsert_portfolio(conn, user_id, name)
+            cursor = conn.executemany(
+                'INSERT INTO transactions (portfolio_id, symbol, side, quantity, price, executed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ((portfolio_id,) + row for row in rows)
+            )
+            written += cursor.rowcount
+        for name in ids:
+            portfolio = portfolios[name]
+            result = _write_portfolio(conn, portfolio, username, checkpoint=False)
+            if result is None:
+                continue
+            synced.append((portfolio, result))
+            # The holdings now reflect the whole import, so checkpoint them
+            # rather than replaying what was just written.
+            last = conn.execute('SELECT MAX(id) FROM transactions WHERE portfolio_id = ?',
+                                (ids[name],)).fetchone()[0]
+            _write_checkpoint(conn, ids[name], last or 0, {
+                sym: (h.quantity, float(h.stock.price)) for sym, h in portfolio.stocks.items()
+            })
+    for portfolio, result in synced:
+        portfolio.mark_synced(*result)
+    return written
+
+def _last_checkpoint(conn, portfolio_id):
+    row = conn.execute('SELECT MAX(txn_id) FROM checkpoints WHERE portfolio_id = ?', (portfolio_id,)).fetchone()
+    return row[0] or 0
+
+def _replay(conn, portfolio_id):
+    """(positions, last ledger id) from the last checkpoint plus the trades after it"""
+    txn_id = _last_checkpoint(conn, portfolio_id)
+    positions = {
+        sym: [qty, price] for sym, qty, price in conn.execute(
+            'SELECT symbol, quantity, price FROM checkpoint_positions WHERE portfolio_id = ? AND txn_id = ?',
+            (portfolio_id, txn_id)
         )
+    }
+    cursor = conn.execute(
+        'SELECT id, symbol, side, quantity, price FROM transactions WHERE portfolio_id = ? AND id > ? ORDER BY id',
+        (portfolio_id, txn_id)
+    )
+    for rows in iter(lambda: cursor.fetchmany(_LOAD_BATCH), []):
+        for txn_id, sym, side, qty, price in rows:
+            position = positions.setdefault(sym, [0.0, price])
+            position[0] += qty if side == 'buy' else -qty
+            position[1] = price
+            if position[0] <= 0:
+                del positions[sym]
+    return positions, txn_id
+
+def _maybe_checkpoint(conn, portfolio_id):
+    """Checkpoint the portfolio's positions once CHECKPOINT_EVERY trades have piled up"""
+    since = _last_checkpoint(conn, portfolio_id)
+    count = conn.execute(
+        'SELECT COUNT(*) FROM transactions WHERE portfolio_id = ? AND id > ?', (portfolio_id, since)
+    ).fetchone()[0]
+    if count < CHECKPOINT_EVERY:
+        return
+    positions, txn_id = _replay(conn, portfolio_id)
+    _write_checkpoint(conn, portfolio_id, txn_id, positions)
+
+def _write_checkpoint(conn, portfolio_id, txn_id, positions):
+    """Record {symbol: (quantity, price)} as the positions as of ledger row txn_id"""
+    conn.execute('INSERT OR REPLACE INTO checkpoints (portfolio_id, txn_id) VALUES (?, ?)', (portfolio_id, txn_id))
+    conn.execute('DELETE FROM checkpoint_positions WHERE portfolio_id = ? AND txn_id = ?', (portfolio_id, txn_id))
+    conn.executemany(
+        'INSERT INTO checkpoint_positions (portfolio_id, txn_id, symbol, quantity, price) VALUES (?, ?, ?, ?, ?)',
+        [(portfolio_id, txn_id, sym, qty, price) for sym, (qty, price) in positions.items()]
+    )
+    # Only the newest checkpoint is ever replayed from
+    conn.execute('DELETE FROM checkpoint_positions WHERE portfolio_id = ? AND txn_id < ?', (portfolio_id, txn_id))
+    conn.execute('DELETE FROM checkpoints WHERE portfolio_id = ? AND txn_id < ?', (portfolio_id, txn_id))
+
+def _portfolio_id(conn, username, portfolio_name):
+    row = conn.execute('''
+        SELECT p.id FROM portfolios p JOIN users u ON u.id = p.user_id
+        WHERE u.username = ? AND p.name = ?
+    ''', (username, portfolio_name)).fetchone()
+    return row[0] if row else None
+
+def replay_positions(username: str, portfolio_name: str):
+    """{symbol: {'quantity', 'price'}} rebuilt from the ledger, replaying only the
+    trades since the portfolio's last checkpoint (price is the last traded)"""
+    with _pool().connection() as conn:
+        portfolio_id = _portfolio_id(conn, username, portfolio_name)
+        if portfolio_id is None:
+            return {}
+        positions, _ = _replay(conn, portfolio_id)
+    return {sym: {'quantity': qty, 'price': price} for sym, (qty, price) in positions.items()}
+
+def trade_log(username: str, portfolio_name: str, after_id: int = 0):
+    """A portfolio's ledger rows with id > after_id, in ledger order, as
+    (id, symbol, side, quantity, executed_at) tuples"""
+    with _pool().connection() as conn:
+        portfolio_id = _portfolio_id(conn, username, portfolio_name)
+        if portfolio_id is None:
+            return []
+        return conn.execute(
+            'SELECT id, symbol, side, quantity, executed_at FROM transactions '
+            'WHERE portfolio_id = ? AND id > ? ORDER BY id',
+            (portfolio_id, after_id)
+        ).fetchall()
+
+def transaction_history(username: str, portfolio_name: str, limit: int = 50, before=None):
+    """One page of a portfolio's trades, newest first.
 
-    conn.commit()
-    conn.close()
+    Returns (rows, cursor): rows are dicts with id, symbol, side, quantity,
+    price and executed_at; pass cursor back as `before` for the next (older)
+    page. cursor is None on the last page. Pages are read by keyset over the
+    (portfolio_id, executed_at, id) index, so deep pages cost the same as the
+    first.
+    """
+    with _pool().connection() as conn:
+        portfolio_id = _portfolio_id(conn, username, portfolio_name)
+        if portfolio_id is None:
+            return [], None
+        query = 'SELECT id, symbol, side, quantity, price, executed_at FROM transactions WHERE portfolio_id = ?'
+        params = [portfolio_id]
+        if before is not None:
+            query += ' AND (executed_at, id) < (?, ?)'
+            params.extend(before)
+        query += ' ORDER BY executed_at DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        rows = conn.execute(query, params).fetchall()
+
+    page = [
+        {'id': id_, 'symbol': sym, 'side': side, 'quantity': qty, 'price': price, 'executed_at': at}
+        for id_, sym, side, qty, price, at in rows[:limit]
+    ]
+    cursor = (page[-1]['executed_at'], page[-1]['id']) if len(rows) > limit else None
+    return page, cursor
 
 def load_portfolios(username: str):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    """Load every portfolio of a user: one query for the portfolios, one for
+    all of their holdings"""
+    with _pool().connection() as conn:
+        # get user id (create if missing)
+        user_id = _get_or_create_user_id(conn, username)
+
+        by_id = {pid: Portfolio(name) for pid, name in conn.execute(
+            'SELECT id, name FROM portfolios WHERE user_id = ?', (user_id,))}
+
+        # One pass over the user's holdings, fetched in batches. ORDER BY
+        # keeps each portfolio's rows together; the (portfolio_id, symbol)
+        # index already yields that order, so SQLite does not sort. Holdings
+        # are priced from the shared quotes table when it has the symbol.
+        cursor = conn.execute('''
+            SELECT h.portfolio_id, h.symbol, h.quantity, COALESCE(q.price, h.price)
+            FROM holdings h
+            LEFT JOIN quotes q ON q.symbol = h.symbol
+            WHERE h.portfolio_id IN (SELECT id FROM portfolios WHERE user_id = ?)
+            ORDER BY h.portfolio_id
+        ''', (user_id,))
+        rows = []
+        for batch in iter(lambda: cursor.fetchmany(_LOAD_BATCH), []):
+            rows += batch
+
+    if rows:
+        # Columns for all holdings at once; each portfolio takes its run of them
+        pids, syms, quantities, prices = zip(*rows)
+        syms = list(syms)
+        names = symbols.names_for(syms)
+        qty = np.array(quantities, dtype=float)
+        px = np.array(prices, dtype=float)
+        # quantity is REAL: fractional units (e.g. imported fund units) load
+        # as they were saved, whole ones as int
+        whole = qty == np.floor(qty)
+        quantities = qty.astype(np.int64).tolist() if whole.all() else [
+            int(q) if w else q for q, w in zip(qty.tolist(), whole.tolist())]
+        pid_array = np.array(pids)
+        bounds = (np.flatnonzero(pid_array[1:] != pid_array[:-1]) + 1).tolist()
+        for lo, hi in zip([0] + bounds, bounds + [len(rows)]):
+            by_id[pids[lo]].load_holdings(
+                syms[lo:hi], names[lo:hi], quantities[lo:hi], qty[lo:hi], px[lo:hi])
 
-    # get user id (create if missing)
-    user_id = _get_or_create_user_id(conn, username)
+    for pid, p in by_id.items():
+        p.mark_synced((DB_FILE, username, pid))
+    return list(by_id.values())
 
-    # fetch portfolios
-    cursor.execute('SELECT id, name FROM portfolios WHERE user_id = ?', (user_id,))
-    rows = cursor.fetchall()
+def load_portfolio_stats(username: str):
+    """{portfolio name: {'value', 'positions'}} as of each portfolio's last save"""
+    with _pool().connection() as conn:
+        rows = conn.execute('''
+            SELECT p.name, s.total_value, s.positions
+            FROM portfolios p
+            JOIN users u ON u.id = p.user_id
+            LEFT JOIN portfolio_stats s ON s.portfolio_id = p.id
+            WHERE u.username = ?
+        ''', (username,)).fetchall()
+    return {name: {'value': value or 0.0, 'positions': positions or 0} for name, value, positions in rows}
 
-    portfolios = []
-    for pid, name in rows:
-        p = Portfolio(name)
-        # fetch holdings
-        cursor.execute('SELECT symbol, quantity, price FROM holdings WHERE portfolio_id = ?', (pid,))
-        for sym, qty, price in cursor.fetchall():
-            stock = Stock(sym, "Saved Stock", float(price))
-            p.add_stock(stock, int(qty))
-        portfolios.append(p)
+def held_symbols():
+    """Distinct symbols held in any portfolio of any user"""
+    with _pool().connection() as conn:
+        return [row[0] for row in conn.execute('SELECT DISTINCT symbol FROM holdings ORDER BY symbol')]
 
-    conn.close()
-    return portfolios
+def save_quotes(quotes, updated_at):
+    """Upsert {symbol: (price, previous_close)} into the shared quotes table"""
+    with _pool().transaction() as conn:
+        conn.executemany('''
+            INSERT INTO quotes (symbol, price, previous_close, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(symbol) DO UPDATE SET
+                price = excluded.price,
+                previous_close = excluded.previous_close,
+                updated_at = excluded.updated_at
+        ''', [(symbol, price, previous, updated_at) for symbol, (price, previous) in quotes.items()])
+
+def load_quotes(symbols=None):
+    """{symbol: {'price', 'previous_close', 'updated_at'}} from the quotes table"""
+    with _pool().connection() as conn:
+        if symbols is None:
+            rows = conn.execute('SELECT symbol, price, previous_close, updated_at FROM quotes').fetchall()
+        else:
+            symbols = list(symbols)
+            rows = []
+            # Chunked to stay under SQLite's bound-parameter limit
+            for lo in range(0, len(symbols), 500):
+                chunk = symbols[lo:lo + 500]
+                rows += conn.execute(
+                    f"SELECT symbol, price, previous_close, updated_at FROM quotes "
+                    f"WHERE symbol IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+    return {symbol: {'price': price, 'previous_close': previous, 'updated_at': updated_at}
+            for symbol, price, previous, updated_at in rows}
 
 def get_all_users():
     """Get list of all existing usernames"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT username FROM users ORDER BY username')
-    users = [row[0] for row in cursor.fetchall()]
-    
-    conn.close()
+    with _pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT username FROM users ORDER BY username')
+        users = [row[0] for row in cursor.fetchall()]
+
     return users if users else ["default"]
+
+def pool_metrics():
+    """Connection pool metrics for the portfolio database"""
+    return _pool().metrics()
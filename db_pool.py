@@ -0,0 +1,187 @@
+# db_pool.py
+"""
+Shared SQLite connection pool.
+
+Connections are opened once per database file and reused across Streamlit
+reruns and FastAPI requests instead of paying connect + schema parse cost
+on every call. Each connection is configured with WAL journaling and tuned
+pragmas, and is only ever used by one thread at a time.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = 8
+
+# Applied to every new connection. WAL lets readers proceed while a writer
+# commits; synchronous=NORMAL is durable under WAL except on power loss.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),        # negative = KiB, so ~16 MB page cache
+    ("mmap_size", 268435456),      # 256 MB memory-mapped I/O
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+
+
+class ConnectionPool:
+    def __init__(self, path, size=DEFAULT_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+        # metrics
+        self._acquired = 0
+        self._reused = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._in_use = 0
+        self._peak_in_use = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self, timeout=None):
+        """Take a connection from the pool, opening a new one while under size."""
+        if self._closed:
+            raise RuntimeError(f"Connection pool for '{self.path}' is closed")
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    reused = False
+                    open_new = True
+                else:
+                    open_new = False
+            if open_new:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                start = time.perf_counter()
+                conn = self._idle.get(timeout=timeout)
+                reused = True
+                with self._lock:
+                    self._waits += 1
+                    self._wait_time += time.perf_counter() - start
+
+        with self._lock:
+            self._acquired += 1
+            if reused:
+                self._reused += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block (autocommit mode)."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and run the block in a single transaction.
+
+        Commits on success and rolls back if the block raises.
+        """
+        conn = self.acquire()
+        try:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+        finally:
+            self.release(conn)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "size": self.size,
+                "open": self._opened,
+                "idle": self._idle.qsize(),
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "acquired": self._acquired,
+                "reused": self._reused,
+                "waits": self._waits,
+                "avg_wait_ms": (self._wait_time / self._waits * 1000) if self._waits else 0.0,
+            }
+
+    def close(self):
+        """Close idle connections; connections still in use close on release."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path, size=DEFAULT_POOL_SIZE):
+    """Return the process-wide pool for a database file, creating it on first use."""
+    pool = _pools.get(path)
+    if pool is None or pool.closed:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None or pool.closed:
+                pool = ConnectionPool(path, size)
+                _pools[path] = pool
+    return pool
+
+
+def pool_metrics():
+    """Metrics for every pool opened in this process."""
+    return [pool.metrics() for pool in list(_pools.values())]
+
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
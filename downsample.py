@@ -0,0 +1,171 @@
+# downsample.py
+"""
+Server-side downsampling of chart series.
+
+A chart a few thousand pixels wide can't show more than a point or two per
+pixel, but minute bars over weeks, or several tickers at once, easily mean
+tens of thousands of points per figure and megabytes of Plotly JSON. Series
+are reduced to the chart's width before the figure is built:
+
+- line series with Largest-Triangle-Three-Buckets (LTTB): the first and
+  last points are kept and each bucket in between contributes the point
+  forming the largest triangle with the previously kept point and the next
+  bucket's average, which preserves peaks, troughs and the overall shape.
+  LTTB alone can still pass over the series' overall high or low, so those
+  two replace their bucket's pick;
+- OHLC bars by merging runs of consecutive bars into one (first open,
+  highest high, lowest low, last close, summed volume), so every extreme
+  still shows up on the candles and volume bars.
+
+Both are NumPy operations over whole arrays; LTTB's one sequential step
+(each bucket depends on the point kept before it) is a loop over buckets,
+not points. Results are cached per (symbol, interval, width, kind) and
+reused while the underlying series is unchanged (same length, span and
+last values).
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Assumed plot width in pixels (Streamlit doesn't report the real one)
+DEFAULT_WIDTH = 1200
+# Pixels per candle once bars are merged
+CANDLE_PIXELS = 4
+MAX_ENTRIES = 512
+
+_lock = threading.Lock()
+_results = OrderedDict()  # (symbol, interval, width, kind) -> (signature, result)
+
+
+def lttb_indices(x, y, threshold):
+    """Positions of the `threshold` points LTTB keeps from (x, y), ascending.
+
+    x and y are equal-length numeric arrays with x increasing; all points are
+    kept when there are no more than threshold of them. The minimum and
+    maximum of y are always kept (as one extra point if they share a bucket).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Buckets over the points between the first and the last
+    buckets = threshold - 2
+    edges = (np.arange(buckets + 1) * (n - 2) // buckets + 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # The point a bucket is measured against: the next bucket's average, or the last point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+    for j in range(buckets):
+        lo, hi = edges[j], edges[j + 1]
+        # Twice the triangle area; the constant factor doesn't change the argmax
+        area = np.abs((ax - next_x[j]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[j] - ay))
+        k = lo + int(np.argmax(area))
+        kept[j + 1] = k
+        ax, ay = x[k], y[k]
+
+    extremes = np.array(sorted({int(np.nanargmin(y)), int(np.nanargmax(y))} - {0, n - 1}), dtype=np.int64)
+    owners = np.searchsorted(edges, extremes, side='right') - 1
+    if len(extremes) == 2 and owners[0] == owners[1]:
+        return np.union1d(kept, extremes)
+    kept[owners + 1] = extremes
+    return kept
+
+
+def ohlc_buckets(open_, high, low, close, volume, buckets):
+    """(starts, open, high, low, close, volume) with runs of consecutive bars
+    merged into at most `buckets` bars; starts are the first bar of each run"""
+    n = len(close)
+    size = max(1, -(-n // max(int(buckets), 1)))
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    return (starts,
+            np.asarray(open_, dtype=float)[starts],
+            np.fmax.reduceat(high, starts) if n else high,
+            np.fmin.reduceat(low, starts) if n else low,
+            np.asarray(close, dtype=float)[ends],
+            np.add.reduceat(np.nan_to_num(volume), starts) if n else volume)
+
+
+def _x_values(index):
+    """Numeric x for LTTB: epoch nanoseconds for a datetime index, else the values"""
+    import pandas as pd
+    if isinstance(index, pd.DatetimeIndex):
+        return index.as_unit("ns").asi8.astype(float)
+    return np.asarray(index, dtype=float)
+
+
+def _signature(obj):
+    if not len(obj):
+        return (0,)
+    last = np.nan_to_num(np.atleast_1d(np.asarray(obj.iloc[-1], dtype=float)))
+    return (len(obj), obj.index[0], obj.index[-1], tuple(last.tolist()))
+
+
+def _cached(key, obj, build):
+    if key is None:
+        return build()
+    signature = _signature(obj)
+    with _lock:
+        entry = _results.get(key)
+        if entry is not None and entry[0] == signature:
+            _results.move_to_end(key)
+            return entry[1]
+    result = build()
+    with _lock:
+        _results[key] = (signature, result)
+        _results.move_to_end(key)
+        while len(_results) > MAX_ENTRIES:
+            _results.popitem(last=False)
+    return result
+
+
+def line(series, width=DEFAULT_WIDTH, key=None):
+    """A Series reduced with LTTB to about one point per pixel (NaNs dropped).
+
+    key is (symbol, interval) to cache the result; without it nothing is cached.
+    """
+    series = series.dropna()
+
+    def build():
+        return series.iloc[lttb_indices(_x_values(series.index), series.to_numpy(), int(width))]
+
+    return _cached(key + (int(width), "line") if key else None, series, build)
+
+
+def ohlc(frame, width=DEFAULT_WIDTH, key=None):
+    """An Open/High/Low/Close/Volume frame with consecutive bars merged so there
+    is at most one candle per CANDLE_PIXELS pixels; key as for line()"""
+    import pandas as pd
+
+    frame = frame.dropna(subset=['Close'])
+
+    def build():
+        buckets = max(int(width) // CANDLE_PIXELS, 1)
+        if len(frame) <= buckets:
+            return frame
+        volume = frame['Volume'] if 'Volume' in frame.columns else np.zeros(len(frame))
+        starts, o, h, l, c, v = ohlc_buckets(frame['Open'], frame['High'], frame['Low'], frame['Close'],
+                                             volume, buckets)
+        return pd.DataFrame({'Open': o, 'High': h, 'Low': l, 'Close': c, 'Volume': v},
+                            index=frame.index[starts])
+
+    return _cached(key + (int(width), "ohlc") if key else None, frame, build)
+
+
+def invalidate(symbol=None):
+    """Drop cached results (all, or one symbol's)"""
+    with _lock:
+        for key in [k for k in _results if symbol is None or k[0] == symbol]:
+            del _results[key]
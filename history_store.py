@@ -0,0 +1,324 @@
+# history_store.py
+"""
+On-disk OHLCV history store.
+
+Fetched bars are kept in a SQLite table keyed by (symbol, interval, ts).
+A request only downloads what is missing: the whole period the first time,
+then just the tail since the last stored bar. Each (symbol, interval) series
+is also mirrored to a NumPy .npy file that is read memory-mapped, so serving
+a chart from disk costs a file open and a slice rather than a SQL scan.
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import db_pool
+
+HISTORY_DB = 'market_history.db'
+ARRAY_DIR = 'market_history'
+
+BAR_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+DAY = 24 * 60 * 60
+PERIOD_SECONDS = {
+    "1d": DAY, "2d": 2 * DAY, "5d": 5 * DAY,
+    "1mo": 30 * DAY, "3mo": 91 * DAY, "6mo": 182 * DAY,
+    "1y": 365 * DAY, "2y": 730 * DAY, "5y": 1826 * DAY, "10y": 3652 * DAY,
+}
+INTERVAL_SECONDS = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400,
+    "1h": 3600, "1d": DAY, "5d": 5 * DAY, "1wk": 7 * DAY, "1mo": 30 * DAY, "3mo": 91 * DAY,
+}
+
+_init_lock = threading.Lock()
+_initialized = set()
+_arrays = {}  # (symbol, interval) -> (mtime_ns, memmap)
+_arrays_lock = threading.Lock()
+
+
+def _pool():
+    pool = db_pool.get_pool(HISTORY_DB)
+    if HISTORY_DB not in _initialized:
+        with _init_lock:
+            if HISTORY_DB not in _initialized:
+                with pool.connection() as conn:
+                    _init_schema(conn)
+                _initialized.add(HISTORY_DB)
+    return pool
+
+
+def _init_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bars (
+            symbol TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            PRIMARY KEY (symbol, interval, ts)
+        ) WITHOUT ROWID
+    ''')
+    # first_ts is the earliest start ever requested (not the first bar), so a
+    # symbol with short history is not refetched on every request.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS coverage (
+            symbol TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            first_ts INTEGER NOT NULL,
+            last_ts INTEGER,
+            fetched_at REAL NOT NULL,
+            tz TEXT,
+            PRIMARY KEY (symbol, interval)
+        ) WITHOUT ROWID
+    ''')
+
+
+def period_start(period, now):
+    """Epoch seconds a yfinance-style period reaches back to from now"""
+    if period == "max":
+        return 0
+    if period == "ytd":
+        return int(datetime(datetime.fromtimestamp(now, timezone.utc).year, 1, 1, tzinfo=timezone.utc).timestamp())
+    return int(now - PERIOD_SECONDS.get(period, 30 * DAY))
+
+
+def period_sessions(period):
+    """N for an "Nd" period, which yfinance counts in sessions, else None"""
+    if period and period.endswith("d") and period[:-1].isdigit():
+        return int(period[:-1])
+    return None
+
+
+def _fetch_start(period, now):
+    """Epoch seconds the store must cover back to for `period`. "Nd" periods
+    reach back N weekdays plus one, so weekends and a holiday still leave N
+    sessions (and exchanges ahead of UTC their first one) inside the window."""
+    sessions = period_sessions(period)
+    if sessions is None:
+        return period_start(period, now)
+    today = np.datetime64(int(now), "s").astype("datetime64[D]")
+    day = np.busday_offset(today, -sessions, roll="backward")
+    return int(day.astype("datetime64[s]").astype(np.int64))
+
+
+def _last_sessions(records, sessions, tz=None):
+    """The records of the last `sessions` distinct trading days (in tz)"""
+    import pandas as pd
+
+    stamps = pd.to_datetime(np.asarray(records['ts']), unit='s', utc=True)
+    if tz:
+        stamps = stamps.tz_convert(tz)
+    days = stamps.tz_localize(None).normalize().asi8
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    if len(starts) <= sessions:
+        return records
+    return records[starts[-sessions]:]
+
+
+def _array_path(symbol, interval):
+    safe = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+    return os.path.join(ARRAY_DIR, f"{safe}__{interval}.npy")
+
+
+def _to_records(frame):
+    """Convert a yfinance OHLCV frame into a BAR_DTYPE array (and its timezone)"""
+    if frame is None or frame.empty:
+        return np.empty(0, dtype=BAR_DTYPE), None
+    index = frame.index
+    tz = str(index.tz) if getattr(index, 'tz', None) is not None else None
+    if tz is None:
+        index = index.tz_localize('UTC')
+    records = np.empty(len(frame), dtype=BAR_DTYPE)
+    records['ts'] = index.tz_convert('UTC').as_unit('s').asi8
+    for field, column in COLUMNS.items():
+        if column in frame.columns:
+            records[field] = frame[column].to_numpy(dtype='f8', na_value=np.nan)
+        else:
+            records[field] = np.nan
+    records = records[~np.isnan(records['close'])]
+    return records, tz
+
+
+def _write_bars(conn, symbol, interval, records):
+    conn.executemany(
+        'INSERT OR REPLACE INTO bars (symbol, interval, ts, open, high, low, close, volume) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        ((symbol, interval, int(r['ts']), float(r['open']), float(r['high']), float(r['low']),
+          float(r['close']), float(r['volume'])) for r in records)
+    )
+
+
+def _snapshot(conn, symbol, interval):
+    """Rewrite the memory-mapped mirror of one series from the table"""
+    rows = conn.execute(
+        'SELECT ts, open, high, low, close, volume FROM bars WHERE symbol = ? AND interval = ? ORDER BY ts',
+        (symbol, interval)
+    ).fetchall()
+    records = np.array(rows, dtype=BAR_DTYPE) if rows else np.empty(0, dtype=BAR_DTYPE)
+    path = _array_path(symbol, interval)
+    os.makedirs(ARRAY_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as fh:
+        np.save(fh, records)
+    os.replace(tmp, path)
+    with _arrays_lock:
+        _arrays.pop((symbol, interval), None)
+
+
+def read_array(symbol, interval, start=None):
+    """Stored bars for a series as a read-only memory-mapped BAR_DTYPE array.
+
+    Bars at or after `start` (epoch seconds) are returned; the slice is found
+    by binary search on the sorted timestamps.
+    """
+    path = _array_path(symbol, interval)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return np.empty(0, dtype=BAR_DTYPE)
+    key = (symbol, interval)
+    with _arrays_lock:
+        cached = _arrays.get(key)
+    if cached is None or cached[0] != mtime:
+        try:
+            records = np.load(path, mmap_mode='r')
+        except ValueError:
+            # an empty series has no data section to map
+            records = np.load(path)
+        with _arrays_lock:
+            _arrays[key] = (mtime, records)
+    else:
+        records = cached[1]
+    if start is not None and len(records):
+        records = records[np.searchsorted(records['ts'], start, side='left'):]
+    return records
+
+
+def _coverage(conn, symbols, interval):
+    found = {}
+    for symbol in symbols:
+        row = conn.execute(
+            'SELECT first_ts, last_ts, fetched_at, tz FROM coverage WHERE symbol = ? AND interval = ?',
+            (symbol, interval)
+        ).fetchone()
+        if row:
+            found[symbol] = row
+    return found
+
+
+def refresh(symbols, period="1mo", interval="1d", now=None):
+    """Make sure the store covers `period` for every symbol, fetching only what is missing.
+
+    Symbols never seen (or not stored that far back) get the full period;
+    the rest get the tail since their last bar once the previous fetch is
+    older than one bar (capped at 15 minutes). Returns {symbol: tz}.
+    """
+    import market_fetch
+
+    now = time.time() if now is None else now
+    wanted_start = _fetch_start(period, now)
+    stale_after = max(60, min(INTERVAL_SECONDS.get(interval, DAY), 15 * 60))
+    pool = _pool()
+
+    with pool.connection() as conn:
+        coverage = _coverage(conn, symbols, interval)
+
+    full, tails = [], {}
+    for symbol in symbols:
+        cov = coverage.get(symbol)
+        if cov is None or cov[0] > wanted_start or cov[1] is None or cov[1] < wanted_start:
+            full.append(symbol)
+        elif now - cov[2] >= stale_after:
+            tails[symbol] = cov[1]
+
+    fetched = {}
+    if full:
+        for symbol, frame in market_fetch.fetch_histories(full, period=period, interval=interval).items():
+            fetched[symbol] = (frame, wanted_start)
+    if tails:
+        # One batched request from the oldest tail; overlapping bars are upserted
+        since = datetime.fromtimestamp(min(tails.values()), timezone.utc)
+        for symbol, frame in market_fetch.fetch_histories(list(tails), interval=interval, start=since).items():
+            fetched[symbol] = (frame, None)
+
+    timezones = {symbol: cov[3] for symbol, cov in coverage.items()}
+    if not fetched:
+        return timezones
+
+    with pool.transaction() as conn:
+        for symbol, (frame, requested_start) in fetched.items():
+            records, tz = _to_records(frame)
+            cov = coverage.get(symbol)
+            tz = tz or (cov[3] if cov else None)
+            timezones[symbol] = tz
+            if len(records):
+                _write_bars(conn, symbol, interval, records)
+            first_ts = requested_start if requested_start is not None else cov[0]
+            if cov is not None:
+                first_ts = min(first_ts, cov[0])
+            last_ts = int(records['ts'][-1]) if len(records) else (cov[1] if cov else None)
+            if cov is not None and cov[1] is not None and last_ts is not None:
+                last_ts = max(last_ts, cov[1])
+            if last_ts is None:
+                # Nothing known about this symbol; don't record coverage so the
+                # next request retries the full period.
+                continue
+            conn.execute(
+                'INSERT OR REPLACE INTO coverage (symbol, interval, first_ts, last_ts, fetched_at, tz) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (symbol, interval, first_ts, last_ts, now, tz)
+            )
+
+    with pool.connection() as conn:
+        for symbol, (frame, _) in fetched.items():
+            if frame is not None and not frame.empty:
+                _snapshot(conn, symbol, interval)
+    return timezones
+
+
+def to_frame(records, tz=None):
+    """BAR_DTYPE records as an OHLCV DataFrame indexed by timestamp"""
+    import pandas as pd
+
+    index = pd.to_datetime(np.asarray(records['ts']), unit='s', utc=True)
+    if tz:
+        index = index.tz_convert(tz)
+    return pd.DataFrame({column: np.asarray(records[field]) for field, column in COLUMNS.items()}, index=index)
+
+
+def get_frames(symbols, period="1mo", interval="1d"):
+    """{symbol: OHLCV DataFrame} for the period, served from disk after a gap-filling refresh"""
+    symbols = list(dict.fromkeys(symbols))
+    timezones = refresh(symbols, period, interval)
+    sessions = period_sessions(period) if INTERVAL_SECONDS.get(interval, DAY) <= DAY else None
+    span = None if period in ("max", "ytd") else PERIOD_SECONDS.get(period, 30 * DAY)
+    frames = {}
+    for symbol in symbols:
+        records = read_array(symbol, interval)
+        if sessions is not None and len(records):
+            # "2d" is the last two sessions, so a Monday's day change still
+            # has Friday's close to compare with
+            records = _last_sessions(records, sessions, timezones.get(symbol))
+        elif span is not None and len(records):
+            # Windows end at the latest stored bar, as yfinance periods do, so a
+            # "1d" request on a weekend still shows the last session.
+            records = records[np.searchsorted(records['ts'], records['ts'][-1] - span, side='left'):]
+        elif period == "ytd":
+            records = read_array(symbol, interval, start=period_start(period, time.time()))
+        frames[symbol] = to_frame(records, timezones.get(symbol))
+    return frames
@@ -4,12 +4,11 @@ from portfolio import PortfolioManager
 from transaction import Transaction
 from report import ReportGenerator
 import database
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-import yfinance as yf
-from datetime import datetime, timedelta
-import numpy as np
+import market_cache
+import portfolio_store
+import symbols
+import analytics
+from aggregates import exposure_matrix
 
 # ---------- Page Config ----------
 st.set_page_config(
@@ -228,25 +227,24 @@ st.markdown(
 )
 
 # ---------- App State ----------
-if "pm" not in st.session_state:
-    database.init_database()
-    pm = PortfolioManager()
-    pm.set_user("default")
-    pm.load_portfolios("default")
-    st.session_state.pm = pm
-    st.session_state.reporter = ReportGenerator(pm)
-    st.session_state.username = "default"
-
-pm: PortfolioManager = st.session_state.pm
-reporter: ReportGenerator = st.session_state.reporter
+# Portfolios are shared by every session on the same profile (see portfolio_store)
+pm: PortfolioManager
+pm, changed_elsewhere = portfolio_store.bind_session(st.session_state)
+reporter = ReportGenerator(pm)
+if changed_elsewhere:
+    st.toast("Portfolios were updated in another session.")
 
 # ---------- Global KPIs ----------
+aggregates = pm.aggregates  # kept current as holdings change; no per-render aggregation
 total_portfolios = len(pm.portfolios)
-total_positions = sum(len(p.stocks) for p in pm.portfolios.values())
-total_value = sum(p.calculate_portfolio_value() for p in pm.portfolios.values())
+total_positions = aggregates.total_positions
+total_value = aggregates.total_value
 
-# Calculate portfolio growth (mock data for demo - can be replaced with real calculation)
-portfolio_growth = 12.5 if total_value > 0 else 0
+# Risk/performance of the combined holdings over the last year (cached in
+# analytics); renders only read stored bars, missing ones load in the background
+health = analytics.combined_metrics(st.session_state.get("username", "default"), pm.portfolios, fetch=False)
+portfolio_growth = health['growth']
+growth_label = f"{portfolio_growth:+.1%} (1y)" if portfolio_growth is not None else "— (no history)"
 
 # ---------- Sidebar: Profile & Quick Actions ----------
 st.sidebar.header("👤 Profile")
@@ -274,8 +272,6 @@ with st.sidebar:
         if st.button("Create Profile", use_container_width=True, key="create_profile_btn"):
             if new_profile.strip():
                 st.session_state.username = new_profile.strip()
-                pm.set_user(st.session_state.username)
-                pm.load_portfolios(st.session_state.username)
                 st.success(f"Created and switched to profile '{st.session_state.username}'.")
                 st.rerun()
             else:
@@ -284,8 +280,6 @@ with st.sidebar:
         # Switch to selected existing profile
         if selected_user != current_user:
             st.session_state.username = selected_user
-            pm.set_user(st.session_state.username)
-            pm.load_portfolios(st.session_state.username)
             st.success(f"Switched to profile '{st.session_state.username}'.")
             st.rerun()
     
@@ -310,23 +304,39 @@ with st.sidebar:
             if not new_name.strip():
                 st.warning("Provide a valid name.")
             else:
-                pm.add_portfolio(new_name.strip())
-                p = pm.get_portfolio(new_name.strip())
-                if p:
-                    database.save_portfolio(p, st.session_state.username)
+                with portfolio_store.edit(st.session_state.username, st.session_state.pm_session_id,
+                                          portfolios=new_name.strip()) as draft:
+                    draft.add_portfolio(new_name.strip())
+                    p = draft.get_portfolio(new_name.strip())
+                    if p:
+                        database.save_portfolio(p, st.session_state.username)
                 st.success(f"Created portfolio '{new_name}'.")
 
     with st.expander("📈 Quick Add Stock"):
         if pm.portfolios:
             pname_q = st.selectbox("Portfolio", options=list(pm.portfolios.keys()), key="q_port")
             sym_q = st.text_input("Symbol", key="q_sym")
+            if sym_q.strip() and not symbols.is_known(sym_q):
+                hits = symbols.search(sym_q, 5)
+                if hits:
+                    st.caption("Matches: " + ", ".join(r['symbol'] for r in hits))
             qty_q = st.number_input("Quantity", min_value=1, value=10, step=1, key="q_qty")
             if st.button("Add Stock", use_container_width=True, key="q_add_btn"):
-                pm.add_stock_to_portfolio(pname_q, sym_q.strip().upper(), int(qty_q))
-                p = pm.get_portfolio(pname_q)
-                if p:
-                    database.save_portfolio(p, st.session_state.username)
-                st.success(f"Added {qty_q} of {sym_q} to {pname_q}.")
+                try:
+                    sym_q = symbols.validate(sym_q)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    with portfolio_store.edit(st.session_state.username, st.session_state.pm_session_id,
+                                              portfolios=pname_q) as draft:
+                        added = draft.add_stock_to_portfolio(pname_q, sym_q, int(qty_q))
+                        p = draft.get_portfolio(pname_q)
+                        if added and p:
+                            database.save_portfolio(p, st.session_state.username)
+                    if added:
+                        st.success(f"Added {qty_q} of {sym_q} to {pname_q}.")
+                    else:
+                        st.error(f"Could not fetch a price for {sym_q}.")
         else:
             st.info("Create a portfolio first.")
 
@@ -422,10 +432,12 @@ if not has_portfolios:
             
             if submitted:
                 if portfolio_name.strip():
-                    pm.add_portfolio(portfolio_name.strip())
-                    p = pm.get_portfolio(portfolio_name.strip())
-                    if p:
-                        database.save_portfolio(p, st.session_state.username)
+                    with portfolio_store.edit(st.session_state.username, st.session_state.pm_session_id,
+                                              portfolios=portfolio_name.strip()) as draft:
+                        draft.add_portfolio(portfolio_name.strip())
+                        p = draft.get_portfolio(portfolio_name.strip())
+                        if p:
+                            database.save_portfolio(p, st.session_state.username)
                     st.success(f"✅ Portfolio '{portfolio_name}' created! Now add some stocks using the sidebar.")
                     st.rerun()
                 else:
@@ -473,7 +485,7 @@ with col3:
         <h2 style='color: #34d399; margin: 0; font-size: 2.8rem; font-weight: 800;'>${total_value:,.0f}</h2>
         <p style='color: #94a3b8; margin: 8px 0 0 0; font-size: 1rem; font-weight: 600;'>Total Value</p>
         <div style='margin-top: 12px; padding: 6px 12px; background: rgba(52, 211, 153, 0.1); border-radius: 8px; display: inline-block;'>
-            <span style='color: #34d399; font-size: 0.85rem; font-weight: 600;'>↗ +{portfolio_growth}%</span>
+            <span style='color: #34d399; font-size: 0.85rem; font-weight: 600;'>{'↗' if (portfolio_growth or 0) >= 0 else '↘'} {growth_label}</span>
         </div>
     </div>
     """, unsafe_allow_html=True)
@@ -661,31 +673,14 @@ if has_stocks:
     """, unsafe_allow_html=True)
 
 if pm.portfolios and has_stocks:
-    # Collect all portfolio data for comprehensive analysis
-    all_stocks_data = []
-    portfolio_values = {}
-    
-    for portfolio_name, portfolio in pm.portfolios.items():
-        portfolio_value = portfolio.calculate_portfolio_value()
-        portfolio_values[portfolio_name] = portfolio_value
-        
-        for symbol, stock_data in portfolio.stocks.items():
-            stock = stock_data['stock']
-            quantity = stock_data['quantity']
-            if stock.symbol and stock.symbol.strip():
-                value = stock.price * quantity
-                all_stocks_data.append({
-                    'Portfolio': portfolio_name,
-                    'Symbol': stock.symbol.upper(),
-                    'Quantity': quantity,
-                    'Price': stock.price,
-                    'Value': value,
-                    'Name': stock.name
-                })
+    # Plotting libraries load on first use, keeping them off the cold-start path
+    import pandas as pd
+    import plotly.express as px
+
+    # Distribution numbers come from the precomputed aggregates
+    portfolio_values = aggregates.portfolio_values
     
-    if all_stocks_data:
-        df_all = pd.DataFrame(all_stocks_data)
-        
+    if aggregates.exposure:
         # Create comprehensive distribution charts
         chart_col1, chart_col2 = st.columns(2)
         
@@ -720,8 +715,7 @@ if pm.portfolios and has_stocks:
         
         with chart_col2:
             # Top Holdings Across All Portfolios
-            stock_totals = df_all.groupby('Symbol')['Value'].sum().reset_index()
-            stock_totals = stock_totals.sort_values('Value', ascending=False).head(10)
+            stock_totals = pd.DataFrame(aggregates.top_holdings(10), columns=['Symbol', 'Value'])
             
             fig_holdings = px.bar(
                 stock_totals,
@@ -751,7 +745,10 @@ if pm.portfolios and has_stocks:
         
         with chart_col3:
             # Portfolio Composition by Number of Positions
-            portfolio_positions = df_all.groupby('Portfolio').size().reset_index(name='Positions')
+            portfolio_positions = pd.DataFrame(
+                [(name, n) for name, n in aggregates.portfolio_positions.items() if n],
+                columns=['Portfolio', 'Positions']
+            )
             
             fig_positions = px.bar(
                 portfolio_positions,
@@ -773,12 +770,10 @@ if pm.portfolios and has_stocks:
         
         with chart_col4:
             # Value Distribution Heatmap
-            portfolio_stock_matrix = df_all.pivot_table(
-                index='Portfolio', 
-                columns='Symbol', 
-                values='Value', 
-                fill_value=0
+            heat_rows, heat_cols, heat_values = exposure_matrix(
+                {name: p for name, p in pm.portfolios.items() if p.stocks}
             )
+            portfolio_stock_matrix = pd.DataFrame(heat_values, index=heat_rows, columns=heat_cols)
             
             if not portfolio_stock_matrix.empty and portfolio_stock_matrix.shape[0] > 0 and portfolio_stock_matrix.shape[1] > 0:
                 try:
@@ -805,10 +800,12 @@ if pm.portfolios and has_stocks:
         st.markdown("### 📈 Distribution Summary")
         summary_col1, summary_col2, summary_col3, summary_col4 = st.columns(4)
         
-        total_value = df_all['Value'].sum()
-        unique_stocks = df_all['Symbol'].nunique()
-        avg_position_size = df_all['Value'].mean()
-        largest_position = df_all.loc[df_all['Value'].idxmax()]
+        unique_stocks = aggregates.unique_symbols()
+        avg_position_size = aggregates.average_position()
+        largest_position = max(
+            (top[0] for top in (p.top_holdings(1) for p in pm.portfolios.values()) if top),
+            key=lambda item: item[1]
+        )
         
         with summary_col1:
             st.metric("Total Portfolio Value", f"${total_value:,.2f}")
@@ -820,7 +817,7 @@ if pm.portfolios and has_stocks:
             st.metric("Avg Position Size", f"${avg_position_size:,.2f}")
         
         with summary_col4:
-            st.metric("Largest Position", f"{largest_position['Symbol']}")
+            st.metric("Largest Position", f"{largest_position[0]}")
             
 elif has_portfolios and not has_stocks:
     st.markdown("""
@@ -909,31 +906,8 @@ if has_portfolios:
     # Real-time market data for major indices
     try:
         with st.spinner("Loading market data..."):
-            # Get major market indices
-            indices = {
-                "^GSPC": "S&P 500",
-                "^DJI": "Dow Jones",
-                "^IXIC": "NASDAQ",
-                "^VIX": "VIX"
-            }
-            
-            market_data = {}
-            for symbol, name in indices.items():
-                try:
-                    ticker = yf.Ticker(symbol)
-                    hist = ticker.history(period="2d")
-                    if not hist.empty:
-                        current = hist['Close'].iloc[-1]
-                        previous = hist['Close'].iloc[-2] if len(hist) > 1 else current
-                        change = current - previous
-                        change_pct = (change / previous * 100) if previous != 0 else 0
-                        market_data[name] = {
-                            'current': current,
-                            'change': change,
-                            'change_pct': change_pct
-                        }
-                except:
-                    continue
+            # Major market indices, served from the shared quote cache
+            market_data = market_cache.get_index_quotes()
             
             if market_data:
                 market_cols = st.columns(len(market_data))
@@ -970,6 +944,9 @@ if has_portfolios:
         })
     
     if portfolio_data:
+        import pandas as pd
+        import plotly.express as px
+
         df = pd.DataFrame(portfolio_data)
         
         col1, col2 = st.columns(2)
@@ -1016,35 +993,61 @@ if has_portfolios:
         </div>
         """, unsafe_allow_html=True)
 
+        risk_score, sharpe = health['risk_score'], health['sharpe']
+        if risk_score is None:
+            risk_text, risk_note = "—", "Not enough price history yet"
+        else:
+            risk_text = f"{risk_score:.1f}/10"
+            level = "Low" if risk_score < 4 else "Moderate" if risk_score < 7 else "High"
+            risk_note = f"{level} Risk · {health['volatility']:.0%} annual volatility"
+        if sharpe is None:
+            sharpe_text, sharpe_note = "—", "Not enough price history yet"
+        else:
+            sharpe_text = f"{sharpe:.2f}"
+            quality = "Good" if sharpe >= 1 else "Fair" if sharpe >= 0 else "Poor"
+            sortino = f" · Sortino {health['sortino']:.2f}" if health['sortino'] is not None else ""
+            sharpe_note = f"{quality} Risk-Adjusted Return{sortino}"
+        diversification = health['diversification']
+        spread = "Well Diversified" if diversification >= 0.8 else \
+            "Moderately Diversified" if diversification >= 0.5 else "Concentrated"
+        diversification_note = f"{spread} · {health['effective_positions']:.1f} effective positions"
+
         analytics_col1, analytics_col2, analytics_col3 = st.columns(3)
 
         with analytics_col1:
-            st.markdown("""
+            st.markdown(f"""
             <div class='glass pulse' style='text-align: center; padding: 20px;'>
                 <h4 style='color: #22d3ee;'>🎯 Risk Score</h4>
-                <div style='font-size: 2rem; margin: 10px 0;'>7.2/10</div>
-                <p style='color: #94a3b8; font-size: 0.9rem;'>Moderate Risk Level</p>
+                <div style='font-size: 2rem; margin: 10px 0;'>{risk_text}</div>
+                <p style='color: #94a3b8; font-size: 0.9rem;'>{risk_note}</p>
             </div>
             """, unsafe_allow_html=True)
 
         with analytics_col2:
-            st.markdown("""
+            st.markdown(f"""
             <div class='glass pulse' style='text-align: center; padding: 20px;'>
                 <h4 style='color: #a78bfa;'>📈 Sharpe Ratio</h4>
-                <div style='font-size: 2rem; margin: 10px 0;'>1.45</div>
-                <p style='color: #94a3b8; font-size: 0.9rem;'>Good Risk-Adjusted Return</p>
+                <div style='font-size: 2rem; margin: 10px 0;'>{sharpe_text}</div>
+                <p style='color: #94a3b8; font-size: 0.9rem;'>{sharpe_note}</p>
             </div>
             """, unsafe_allow_html=True)
 
         with analytics_col3:
-            st.markdown("""
+            st.markdown(f"""
             <div class='glass pulse' style='text-align: center; padding: 20px;'>
                 <h4 style='color: #34d399;'>🎲 Diversification</h4>
-                <div style='font-size: 2rem; margin: 10px 0;'>85%</div>
-                <p style='color: #94a3b8; font-size: 0.9rem;'>Well Diversified</p>
+                <div style='font-size: 2rem; margin: 10px 0;'>{diversification:.0%}</div>
+                <p style='color: #94a3b8; font-size: 0.9rem;'>{diversification_note}</p>
             </div>
             """, unsafe_allow_html=True)
 
+        if health['volatility'] is not None:
+            detail1, detail2, detail3, detail4 = st.columns(4)
+            detail1.metric("Max Drawdown (1y)", f"{health['max_drawdown']:.1%}")
+            detail2.metric("Beta vs S&P 500", f"{health['beta']:.2f}" if health['beta'] is not None else "—")
+            detail3.metric("1-Day VaR (95%)", f"${health['var_value']:,.0f}", f"{health['var']:.2%}", delta_color="off")
+            detail4.metric("Volatility (annual)", f"{health['volatility']:.1%}")
+
 st.write("")
 
 # Compact Footer
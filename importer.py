@@ -0,0 +1,348 @@
+# importer.py
+"""
+Bulk import of broker trade history (CSV or OFX) into a user's portfolios.
+
+    python importer.py fills.csv --user alice [--portfolio Brokerage] [--chunksize 100000]
+
+Files are read a chunk at a time by generators (pandas' chunked CSV reader,
+or a streaming tag scanner for OFX), so memory stays flat however long the
+file is. Each chunk is validated with vectorized pandas/NumPy operations and
+applied to the in-memory portfolios as one net change per (portfolio,
+symbol), and its trades are streamed into the transactions ledger with
+executemany. The import commits as a single SQLite transaction
+(database.import_trades): it lands completely or not at all.
+"""
+import re
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import database
+import portfolio_store
+import symbols
+from stock import Stock
+
+CHUNKSIZE = 100_000
+LEDGER_COLUMNS = ('portfolio', 'symbol', 'side', 'quantity', 'price', 'executed_at')
+
+# Accepted CSV header spellings (compared lower-cased) for each ledger column
+CSV_HEADERS = {
+    'portfolio': ('portfolio', 'account', 'account name', 'account number'),
+    'symbol': ('symbol', 'ticker', 'instrument', 'security'),
+    'side': ('side', 'action', 'type', 'transaction type', 'buy/sell'),
+    'quantity': ('quantity', 'qty', 'shares', 'units', 'filled qty'),
+    'price': ('price', 'fill price', 'avg price', 'execution price', 'unit price'),
+    'executed_at': ('executed_at', 'date', 'time', 'trade date', 'datetime', 'timestamp', 'execution time'),
+}
+SIDES = {
+    'buy': 'buy', 'b': 'buy', 'bot': 'buy', 'bought': 'buy',
+    'sell': 'sell', 's': 'sell', 'sld': 'sell', 'sold': 'sell',
+}
+SYMBOL_PATTERN = r'[A-Z0-9.^=-]{1,15}'
+
+# OFX investment transactions we import, and the side each one is
+OFX_TRADES = {
+    'BUYSTOCK': 'buy', 'SELLSTOCK': 'sell',
+    'BUYMF': 'buy', 'SELLMF': 'sell',
+    'BUYOTHER': 'buy', 'SELLOTHER': 'sell',
+}
+OFX_FIELDS = {'UNIQUEID': 'symbol', 'UNITS': 'quantity', 'UNITPRICE': 'price', 'DTTRADE': 'executed_at'}
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+_OFX_DATE = r'^(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::\w+)?\])?'
+
+
+def _csv_columns(header):
+    """{file column: ledger column} for a CSV header"""
+    lookup = {alias: column for column, aliases in CSV_HEADERS.items() for alias in aliases}
+    mapping = {}
+    for name in header:
+        column = lookup.get(str(name).strip().lower())
+        if column and column not in mapping.values():
+            mapping[name] = column
+    missing = {'symbol', 'quantity', 'price'} - set(mapping.values())
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(sorted(missing))}")
+    return mapping
+
+
+def read_csv_chunks(source, chunksize=CHUNKSIZE):
+    """Yield DataFrames of up to chunksize rows with ledger column names"""
+    mapping = _csv_columns(pd.read_csv(source, nrows=0).columns)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    text = [name for name, column in mapping.items() if column in ('portfolio', 'symbol', 'side')]
+    reader = pd.read_csv(source, usecols=list(mapping), chunksize=chunksize,
+                         dtype={name: str for name in text}, skipinitialspace=True)
+    for chunk in reader:
+        yield chunk.rename(columns=mapping)
+
+
+def _ofx_tags(path, block=1 << 20):
+    """(closing, TAG, text) for every tag of an OFX document, read a block at a time"""
+    with open(path, encoding='utf-8', errors='replace') as fh:
+        tail = ''
+        for data in iter(lambda: fh.read(block), ''):
+            data = tail + data
+            # Keep the last (possibly incomplete) tag for the next block
+            cut = data.rfind('<')
+            if cut <= 0:
+                tail = data
+                continue
+            tail = data[cut:]
+            for match in _OFX_TAG.finditer(data, 0, cut):
+                yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+        for match in _OFX_TAG.finditer(tail):
+            yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+
+
+def _ofx_dates(values):
+    """Parse OFX datetimes (YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]]) to UTC timestamps"""
+    parts = pd.Series(values, dtype='string').str.extract(_OFX_DATE)
+    stamps = pd.to_datetime(parts[0] + parts[1].fillna('000000'), format='%Y%m%d%H%M%S',
+                            errors='coerce', utc=True)
+    offset = pd.to_numeric(parts[2], errors='coerce').fillna(0.0)
+    return stamps - pd.to_timedelta(offset, unit='h')
+
+
+def read_ofx_chunks(source, chunksize=CHUNKSIZE):
+    """Yield DataFrames of up to chunksize trades from an OFX/QFX statement.
+
+    Works for both SGML (OFX 1.x) and XML (2.x) files. Securities are
+    identified by their SECLIST ticker when the statement has one (found by
+    a first pass over the file), else by their UNIQUEID (usually a CUSIP).
+    Trades are put in the statement's account (ACCTID).
+    """
+    if not isinstance(source, str):
+        raise ValueError("OFX import needs a file path (the file is read twice)")
+
+    tickers = {}
+    in_secinfo = False
+    unique_id = None
+    for closing, tag, text in _ofx_tags(source):
+        if tag == 'SECINFO':
+            in_secinfo = not closing
+        elif in_secinfo and tag == 'UNIQUEID':
+            unique_id = text
+        elif in_secinfo and tag == 'TICKER' and unique_id:
+            tickers[unique_id] = text
+
+    columns = {column: [] for column in LEDGER_COLUMNS}
+    account = None
+    trade = None
+    for closing, tag, text in _ofx_tags(source):
+        if tag in OFX_TRADES:
+            if not closing:
+                trade = {'side': OFX_TRADES[tag]}
+                continue
+            if trade is not None:
+                for column in LEDGER_COLUMNS:
+                    columns[column].append(trade.get(column))
+                columns['portfolio'][-1] = account
+                trade = None
+                if len(columns['symbol']) >= chunksize:
+                    yield _ofx_frame(columns, tickers)
+                    columns = {column: [] for column in LEDGER_COLUMNS}
+        elif closing:
+            continue
+        elif trade is not None and tag in OFX_FIELDS:
+            trade[OFX_FIELDS[tag]] = text
+        elif tag == 'ACCTID':
+            account = text
+    if columns['symbol']:
+        yield _ofx_frame(columns, tickers)
+
+
+def _ofx_frame(columns, tickers):
+    frame = pd.DataFrame(columns)
+    frame['symbol'] = frame['symbol'].map(lambda uid: tickers.get(uid, uid))
+    frame['executed_at'] = _ofx_dates(frame['executed_at'])
+    return frame
+
+
+def _numeric(values):
+    if not pd.api.types.is_numeric_dtype(values):
+        values = values.astype('string').str.replace(r'[$,\s]', '', regex=True)
+    return pd.to_numeric(values, errors='coerce')
+
+
+def validate(chunk, portfolio=None, date_format=None):
+    """Normalize and check one chunk of trades.
+
+    Returns (trades, rejected): trades is a DataFrame with the ledger columns
+    (executed_at as UTC 'YYYY-MM-DD HH:MM:SS.ffffff' strings, the ledger's
+    format) holding only the valid rows, and rejected counts the rest.
+    Rows without a portfolio go to `portfolio`; a signed quantity stands in
+    for a missing side (negative = sell).
+    """
+    index = chunk.index
+    symbol = chunk['symbol'].astype('string').str.strip().str.upper()
+    quantity = _numeric(chunk['quantity']).astype(float)
+    price = _numeric(chunk['price']).astype(float)
+    if 'side' in chunk:
+        side = chunk['side'].astype('string').str.strip().str.lower().map(SIDES)
+    else:
+        side = pd.Series(np.where(quantity < 0, 'sell', 'buy'), index=index)
+    quantity = quantity.abs()
+
+    if 'portfolio' in chunk:
+        names = chunk['portfolio'].astype('string').str.strip().replace('', pd.NA)
+        names = names.fillna(portfolio) if portfolio else names
+    else:
+        names = pd.Series(portfolio, index=index, dtype='string')
+
+    if 'executed_at' in chunk:
+        stamps = chunk['executed_at']
+        if not pd.api.types.is_datetime64_any_dtype(stamps):
+            stamps = pd.to_datetime(stamps, errors='coerce', utc=True, format=date_format)
+        elif stamps.dt.tz is None:
+            stamps = stamps.dt.tz_localize('UTC')
+    else:
+        stamps = pd.Series(pd.Timestamp(datetime.now(timezone.utc)), index=index)
+
+    valid = (
+        symbol.str.fullmatch(SYMBOL_PATTERN).fillna(False).to_numpy(dtype=bool)
+        & side.notna().to_numpy()
+        & np.isfinite(quantity.to_numpy()) & (quantity.to_numpy() > 0)
+        & np.isfinite(price.to_numpy()) & (price.to_numpy() >= 0)
+        & stamps.notna().to_numpy()
+        & names.notna().to_numpy()
+    )
+
+    stamps = stamps[valid].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[us]')
+    executed_at = [s[:10] + ' ' + s[11:] for s in np.datetime_as_string(stamps, unit='us').tolist()]
+    trades = pd.DataFrame({
+        'portfolio': names[valid].astype(object).to_numpy(),
+        'symbol': symbol[valid].astype(object).to_numpy(),
+        'side': side[valid].astype(object).to_numpy(),
+        'quantity': quantity[valid].to_numpy(),
+        'price': price[valid].to_numpy(),
+        'executed_at': executed_at,
+    }, index=index[valid])
+    return trades, int(len(chunk) - valid.sum())
+
+
+def apply_trades(pm, trades):
+    """Apply a validated chunk to pm's portfolios (creating missing ones) as
+    one net change per (portfolio, symbol).
+
+    Raises ValueError, before changing anything, if a sell would take a
+    position below zero at its point in the file.
+    """
+    if trades.empty:
+        return
+    signed = np.where(trades['side'].to_numpy() == 'buy', trades['quantity'].to_numpy(),
+                      -trades['quantity'].to_numpy())
+    codes = trades.groupby(['portfolio', 'symbol'], sort=False).ngroup().to_numpy()
+    first = np.unique(codes, return_index=True)[1]  # first row of each group, in code order
+    keys = list(zip(trades['portfolio'].to_numpy()[first].tolist(), trades['symbol'].to_numpy()[first].tolist()))
+
+    held = np.array([
+        pm.portfolios[name].get_stock_quantity(symbol) if name in pm.portfolios else 0
+        for name, symbol in keys
+    ], dtype=float)
+    running = held[codes] + pd.Series(signed).groupby(codes).cumsum().to_numpy()
+    oversold = np.flatnonzero(running < -1e-9)
+    if len(oversold):
+        row = trades.iloc[oversold[0]]
+        raise ValueError(
+            f"Trade #{trades.index[oversold[0]] + 1} sells {row['quantity']:g} {row['symbol']} "
+            f"but portfolio '{row['portfolio']}' holds only {running[oversold[0]] + row['quantity']:g}"
+        )
+
+    # Every portfolio named in the file exists afterwards, even one whose
+    # trades all cancel out (its ledger rows still need a portfolio)
+    for name in dict.fromkeys(name for name, _ in keys):
+        if name not in pm.portfolios:
+            pm.add_portfolio(name)
+
+    net = np.bincount(codes, weights=signed, minlength=len(keys))
+    last_price = pd.Series(trades['price'].to_numpy()).groupby(codes).last().to_numpy()
+    for (name, symbol), change, price in zip(keys, net.tolist(), last_price.tolist()):
+        if abs(change) < 1e-9:
+            continue
+        portfolio = pm.get_portfolio(name)
+        if change == int(change):
+            change = int(change)
+        stock = Stock(symbol, symbols.name_for(symbol), price)
+        if change > 0:
+            portfolio.add_stock(stock, change)
+        else:
+            current = portfolio.get_stock_quantity(symbol)
+            portfolio.remove_stock(stock, current if abs(current + change) < 1e-9 else -change)
+
+
+def ledger_batches(trades):
+    """(portfolio, rows) batches of a validated chunk for database.import_trades"""
+    names = trades['portfolio']
+    if names.nunique() == 1:
+        parts = [(names.iat[0], trades)]
+    else:
+        parts = trades.groupby('portfolio', sort=False)
+    for name, part in parts:
+        yield name, zip(part['symbol'].tolist(), part['side'].tolist(), part['quantity'].tolist(),
+                        part['price'].tolist(), part['executed_at'].tolist())
+
+
+def import_file(source, username, portfolio=None, fmt=None, chunksize=CHUNKSIZE, date_format=None):
+    """Import a CSV or OFX trade file into a user's portfolios.
+
+    fmt is 'csv' or 'ofx' (default: from the file extension). Rows without a
+    portfolio column go to `portfolio`. Returns a dict of counts and timing:
+    rows, imported, rejected, portfolios, seconds and rows_per_sec.
+    """
+    if fmt is None:
+        name = source if isinstance(source, str) else getattr(source, 'name', '')
+        fmt = 'ofx' if str(name).lower().endswith(('.ofx', '.qfx')) else 'csv'
+    if fmt == 'ofx':
+        chunks = read_ofx_chunks(source, chunksize)
+    elif fmt == 'csv':
+        chunks = read_csv_chunks(source, chunksize)
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    stats = {'rows': 0, 'imported': 0, 'rejected': 0, 'portfolios': []}
+    start = time.perf_counter()
+    with portfolio_store.edit(username) as draft:
+        def batches():
+            for chunk in chunks:
+                trades, rejected = validate(chunk, portfolio, date_format)
+                stats['rows'] += len(chunk)
+                stats['rejected'] += rejected
+                apply_trades(draft, trades)
+                for name in trades['portfolio'].unique().tolist():
+                    if name not in stats['portfolios']:
+                        stats['portfolios'].append(name)
+                yield from ledger_batches(trades)
+
+        stats['imported'] = database.import_trades(username, batches(), draft.portfolios)
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import broker trade history (CSV or OFX)")
+    parser.add_argument("path")
+    parser.add_argument("--user", default="default")
+    parser.add_argument("--portfolio", help="portfolio for rows that don't name one")
+    parser.add_argument("--format", choices=("csv", "ofx"), dest="fmt")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--date-format", help="strftime format of the CSV date column")
+    args = parser.parse_args()
+
+    try:
+        stats = import_file(args.path, args.user, args.portfolio, args.fmt, args.chunksize, args.date_format)
+    except ValueError as e:
+        print(f"Import failed, nothing was saved: {e}")
+        raise SystemExit(1)
+    print(f"Imported {stats['imported']:,} of {stats['rows']:,} rows ({stats['rejected']:,} rejected) "
+          f"into {', '.join(stats['portfolios']) or 'no portfolios'} "
+          f"in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
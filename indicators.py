@@ -0,0 +1,306 @@
+# indicators.py
+"""
+Technical indicators over stored OHLCV bars.
+
+Every indicator is a small class whose run(bars, state) consumes a slice of
+BAR_DTYPE bars (see history_store) and returns its output columns plus the
+state needed to continue from the next bar: the trailing window for SMA,
+Bollinger and rolling VWAP, the last smoothed values for EMA, MACD, RSI and
+ATR. Running over a series in pieces therefore gives the same result as one
+pass, and each pass is O(n) and vectorized where the recurrence allows
+(cumulative sums; the exponential smoothings are a plain loop over floats).
+
+compute() memoizes results per (symbol, interval, indicator and params).
+When the stored series has only grown, the cached state is advanced over
+the new bars instead of recomputing the history. The newest bar may still
+be forming, so it is evaluated from a copy of the state and never folded
+into it.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import history_store
+
+MAX_ENTRIES = 256
+
+_lock = threading.Lock()
+_results = OrderedDict()  # (symbol, interval, indicator key) -> _Entry
+
+
+def _ewm(values, alpha, prev=np.nan):
+    """Exponential smoothing y = prev + alpha * (x - prev), seeded with the
+    first value (pandas ewm(alpha=..., adjust=False)); returns (y, last y)"""
+    out = np.empty(len(values))
+    for i, x in enumerate(values.tolist()):
+        prev = x if prev != prev else prev + alpha * (x - prev)
+        out[i] = prev
+    return out, prev
+
+
+def _rolling_sum(values, tail, window):
+    """Sums of `window` consecutive values over tail + values, one per new
+    value (NaN until the window fills); returns (sums, new tail)"""
+    x = np.concatenate([tail, values])
+    sums = np.full(len(x), np.nan)
+    if len(x) >= window:
+        c = np.cumsum(np.concatenate([[0.0], x]))
+        sums[window - 1:] = c[window:] - c[:-window]
+    # The tail keeps up to window - 1 values (all of them until the window first fills)
+    return sums[len(tail):], x[max(len(x) - (window - 1), 0):] if window > 1 else x[:0]
+
+
+class SMA:
+    """Simple moving average of the close"""
+
+    def __init__(self, window=20):
+        self.window = int(window)
+        self.columns = (f"SMA_{self.window}",)
+
+    def key(self):
+        return ("SMA", self.window)
+
+    def initial(self):
+        return np.empty(0)
+
+    def run(self, bars, tail):
+        sums, tail = _rolling_sum(np.asarray(bars['close']), tail, self.window)
+        return {self.columns[0]: sums / self.window}, tail
+
+
+class EMA:
+    """Exponential moving average of the close (alpha = 2 / (span + 1))"""
+
+    def __init__(self, span=20):
+        self.span = int(span)
+        self.columns = (f"EMA_{self.span}",)
+
+    def key(self):
+        return ("EMA", self.span)
+
+    def initial(self):
+        return np.nan
+
+    def run(self, bars, prev):
+        ema, prev = _ewm(np.asarray(bars['close']), 2 / (self.span + 1), prev)
+        return {self.columns[0]: ema}, prev
+
+
+class MACD:
+    """MACD line (fast EMA - slow EMA), its signal EMA and the histogram"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = int(fast), int(slow), int(signal)
+        self.columns = ("MACD", "MACD_signal", "MACD_hist")
+
+    def key(self):
+        return ("MACD", self.fast, self.slow, self.signal)
+
+    def initial(self):
+        return (np.nan, np.nan, np.nan)
+
+    def run(self, bars, state):
+        close = np.asarray(bars['close'])
+        fast, f = _ewm(close, 2 / (self.fast + 1), state[0])
+        slow, s = _ewm(close, 2 / (self.slow + 1), state[1])
+        line = fast - slow
+        signal, g = _ewm(line, 2 / (self.signal + 1), state[2])
+        return {"MACD": line, "MACD_signal": signal, "MACD_hist": line - signal}, (f, s, g)
+
+
+class RSI:
+    """Wilder's relative strength index (NaN until `window` changes are seen)"""
+
+    def __init__(self, window=14):
+        self.window = int(window)
+        self.columns = (f"RSI_{self.window}",)
+
+    def key(self):
+        return ("RSI", self.window)
+
+    def initial(self):
+        return (np.nan, np.nan, np.nan, 0)  # previous close, average gain, average loss, changes seen
+
+    def run(self, bars, state):
+        prev_close, gain, loss, seen = state
+        close = np.asarray(bars['close'])
+        change = np.diff(close, prepend=prev_close)
+        # The series' very first bar has no change; it only seeds prev_close
+        skip = 1 if prev_close != prev_close and len(close) else 0
+        alpha = 1 / self.window
+        gains, gain = _ewm(np.maximum(change[skip:], 0.0), alpha, gain)
+        losses, loss = _ewm(np.maximum(-change[skip:], 0.0), alpha, loss)
+        rsi = np.full(len(close), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi[skip:] = np.where(losses > 0, 100 - 100 / (1 + gains / losses), 100.0)
+        counts = seen + np.arange(1, len(close) - skip + 1)
+        rsi[skip:][counts < self.window] = np.nan
+        last = float(close[-1]) if len(close) else prev_close
+        return {self.columns[0]: rsi}, (last, gain, loss, seen + len(close) - skip)
+
+
+class Bollinger:
+    """Bollinger bands: SMA of the close +/- k population standard deviations"""
+
+    def __init__(self, window=20, k=2.0):
+        self.window, self.k = int(window), float(k)
+        self.columns = ("BB_mid", "BB_upper", "BB_lower")
+
+    def key(self):
+        return ("Bollinger", self.window, self.k)
+
+    def initial(self):
+        return (np.empty(0), None)  # trailing closes, shift applied before squaring
+
+    def run(self, bars, state):
+        tail, shift = state
+        close = np.asarray(bars['close'])
+        if shift is None:
+            # Squares are summed around a nearby level to keep the variance exact
+            shift = float(close[0]) if len(close) else None
+        shifted_tail = tail - shift if shift is not None else tail
+        x = close - shift if shift is not None else close
+        sums, _ = _rolling_sum(x, shifted_tail, self.window)
+        squares, _ = _rolling_sum(x * x, shifted_tail * shifted_tail, self.window)
+        mean = sums / self.window
+        std = np.sqrt(np.maximum(squares / self.window - mean * mean, 0.0))
+        mid = mean + (shift or 0.0)
+        tail = np.concatenate([tail, close])[-(self.window - 1):] if self.window > 1 else tail[:0]
+        return {"BB_mid": mid, "BB_upper": mid + self.k * std, "BB_lower": mid - self.k * std}, (tail, shift)
+
+
+class VWAP:
+    """Volume-weighted average of the typical price (high + low + close) / 3.
+
+    With no window it is anchored to the session and restarts every UTC day
+    (for intraday bars); with a window it is rolling over that many bars.
+    """
+
+    def __init__(self, window=None):
+        self.window = int(window) if window else None
+        self.columns = (f"VWAP_{self.window}" if self.window else "VWAP",)
+
+    def key(self):
+        return ("VWAP", self.window)
+
+    def initial(self):
+        if self.window:
+            return (np.empty(0), np.empty(0))  # trailing price*volume, volume
+        return (None, 0.0, 0.0)                # session day, cumulative price*volume, volume
+
+    def run(self, bars, state):
+        typical = (np.asarray(bars['high']) + np.asarray(bars['low']) + np.asarray(bars['close'])) / 3
+        volume = np.asarray(bars['volume'])
+        pv = typical * volume
+        if self.window:
+            pv_sums, pv_tail = _rolling_sum(pv, state[0], self.window)
+            v_sums, v_tail = _rolling_sum(volume, state[1], self.window)
+            state = (pv_tail, v_tail)
+        else:
+            n = len(pv)
+            if not n:
+                return {self.columns[0]: np.empty(0)}, state
+            day = np.asarray(bars['ts']) // history_store.DAY
+            starts = np.r_[True, day[1:] != day[:-1]]
+            first = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+            c_pv, c_v = np.cumsum(pv), np.cumsum(volume)
+            pv_sums = c_pv - (c_pv - pv)[first]
+            v_sums = c_v - (c_v - volume)[first]
+            if state[0] == day[0]:
+                carried = first == 0
+                pv_sums[carried] += state[1]
+                v_sums[carried] += state[2]
+            state = (int(day[-1]), float(pv_sums[-1]), float(v_sums[-1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = np.where(v_sums > 0, pv_sums / v_sums, typical)
+        return {self.columns[0]: vwap}, state
+
+
+class ATR:
+    """Wilder's average true range (NaN until `window` bars are seen)"""
+
+    def __init__(self, window=14):
+        self.window = int(window)
+        self.columns = (f"ATR_{self.window}",)
+
+    def key(self):
+        return ("ATR", self.window)
+
+    def initial(self):
+        return (np.nan, np.nan, 0)  # previous close, ATR, bars seen
+
+    def run(self, bars, state):
+        prev_close, atr, seen = state
+        high, low, close = np.asarray(bars['high']), np.asarray(bars['low']), np.asarray(bars['close'])
+        previous = np.concatenate([[prev_close], close[:-1]])
+        gaps = np.fmax(np.abs(high - previous), np.abs(low - previous))  # NaN-free at the first bar
+        true_range = np.fmax(high - low, gaps)
+        values, atr = _ewm(true_range, 1 / self.window, atr)
+        values[seen + np.arange(1, len(close) + 1) < self.window] = np.nan
+        last = float(close[-1]) if len(close) else prev_close
+        return {self.columns[0]: values}, (last, atr, seen + len(close))
+
+
+class _Entry:
+    """Outputs over a series' completed bars, and the state after them"""
+    __slots__ = ('first_ts', 'last_ts', 'count', 'outputs', 'state')
+
+    def __init__(self, first_ts, last_ts, count, outputs, state):
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+        self.count = count
+        self.outputs = outputs
+        self.state = state
+
+
+def compute(symbol, interval, indicator, start=None, tz=None):
+    """The indicator over a symbol's stored bars as a DataFrame.
+
+    Columns are indicator.columns, the index the bar timestamps (converted
+    to tz if given) at or after `start` (epoch seconds). Bars come from
+    history_store as already refreshed by the caller, so the full stored
+    history warms the indicator up even when only a period is shown.
+    """
+    import pandas as pd
+
+    bars = history_store.read_array(symbol, interval)
+    key = (symbol, interval, indicator.key())
+    with _lock:
+        entry = _results.get(key)
+
+    n = len(bars)
+    # Reuse the cached state when the stored series only grew past it
+    if entry is None or not n or entry.count > n - 1 or int(bars['ts'][0]) != entry.first_ts \
+            or (entry.count and int(bars['ts'][entry.count - 1]) != entry.last_ts):
+        entry = _Entry(int(bars['ts'][0]) if n else None, None, 0,
+                       {column: np.empty(0) for column in indicator.columns}, indicator.initial())
+
+    completed = max(n - 1, 0)
+    if completed > entry.count:
+        new, state = indicator.run(bars[entry.count:completed], entry.state)
+        entry = _Entry(entry.first_ts, int(bars['ts'][completed - 1]), completed,
+                       {c: np.concatenate([entry.outputs[c], new[c]]) for c in indicator.columns}, state)
+        with _lock:
+            _results[key] = entry
+            _results.move_to_end(key)
+            while len(_results) > MAX_ENTRIES:
+                _results.popitem(last=False)
+
+    # The newest bar from the saved state, which run() leaves untouched
+    last, _ = indicator.run(bars[completed:], entry.state)
+    columns = {c: np.concatenate([entry.outputs[c], last[c]]) for c in indicator.columns}
+
+    ts = np.asarray(bars['ts'])
+    first = np.searchsorted(ts, start, side='left') if start is not None else 0
+    index = pd.to_datetime(ts[first:], unit='s', utc=True)
+    if tz is not None:
+        index = index.tz_convert(tz)
+    return pd.DataFrame({c: values[first:] for c, values in columns.items()}, index=index)
+
+
+def invalidate(symbol=None):
+    """Drop memoized results (all, or one symbol's)"""
+    with _lock:
+        for key in [k for k in _results if symbol is None or k[0] == symbol]:
+            del _results[key]
@@ -0,0 +1,374 @@
+# live_feed.py
+"""
+Live quotes and portfolio values for the web dashboard (Server-Sent Events).
+
+One poller thread per process asks the feed for every symbol a connected
+client needs (the market indices plus the holdings of the users being
+watched) once per LIVE_POLL_SECONDS, however many clients are connected.
+It keeps the last quote per symbol and publishes only what changed: a
+"quotes" event with the symbols that moved and, for each watched user
+whose holdings moved or who traded (portfolio_store.subscribe), a
+"portfolios" event with the recomputed values. Events are encoded once
+per user and handed to each client's queue on its own event loop
+(call_soon_threadsafe); a client that falls behind gets a fresh snapshot
+instead of the backlog.
+
+Feeds (LIVE_FEED):
+    market     (default) the quotes table the price refresher keeps current;
+               symbols it doesn't cover (the indices) come from market_cache,
+               so polling never goes upstream more often than those do
+    simulated  a local random walk around the last known prices that ticks
+               every poll, for demos and tests without network or market hours
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# Defaults to the price refresher's cadence, which the market feed can't outpace
+POLL_SECONDS = float(os.environ.get("LIVE_POLL_SECONDS") or os.environ.get("PRICE_REFRESH_SECONDS") or 60) or 60.0
+FEED = os.environ.get("LIVE_FEED", "market").strip().lower()
+# Events a client may have queued before it is resynced with a snapshot
+QUEUE_SIZE = 64
+HEARTBEAT_SECONDS = 15
+# A new user's symbols trigger an early poll, at most this often
+MIN_POLL_GAP = 1.0
+
+_RESYNC = object()
+_hub = None
+_hub_lock = threading.Lock()
+
+
+class MarketFeed:
+    """Quotes from the shared quotes table, falling back to the market data cache"""
+    name = "market"
+
+    def quotes(self, symbols):
+        import database
+        import market_cache
+
+        symbols = list(symbols)
+        quotes = {symbol: (quote['price'], quote['previous_close'])
+                  for symbol, quote in database.load_quotes(symbols).items() if quote['price']}
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+        if missing:
+            # Same cache entries as market_cache.get_index_quotes, refetched per its TTL
+            for symbol, frame in market_cache.get_histories(missing, period="2d", interval="1d").items():
+                if frame is None or frame.empty or 'Close' not in frame.columns:
+                    continue
+                closes = frame['Close'].dropna()
+                if not closes.empty:
+                    quotes[symbol] = (float(closes.iloc[-1]),
+                                      float(closes.iloc[-2]) if len(closes) > 1 else None)
+        return quotes
+
+
+class SimulatedFeed:
+    """Random-walk quotes, starting from the quotes table or synthetic history"""
+    name = "simulated"
+
+    def __init__(self, seed=0, volatility=0.002):
+        self.seed = int(seed)
+        self.volatility = volatility
+        self._rng = np.random.default_rng(self.seed)
+        self._state = {}  # symbol -> [price, previous close]
+
+    def _start(self, symbols):
+        import database
+        import providers
+
+        stored = database.load_quotes(symbols)
+        missing = [s for s in symbols if s not in stored or not stored[s]['price']]
+        history = providers.SyntheticProvider(seed=self.seed).history(missing, "1d", "5d") if missing else {}
+        for symbol in symbols:
+            if symbol in stored and stored[symbol]['price']:
+                price, previous = stored[symbol]['price'], stored[symbol]['previous_close']
+            else:
+                frame = history.get(symbol)
+                closes = frame['Close'].to_numpy() if frame is not None and not frame.empty else np.array([100.0])
+                price, previous = float(closes[-1]), float(closes[-2]) if len(closes) > 1 else None
+            self._state[symbol] = [float(price), previous or float(price)]
+
+    def quotes(self, symbols):
+        symbols = list(symbols)
+        new = [s for s in symbols if s not in self._state]
+        if new:
+            self._start(new)
+        steps = np.exp(self.volatility * self._rng.standard_normal(len(symbols)))
+        quotes = {}
+        for symbol, step in zip(symbols, steps.tolist()):
+            state = self._state[symbol]
+            state[0] = round(state[0] * step, 4)
+            quotes[symbol] = (state[0], state[1])
+        return quotes
+
+
+def _sse(event, data, seq=None):
+    """One Server-Sent Events message"""
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _quote_payload(quotes):
+    payload = {}
+    for symbol, (price, previous) in quotes.items():
+        change = price - previous if previous else 0.0
+        payload[symbol] = {'price': price, 'previous_close': previous, 'change': change,
+                           'change_pct': change / previous * 100 if previous else 0.0}
+    return payload
+
+
+class Subscriber:
+    """One connected client: a bounded queue on the client's event loop"""
+
+    def __init__(self, user, loop):
+        import asyncio
+        self.user = user
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def offer(self, message):
+        """Queue a message; called from the poller thread"""
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        import asyncio
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog and send the current state instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC)
+
+    async def next(self, timeout):
+        """The next message, _RESYNC, or None if nothing arrived within timeout"""
+        import asyncio
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LiveHub:
+    """The shared poller and its subscribers (see module docstring)"""
+
+    def __init__(self, feed, interval=POLL_SECONDS):
+        self.feed = feed
+        self.interval = interval
+        self.polls = 0                # upstream feed calls made
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._quotes = {}             # symbol -> (price, previous close)
+        self._values = {}             # user -> last published portfolio values
+        self._dirty = set()           # users whose holdings changed since the last publish
+        self._seq = 0
+        self._poll_due = True
+        self._last_poll = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -- subscribers (called from the web server's event loop) --
+
+    def subscribe(self, user, loop):
+        subscriber = Subscriber(user, loop)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self._dirty.add(user)
+            self._poll_due = True
+        self.start()
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not any(s.user == subscriber.user for s in self._subscribers):
+                self._values.pop(subscriber.user, None)
+
+    def _on_change(self, username, version):
+        # A trade or re-pricing: recompute that user's values without polling
+        with self._lock:
+            if any(s.user == username for s in self._subscribers):
+                self._dirty.add(username)
+                self._wake.set()
+
+    # -- state --
+
+    def _held(self, user):
+        import portfolio_store
+        symbols = set()
+        for portfolio in portfolio_store.get_manager(user).portfolios.values():
+            symbols.update(portfolio.stocks)
+        return symbols
+
+    def _watched(self, user):
+        import market_cache
+        return set(market_cache.MARKET_INDICES) | self._held(user)
+
+    def _portfolio_values(self, user):
+        import portfolio_store
+        with self._lock:
+            prices = {symbol: quote[0] for symbol, quote in self._quotes.items()}
+        portfolios = {name: round(portfolio.value_at(prices), 2)
+                      for name, portfolio in portfolio_store.get_manager(user).portfolios.items()}
+        return {'total_value': round(sum(portfolios.values()), 2), 'portfolios': portfolios}
+
+    def snapshot(self, user):
+        """SSE messages with everything a client connecting now should see"""
+        watched = self._watched(user)
+        with self._lock:
+            quotes = {s: q for s, q in self._quotes.items() if s in watched}
+            seq = self._seq
+        return [_sse("quotes", {'seq': seq, 'quotes': _quote_payload(quotes)}, seq),
+                _sse("portfolios", self._portfolio_values(user), seq)]
+
+    # -- polling (poller thread) --
+
+    def _publish(self, users_changed, changed_quotes):
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            by_user = {}
+            for subscriber in self._subscribers:
+                by_user.setdefault(subscriber.user, []).append(subscriber)
+        for user, subscribers in by_user.items():
+            messages = []
+            if changed_quotes:
+                watched = self._watched(user)
+                mine = {s: q for s, q in changed_quotes.items() if s in watched}
+                if mine:
+                    messages.append(_sse("quotes", {'seq': seq, 'quotes': _quote_payload(mine)}, seq))
+            if user in users_changed:
+                values = self._portfolio_values(user)
+                with self._lock:
+                    moved = self._values.get(user) != values
+                    self._values[user] = values
+                if moved:
+                    messages.append(_sse("portfolios", values, seq))
+            # Encoded once per user, shared by all of that user's clients
+            for message in messages:
+                for subscriber in subscribers:
+                    subscriber.offer(message)
+
+    def poll_once(self):
+        """Fetch every watched symbol once and publish what changed"""
+        import market_cache
+        with self._lock:
+            users = {s.user for s in self._subscribers}
+            dirty, self._dirty = self._dirty, set()
+            self._poll_due = False
+            self._last_poll = time.monotonic()
+        if not users:
+            return
+        held = {user: self._held(user) for user in users}
+        symbols = set().union(*held.values()) | set(market_cache.MARKET_INDICES)
+        quotes = self.feed.quotes(sorted(symbols))
+        self.polls += 1
+        with self._lock:
+            changed = {s: q for s, q in quotes.items() if self._quotes.get(s) != q}
+            self._quotes.update(quotes)
+        users_changed = {user for user in users if user in dirty or held[user] & changed.keys()}
+        self._publish(users_changed, changed)
+
+    def _publish_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if dirty:
+            self._publish(dirty, {})
+
+    def _run(self):
+        import database
+        database.init_database()
+        while not self._stop.is_set():
+            wait = self._last_poll + self.interval - time.monotonic()
+            if self._poll_due:
+                wait = min(wait, self._last_poll + MIN_POLL_GAP - time.monotonic())
+            self._wake.wait(max(wait, 0.0))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                now = time.monotonic()
+                if now >= self._last_poll + self.interval or \
+                        (self._poll_due and now >= self._last_poll + MIN_POLL_GAP):
+                    self.poll_once()
+                else:
+                    self._publish_dirty()
+            except Exception as e:
+                self._last_poll = time.monotonic()
+                print(f"Live feed poll failed: {e}")
+
+    def start(self):
+        """Start the poller thread once (later calls are no-ops)"""
+        import portfolio_store
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+            self._thread.start()
+        portfolio_store.subscribe(self._on_change)
+
+    def stop(self, timeout=None):
+        import portfolio_store
+        portfolio_store.unsubscribe(self._on_change)
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    async def events(self, user, is_disconnected):
+        """The SSE stream for one client: a snapshot, then deltas and heartbeats"""
+        import asyncio
+        subscriber = self.subscribe(user, asyncio.get_running_loop())
+        try:
+            yield "retry: 5000\n\n"
+            for message in await asyncio.to_thread(self.snapshot, user):
+                yield message
+            while not await is_disconnected():
+                message = await subscriber.next(HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                elif message is _RESYNC:
+                    for message in await asyncio.to_thread(self.snapshot, user):
+                        yield message
+                else:
+                    yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def make_feed(kind=None):
+    """The feed named by LIVE_FEED (see module docstring)"""
+    kind = (kind or FEED).strip().lower()
+    if kind == "simulated":
+        return SimulatedFeed(seed=int(os.environ.get("LIVE_FEED_SEED", 0)))
+    if kind != "market":
+        raise ValueError(f"Unknown LIVE_FEED '{kind}'")
+    return MarketFeed()
+
+
+def get():
+    """The process-wide hub (created on first use)"""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = LiveHub(make_feed())
+    return _hub
+
+
+def use(hub):
+    """Replace the process-wide hub (e.g. LiveHub(SimulatedFeed()) in tests); returns the old one"""
+    global _hub
+    with _hub_lock:
+        previous, _hub = _hub, hub
+    if previous is not None:
+        previous.stop()
+    return previous
@@ -0,0 +1,256 @@
+# market_cache.py
+"""
+Process-wide cache for market data lookups.
+
+Every page and the FastAPI app read price history through this module so
+that repeated renders within a TTL never hit the network twice. Entries
+expire per key, the cache is bounded by (approximate) memory size with LRU
+eviction, and concurrent requests for the same (symbol, period, interval)
+share a single upstream fetch.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Seconds a history entry stays fresh, by bar interval
+INTRADAY_TTL = 60
+DAILY_TTL = 15 * 60
+LONG_TTL = 60 * 60
+# Empty results (unknown symbol, provider hiccup) are only remembered briefly
+EMPTY_TTL = 30
+
+MARKET_INDICES = {
+    "^GSPC": "S&P 500",
+    "^DJI": "Dow Jones",
+    "^IXIC": "NASDAQ",
+    "^VIX": "VIX"
+}
+
+
+def ttl_for(interval):
+    """Default freshness for bars of the given interval"""
+    if (interval.endswith("m") and not interval.endswith("mo")) or interval.endswith("h"):
+        return INTRADAY_TTL
+    if interval in ("1d", "5d"):
+        return DAILY_TTL
+    return LONG_TTL
+
+
+def _sizeof(value):
+    if hasattr(value, "memory_usage"):
+        try:
+            usage = value.memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+        except Exception:
+            pass
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def _detach(value):
+    # Callers add columns to returned frames (e.g. moving averages); hand out
+    # shallow copies so that never leaks back into the cached object.
+    if hasattr(value, "copy") and hasattr(value, "columns"):
+        return value.copy(deep=False)
+    return value
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class MarketDataCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key, now):
+        # caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at, size = entry
+        if expires_at <= now:
+            del self._entries[key]
+            self._bytes -= size
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value, ttl):
+        if callable(ttl):
+            ttl = ttl(value)
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def get(self, key, loader, ttl):
+        """Return the cached value for key, calling loader() once on a miss."""
+        return self.get_many([key], lambda keys: {keys[0]: loader()}, ttl)[key]
+
+    def get_many(self, keys, loader, ttl):
+        """Return {key: value} for keys, loading all misses with one loader(missing) call.
+
+        loader receives the list of keys this call is responsible for and must
+        return a dict covering them. Keys already being loaded by another thread
+        are waited on instead of fetched again. ttl may be a callable taking the
+        loaded value, for per-entry lifetimes.
+        """
+        now = time.monotonic()
+        result = {}
+        owned = {}
+        waiting = {}
+        with self._lock:
+            for key in keys:
+                if key in result or key in owned or key in waiting:
+                    continue
+                found, value = self._lookup(key, now)
+                if found:
+                    self.hits += 1
+                    result[key] = value
+                elif key in self._inflight:
+                    self.coalesced += 1
+                    waiting[key] = self._inflight[key]
+                else:
+                    self.misses += 1
+                    flight = self._inflight[key] = _Flight()
+                    owned[key] = flight
+
+        if owned:
+            try:
+                loaded = loader(list(owned))
+                for key, flight in owned.items():
+                    flight.value = loaded.get(key)
+                    self._store(key, flight.value, ttl)
+                    result[key] = flight.value
+            except BaseException as exc:
+                for flight in owned.values():
+                    flight.error = exc
+                raise
+            finally:
+                with self._lock:
+                    for key in owned:
+                        self._inflight.pop(key, None)
+                for flight in owned.values():
+                    flight.event.set()
+
+        for key, flight in waiting.items():
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            result[key] = flight.value
+
+        return {key: _detach(value) for key, value in result.items()}
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry[2]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+
+cache = MarketDataCache()
+
+
+def get_histories(symbols, period="1mo", interval="1d", ttl=None):
+    """OHLCV history per symbol as {symbol: DataFrame}; misses are fetched in one batch"""
+    symbols = list(dict.fromkeys(symbols))
+    keys = [(symbol, period, interval) for symbol in symbols]
+
+    def load(missing):
+        import history_store
+        fetched = history_store.get_frames([k[0] for k in missing], period, interval)
+        return {(symbol, period, interval): frame for symbol, frame in fetched.items()}
+
+    fresh_for = ttl if ttl is not None else ttl_for(interval)
+
+    def entry_ttl(frame):
+        return fresh_for if frame is not None and not frame.empty else min(fresh_for, EMPTY_TTL)
+
+    found = cache.get_many(keys, load, entry_ttl)
+    return {key[0]: found[key] for key in keys}
+
+
+def get_close_frame(symbols, period="1mo", interval="1d", ttl=None):
+    """Closing prices for several symbols as one aligned wide DataFrame (symbols as columns)"""
+    import market_fetch
+    daily = interval.endswith("d") or interval.endswith("wk") or interval.endswith("mo")
+    return market_fetch.align_closes(get_histories(symbols, period, interval, ttl), by_date=daily)
+
+
+def get_history(symbol, period="1mo", interval="1d", ttl=None):
+    """OHLCV history for one symbol (empty DataFrame when unavailable)"""
+    return get_histories([symbol], period, interval, ttl)[symbol]
+
+
+def get_index_quotes(indices=None):
+    """Latest close and day change for market indices, keyed by display name"""
+    indices = indices or MARKET_INDICES
+    histories = get_histories(list(indices), period="2d", interval="1d")
+
+    market_data = {}
+    for symbol, name in indices.items():
+        hist = histories.get(symbol)
+        if hist is None or hist.empty or 'Close' not in hist.columns:
+            continue
+        closes = hist['Close'].dropna()
+        if closes.empty:
+            continue
+        current = closes.iloc[-1]
+        previous = closes.iloc[-2] if len(closes) > 1 else current
+        change = current - previous
+        change_pct = (change / previous * 100) if previous != 0 else 0
+        market_data[name] = {
+            'current': float(current),
+            'change': float(change),
+            'change_pct': float(change_pct)
+        }
+    return market_data
+
+
+def stats():
+    return cache.stats()
@@ -0,0 +1,120 @@
+# market_fetch.py
+"""
+Batched, concurrent market data downloads.
+
+Symbols are grouped into multi-ticker batches that run on a bounded thread
+pool, each request with a timeout. A batch that fails outright (error or
+no data at all) is retried with exponential backoff. A 40-symbol chart therefore
+costs roughly one round-trip instead of forty serial ones. The data itself
+comes from the configured provider (see providers.py).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_SIZE = 20
+MAX_WORKERS = 4
+TIMEOUT = float(os.environ.get("YFINANCE_TIMEOUT", 30))
+RETRIES = 2
+BACKOFF = 0.25
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="market-fetch")
+    return _executor
+
+
+def _batches(symbols, size):
+    for i in range(0, len(symbols), size):
+        yield symbols[i:i + size]
+
+
+def _download(symbols, window, interval, timeout):
+    """One provider call for a batch; returns {symbol: DataFrame}"""
+    import providers
+    return providers.get().history(symbols, interval=interval, timeout=timeout, **window)
+
+
+def _fetch_batch(symbols, window, interval, timeout, retries, backoff):
+    import pandas as pd
+
+    results = {}
+    pending = list(symbols)
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * (2 ** (attempt - 1)))
+        try:
+            fetched = _download(pending, window, interval, timeout)
+        except Exception:
+            fetched = {}
+        got = {s: f for s, f in fetched.items() if f is not None and not f.empty}
+        results.update(got)
+        pending = [s for s in pending if s not in results]
+        # A batch that returned data for some symbols succeeded; the rest are
+        # most likely unknown tickers, not worth another round-trip.
+        if not pending or got:
+            break
+    for symbol in pending:
+        results[symbol] = pd.DataFrame()
+    return results
+
+
+def fetch_histories(symbols, period=None, interval="1d", start=None,
+                    batch_size=BATCH_SIZE, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF):
+    """Download OHLCV history for many symbols, bypassing every cache.
+
+    Either a yfinance period ("1mo", "5y", ...) or a start datetime is used.
+    Returns {symbol: DataFrame}; symbols that could not be fetched map to an
+    empty DataFrame.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    window = {"start": start} if start is not None else {"period": period}
+    batches = list(_batches(symbols, batch_size))
+    if len(batches) == 1:
+        return _fetch_batch(batches[0], window, interval, timeout, retries, backoff)
+
+    futures = [_pool().submit(_fetch_batch, batch, window, interval, timeout, retries, backoff)
+               for batch in batches]
+    results = {}
+    for future in futures:
+        results.update(future.result())
+    return {symbol: results[symbol] for symbol in symbols}
+
+
+def align_closes(histories, column='Close', by_date=False):
+    """One wide DataFrame of `column` per symbol on the union of their timestamps.
+
+    Intraday indexes are converted to UTC so symbols from different exchanges
+    line up; with by_date (daily and longer bars) rows are keyed by each bar's
+    local trading date instead. Gaps are left as NaN for the caller to fill.
+    """
+    import pandas as pd
+
+    series = {}
+    for symbol, frame in histories.items():
+        if frame is None or frame.empty or column not in frame.columns:
+            continue
+        values = frame[column]
+        index = values.index
+        if by_date:
+            if getattr(index, 'tz', None) is not None:
+                index = index.tz_localize(None)
+            values = values.set_axis(index.normalize())
+        elif getattr(index, 'tz', None) is None:
+            values = values.tz_localize('UTC')
+        else:
+            values = values.tz_convert('UTC')
+        series[symbol] = values[~values.index.duplicated(keep='last')]
+    if not series:
+        return pd.DataFrame()
+    return pd.concat(series, axis=1, sort=True)
@@ -2,9 +2,7 @@
 import streamlit as st
 from portfolio import PortfolioManager
 from transaction import Transaction
-from report import ReportGenerator
-import database
-import plotly.express as px
+import portfolio_store
 
 # ---------- Page Config ----------
 st.set_page_config(
@@ -45,16 +43,10 @@ st.markdown(
 )
 
 # ---------- App State ----------
-if "pm" not in st.session_state:
-    database.init_database()
-    pm = PortfolioManager()
-    pm.set_user("default")
-    pm.load_portfolios("default")
-    st.session_state.pm = pm
-    st.session_state.reporter = ReportGenerator(pm)
-    st.session_state.username = "default"
-
-pm: PortfolioManager = st.session_state.pm
+pm: PortfolioManager
+pm, changed_elsewhere = portfolio_store.bind_session(st.session_state)
+if changed_elsewhere:
+    st.toast("Portfolios were updated in another session.")
 
 # ---------- Header ----------
 st.markdown("<h1 class='title'>📊 Portfolio Management</h1>", unsafe_allow_html=True)
@@ -163,6 +155,9 @@ else:
             values = [row["Value"] for row in sorted_data]
             
             if labels and values:
+                # Imported here so the page starts without loading plotly
+                import plotly.express as px
+
                 try:
                     # Create two columns for pie and bar charts
                     col1, col2 = st.columns(2)
@@ -3,6 +3,8 @@ import streamlit as st
 from portfolio import PortfolioManager
 from transaction import Transaction
 import database
+import portfolio_store
+import symbols
 
 # ---------- Page Config ----------
 st.set_page_config(
@@ -42,15 +44,10 @@ st.markdown(
 )
 
 # ---------- App State ----------
-if "pm" not in st.session_state:
-    database.init_database()
-    pm = PortfolioManager()
-    pm.set_user("default")
-    pm.load_portfolios("default")
-    st.session_state.pm = pm
-    st.session_state.username = "default"
-
-pm: PortfolioManager = st.session_state.pm
+pm: PortfolioManager
+pm, changed_elsewhere = portfolio_store.bind_session(st.session_state)
+if changed_elsewhere:
+    st.toast("Portfolios were updated in another session.")
 
 # ---------- Header ----------
 st.markdown("<h1 class='title'>💹 Trading Platform</h1>", unsafe_allow_html=True)
@@ -82,7 +79,15 @@ else:
         st.markdown("<div class='glass' style='padding: 20px; margin: 10px 0;'>", unsafe_allow_html=True)
         
         pname_b = st.selectbox("Portfolio", options=list(pm.portfolios.keys()), key="buy_port")
-        sym_b = st.text_input("Stock Symbol", key="buy_sym", placeholder="e.g., AAPL")
+        sym_b = st.text_input("Stock Symbol", key="buy_sym", placeholder="e.g., AAPL or Apple")
+        if sym_b.strip():
+            match = symbols.lookup(sym_b)
+            if match:
+                st.caption(f"{match['name']} · {match['exchange']} · {match['currency']}")
+            else:
+                hits = symbols.search(sym_b, 5)
+                if hits:
+                    st.caption("Matches: " + ", ".join(f"{r['symbol']} ({r['name']})" for r in hits))
         qty_b = st.number_input("Quantity", min_value=1, value=1, step=1, key="buy_qty")
         price_b = st.number_input("Price per share ($)", min_value=0.0, value=100.0, step=0.01, key="buy_price")
         
@@ -91,16 +96,20 @@ else:
         st.info(f"Total Cost: ${total_cost:,.2f}")
         
         if st.button("🚀 Execute Buy Order", type="primary", use_container_width=True):
-            if sym_b.strip():
-                tx = Transaction(sym_b.strip().upper(), 'buy', int(qty_b), float(price_b))
-                pm.process_transaction(pname_b, tx)
-                p = pm.get_portfolio(pname_b)
-                if p:
-                    database.save_portfolio(p, st.session_state.username)
-                st.success(f"✅ Bought {qty_b} shares of {sym_b.upper()} @ ${price_b:.2f} in {pname_b}")
-                st.balloons()
+            try:
+                sym_b = symbols.validate(sym_b)
+            except ValueError as e:
+                st.error(str(e))
             else:
-                st.error("Please enter a valid stock symbol")
+                tx = Transaction(sym_b, 'buy', int(qty_b), float(price_b))
+                with portfolio_store.edit(st.session_state.username, st.session_state.pm_session_id,
+                                          portfolios=pname_b) as draft:
+                    draft.process_transaction(pname_b, tx)
+                    p = draft.get_portfolio(pname_b)
+                    if p:
+                        database.save_portfolio(p, st.session_state.username)
+                st.success(f"✅ Bought {qty_b} shares of {sym_b} @ ${price_b:.2f} in {pname_b}")
+                st.balloons()
         
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -132,18 +141,24 @@ else:
         st.info(f"Total Proceeds: ${total_proceeds:,.2f}")
         
         if st.button("📉 Execute Sell Order", use_container_width=True):
-            if sym_s and sym_s.strip():
-                tx = Transaction(sym_s.strip().upper(), 'sell', int(qty_s), float(price_s))
+            try:
+                # Held symbols can always be sold, even ones the master doesn't list
+                if not (selected_portfolio and sym_s in selected_portfolio.stocks):
+                    sym_s = symbols.validate(sym_s)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                tx = Transaction(sym_s, 'sell', int(qty_s), float(price_s))
                 try:
-                    pm.process_transaction(pname_s, tx)
-                    p = pm.get_portfolio(pname_s)
-                    if p:
-                        database.save_portfolio(p, st.session_state.username)
-                    st.success(f"✅ Sold {qty_s} shares of {sym_s.upper()} @ ${price_s:.2f} from {pname_s}")
+                    with portfolio_store.edit(st.session_state.username, st.session_state.pm_session_id,
+                                              portfolios=pname_s) as draft:
+                        draft.process_transaction(pname_s, tx)
+                        p = draft.get_portfolio(pname_s)
+                        if p:
+                            database.save_portfolio(p, st.session_state.username)
+                    st.success(f"✅ Sold {qty_s} shares of {sym_s} @ ${price_s:.2f} from {pname_s}")
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
-            else:
-                st.error("Please select or enter a valid stock symbol")
         
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -180,6 +195,57 @@ if pm.portfolios:
 
 st.markdown("</div>", unsafe_allow_html=True)
 
+# Trade Ledger
+st.write("")
+st.markdown("<div class='glass'>", unsafe_allow_html=True)
+st.subheader("🧾 Trade History")
+
+if pm.portfolios:
+    hist_col1, hist_col2 = st.columns([3, 1])
+    with hist_col1:
+        pname_h = st.selectbox("Portfolio", options=list(pm.portfolios.keys()), key="hist_port")
+    with hist_col2:
+        page_size = st.selectbox("Rows per page", options=[25, 50, 100], key="hist_page_size")
+
+    # Cursors of the pages visited so far; the last one is the page shown
+    view = (st.session_state.username, pname_h, page_size)
+    if st.session_state.get("hist_view") != view:
+        st.session_state.hist_view = view
+        st.session_state.hist_cursors = [None]
+    cursors = st.session_state.hist_cursors
+
+    trades, next_cursor = database.transaction_history(
+        st.session_state.username, pname_h, limit=page_size, before=cursors[-1]
+    )
+    if trades:
+        st.dataframe([
+            {
+                "Time (UTC)": t["executed_at"][:19],
+                "Side": t["side"].upper(),
+                "Symbol": t["symbol"],
+                "Quantity": t["quantity"],
+                "Price": f"${t['price']:.2f}",
+                "Amount": f"${t['quantity'] * t['price']:,.2f}",
+            }
+            for t in trades
+        ], use_container_width=True, hide_index=True)
+    else:
+        st.info("No trades recorded for this portfolio yet")
+
+    nav_prev, nav_page, nav_next = st.columns([1, 2, 1])
+    with nav_prev:
+        if st.button("⬅️ Newer", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with nav_page:
+        st.markdown(f"<div style='text-align: center;'>Page {len(cursors)}</div>", unsafe_allow_html=True)
+    with nav_next:
+        if st.button("Older ➡️", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+
+st.markdown("</div>", unsafe_allow_html=True)
+
 # Quick Actions
 st.write("")
 st.markdown("<div class='glass' style='text-align: center; padding: 20px;'>", unsafe_allow_html=True)
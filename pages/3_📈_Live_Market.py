@@ -3,9 +3,11 @@ import streamlit as st
 from portfolio import PortfolioManager
 from transaction import Transaction
 import database
-import yfinance as yf
-import plotly.graph_objects as go
-import pandas as pd
+import portfolio_store
+import market_cache
+import providers
+import symbols
+import downsample
 
 # ---------- Page Config ----------
 st.set_page_config(
@@ -45,15 +47,10 @@ st.markdown(
 )
 
 # ---------- App State ----------
-if "pm" not in st.session_state:
-    database.init_database()
-    pm = PortfolioManager()
-    pm.set_user("default")
-    pm.load_portfolios("default")
-    st.session_state.pm = pm
-    st.session_state.username = "default"
-
-pm: PortfolioManager = st.session_state.pm
+pm: PortfolioManager
+pm, changed_elsewhere = portfolio_store.bind_session(st.session_state)
+if changed_elsewhere:
+    st.toast("Portfolios were updated in another session.")
 
 # ---------- Header ----------
 st.markdown("<h1 class='title'>📈 Live Market Data</h1>", unsafe_allow_html=True)
@@ -72,6 +69,8 @@ with st.sidebar:
 # ---------- Live Market Content ----------
 st.markdown("<div class='glass'>", unsafe_allow_html=True)
 st.subheader("Real-time Market Analysis")
+if providers.get().offline:
+    st.caption(f"📴 Offline market data ({providers.get().name} provider): prices are simulated or recorded, not live.")
 
 # Market Data Controls
 sym_input = st.text_input("Stock Symbols (comma separated)", value="AAPL, MSFT, TSLA, GOOGL", key="live_syms")
@@ -111,6 +110,9 @@ def validate_period_interval(period, interval):
     return True, ""
 
 if go_btn and sym_input.strip():
+    # Charting libraries are only needed once a chart is requested
+    import plotly.graph_objects as go
+
     is_valid, error_msg = validate_period_interval(period, interval)
     if not is_valid:
         st.error(f"Invalid period/interval combination: {error_msg}")
@@ -118,26 +120,20 @@ if go_btn and sym_input.strip():
     else:
         try:
             with st.spinner("Fetching market data..."):
-                tickers = [s.strip().upper() for s in sym_input.split(",") if s.strip()]
+                tickers, unknown = symbols.split_known(sym_input)
+                if unknown:
+                    st.warning(f"Skipped unknown symbols: {', '.join(unknown)}")
 
-                # Enhanced error handling and data fetching
-                if len(tickers) == 1:
-                    data = yf.download(tickers[0], period=period, interval=interval, auto_adjust=True, progress=False)
-                    if not data.empty:
-                        data = {tickers[0]: data}
-                else:
-                    data = yf.download(tickers, period=period, interval=interval, group_by='ticker', auto_adjust=True, threads=True, progress=False)
+                # Served from the shared market data cache; misses are fetched in one batch
+                data = market_cache.get_histories(tickers, period, interval)
 
-                # Enhanced data processing
-                plot_rows = []
+                # Close series per ticker, kept as arrays; only the plotted copies are downsampled
+                closes = {}
                 latest_prices = {}
 
                 for t in tickers:
                     try:
-                        if len(tickers) == 1:
-                            df = data.get(t, data) if isinstance(data, dict) else data
-                        else:
-                            df = data[t] if t in data.columns.get_level_values(0) else None
+                        df = data.get(t)
 
                         if df is None or df.empty:
                             st.warning(f"No data available for {t}")
@@ -157,29 +153,21 @@ if go_btn and sym_input.strip():
                             continue
 
                         latest_prices[t] = float(close_col.iloc[-1])
-
-                        for ts, price in close_col.items():
-                            plot_rows.append({
-                                "Datetime": ts,
-                                "Symbol": t,
-                                "Close": float(price)
-                            })
+                        closes[t] = close_col.astype(float)
                     except Exception as e:
                         st.error(f"Error processing {t}: {str(e)}")
                         continue
 
-                if not plot_rows:
+                if not closes:
                     st.info("No price data returned for the given inputs.")
                 else:
-                    pdf = pd.DataFrame(plot_rows)
-
                     # Market Statistics
                     st.markdown("### 📈 Market Overview")
                     market_cols = st.columns(len(tickers))
 
                     for i, ticker in enumerate(tickers):
                         if ticker in latest_prices:
-                            ticker_data = pdf[pdf['Symbol'] == ticker]['Close']
+                            ticker_data = closes[ticker]
                             if not ticker_data.empty:
                                 current_price = latest_prices[ticker]
                                 start_price = ticker_data.iloc[0]
@@ -201,12 +189,18 @@ if go_btn and sym_input.strip():
                     # TradingView color scheme for different symbols
                     tv_colors = ['#2962ff', '#ff6d00', '#00c853', '#e91e63', '#9c27b0', '#ff9800', '#795548']
 
+                    bars = plotted = 0
                     for i, ticker in enumerate(tickers):
-                        ticker_data = pdf[pdf['Symbol'] == ticker]
-                        if not ticker_data.empty:
+                        if ticker not in closes:
+                            continue
+                        # About one point per pixel (see downsample.py)
+                        points = downsample.line(closes[ticker], key=(ticker, interval))
+                        bars += len(closes[ticker])
+                        plotted += len(points)
+                        if not points.empty:
                             fig.add_trace(go.Scatter(
-                                x=ticker_data['Datetime'],
-                                y=ticker_data['Close'],
+                                x=points.index,
+                                y=points.to_numpy(),
                                 mode='lines',
                                 name=ticker,
                                 line=dict(
@@ -259,13 +253,15 @@ if go_btn and sym_input.strip():
                     )
 
                     st.plotly_chart(fig, use_container_width=True)
+                    if plotted < bars:
+                        st.caption(f"Showing {plotted:,} of {bars:,} bars, downsampled to the chart width.")
 
                     # Market Summary Table
                     st.markdown("### 📊 Market Summary")
                     summary_data = []
                     for ticker in tickers:
                         if ticker in latest_prices:
-                            ticker_data = pdf[pdf['Symbol'] == ticker]['Close']
+                            ticker_data = closes[ticker]
                             if not ticker_data.empty:
                                 current_price = latest_prices[ticker]
                                 start_price = ticker_data.iloc[0]
@@ -329,19 +325,23 @@ if latest_prices and pm.portfolios:
         c1, c2 = st.columns(2)
         if c1.button("🟢 Buy", key="live_buy", use_container_width=True):
             tx = Transaction(q_sym, 'buy', int(q_qty), float(latest_prices[q_sym]))
-            pm.process_transaction(q_port, tx)
-            p = pm.get_portfolio(q_port)
-            if p:
-                database.save_portfolio(p, st.session_state.username)
+            with portfolio_store.edit(st.session_state.username, st.session_state.pm_session_id,
+                                      portfolios=q_port) as draft:
+                draft.process_transaction(q_port, tx)
+                p = draft.get_portfolio(q_port)
+                if p:
+                    database.save_portfolio(p, st.session_state.username)
             st.success(f"✅ Bought {q_qty} {q_sym} @ ${latest_prices[q_sym]:.2f}")
             st.rerun()
         if c2.button("🔴 Sell", key="live_sell", use_container_width=True):
             tx = Transaction(q_sym, 'sell', int(q_qty), float(latest_prices[q_sym]))
             try:
-                pm.process_transaction(q_port, tx)
-                p = pm.get_portfolio(q_port)
-                if p:
-                    database.save_portfolio(p, st.session_state.username)
+                with portfolio_store.edit(st.session_state.username, st.session_state.pm_session_id,
+                                          portfolios=q_port) as draft:
+                    draft.process_transaction(q_port, tx)
+                    p = draft.get_portfolio(q_port)
+                    if p:
+                        database.save_portfolio(p, st.session_state.username)
                 st.success(f"✅ Sold {q_qty} {q_sym} @ ${latest_prices[q_sym]:.2f}")
                 st.rerun()
             except Exception as e:
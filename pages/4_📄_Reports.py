@@ -2,7 +2,7 @@
 import streamlit as st
 from portfolio import PortfolioManager
 from report import ReportGenerator
-import database
+import portfolio_store
 
 # ---------- Page Config ----------
 st.set_page_config(
@@ -42,17 +42,11 @@ st.markdown(
 )
 
 # ---------- App State ----------
-if "pm" not in st.session_state:
-    database.init_database()
-    pm = PortfolioManager()
-    pm.set_user("default")
-    pm.load_portfolios("default")
-    st.session_state.pm = pm
-    st.session_state.reporter = ReportGenerator(pm)
-    st.session_state.username = "default"
-
-pm: PortfolioManager = st.session_state.pm
-reporter: ReportGenerator = st.session_state.reporter
+pm: PortfolioManager
+pm, changed_elsewhere = portfolio_store.bind_session(st.session_state)
+if changed_elsewhere:
+    st.toast("Portfolios were updated in another session.")
+reporter = ReportGenerator(pm)
 
 # ---------- Header ----------
 st.markdown("<h1 class='title'>📄 Portfolio Reports</h1>", unsafe_allow_html=True)
@@ -105,8 +99,7 @@ else:
                 st.metric("Positions", num_positions)
                 
                 if portfolio.stocks:
-                    top_holding = max(portfolio.stocks.items(), 
-                                    key=lambda x: x[1]['stock'].price * x[1]['quantity'])
+                    top_holding = portfolio.top_holdings(1)[0]
                     st.metric("Top Holding", top_holding[0])
 
     # Generate Report Button
@@ -1,14 +1,14 @@
 # pages/6_📊_Charts.py - Advanced Portfolio Charts & Analytics
 import streamlit as st
 from portfolio import PortfolioManager
-import database
-import yfinance as yf
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+import portfolio_store
+import market_cache
+import providers
+import symbols
+import downsample
+import valuation
+import covariance
+import indicators
 
 # ---------- Page Config ----------
 st.set_page_config(
@@ -55,14 +55,6 @@ st.markdown(
 )
 
 # ---------- App State ----------
-if "pm" not in st.session_state:
-    database.init_database()
-    pm = PortfolioManager()
-    pm.set_user("default")
-    pm.load_portfolios("default")
-    st.session_state.pm = pm
-    st.session_state.username = "default"
-
 # Initialize chart data session state
 if "chart_data" not in st.session_state:
     st.session_state.chart_data = None
@@ -71,7 +63,10 @@ if "chart_period" not in st.session_state:
 if "chart_interval" not in st.session_state:
     st.session_state.chart_interval = "1d"
 
-pm: PortfolioManager = st.session_state.pm
+pm: PortfolioManager
+pm, changed_elsewhere = portfolio_store.bind_session(st.session_state)
+if changed_elsewhere:
+    st.toast("Portfolios were updated in another session.")
 
 # ---------- Sidebar Navigation ----------
 st.sidebar.header("🚀 Navigation")
@@ -91,13 +86,16 @@ st.markdown("---")
 # ---------- Chart Type Selection ----------
 st.markdown("<div class='glass'>", unsafe_allow_html=True)
 st.subheader("📈 Chart Configuration")
+if providers.get().offline:
+    st.caption(f"📴 Offline market data ({providers.get().name} provider): prices are simulated or recorded, not live.")
 
 col1, col2, col3 = st.columns(3)
 
 with col1:
     chart_type = st.selectbox(
         "Chart Type",
-        ["Price Chart", "Candlestick Chart", "Volume Chart", "Comparison Chart", "Portfolio Performance"],
+        ["Price Chart", "Candlestick Chart", "Volume Chart", "Comparison Chart", "Portfolio Performance",
+         "Correlation & Risk"],
         key="chart_type_select"
     )
 
@@ -113,9 +111,11 @@ st.markdown("</div>", unsafe_allow_html=True)
 st.write("")
 
 # ---------- Stock/Portfolio Selection ----------
+PORTFOLIO_CHARTS = ("Portfolio Performance", "Correlation & Risk")
+
 st.markdown("<div class='glass'>", unsafe_allow_html=True)
 
-if chart_type == "Portfolio Performance":
+if chart_type in PORTFOLIO_CHARTS:
     st.subheader("📊 Select Portfolio")
     if pm.portfolios:
         selected_portfolio = st.selectbox(
@@ -165,7 +165,9 @@ else:
             value="AAPL, MSFT, GOOGL, TSLA",
             key="custom_symbols_input"
         )
-        selected_symbols = [s.strip().upper() for s in symbols_input.split(",") if s.strip()]
+        selected_symbols, unknown_symbols = symbols.split_known(symbols_input)
+        if unknown_symbols:
+            st.warning(f"Unknown symbols ignored: {', '.join(unknown_symbols)}")
 
 load_chart_btn = st.button("📊 Generate Chart", type="primary", use_container_width=True)
 
@@ -194,9 +196,16 @@ def validate_period_interval(period, interval):
 
 # ---------- Chart Generation ----------
 if load_chart_btn:
-    if chart_type == "Portfolio Performance" and not selected_portfolio:
+    # Charting libraries are only needed once a chart is requested
+    import numpy as np
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    if chart_type in PORTFOLIO_CHARTS and not selected_portfolio:
         st.error("Please select a portfolio.")
-    elif chart_type != "Portfolio Performance" and not selected_symbols:
+    elif chart_type not in PORTFOLIO_CHARTS and not selected_symbols:
         st.error("Please select at least one stock symbol.")
     else:
         is_valid, error_msg = validate_period_interval(period, interval)
@@ -214,12 +223,15 @@ if load_chart_btn:
                         fig = go.Figure()
                         colors = ['#2962ff', '#ff6d00', '#00c853', '#e91e63', '#9c27b0', '#ff9800']
                         
+                        histories = market_cache.get_histories(selected_symbols, period, interval)
                         for idx, symbol in enumerate(selected_symbols):
-                            data = yf.download(symbol, period=period, interval=interval, progress=False)
+                            data = histories[symbol]
                             if not data.empty and 'Close' in data.columns:
+                                # About one point per pixel (see downsample.py)
+                                points = downsample.line(data['Close'], key=(symbol, interval))
                                 fig.add_trace(go.Scatter(
-                                    x=data.index,
-                                    y=data['Close'],
+                                    x=points.index,
+                                    y=points.to_numpy(),
                                     mode='lines',
                                     name=symbol,
                                     line=dict(color=colors[idx % len(colors)], width=2),
@@ -249,15 +261,17 @@ if load_chart_btn:
                         
                         # Candlestick works best with single stock
                         symbol = selected_symbols[0] if selected_symbols else "AAPL"
-                        data = yf.download(symbol, period=period, interval=interval, progress=False)
+                        data = market_cache.get_history(symbol, period, interval)
                         
                         if not data.empty:
+                            # Consecutive bars merged down to the chart width, extremes kept
+                            candles = downsample.ohlc(data, key=(symbol, interval))
                             fig = go.Figure(data=[go.Candlestick(
-                                x=data.index,
-                                open=data['Open'],
-                                high=data['High'],
-                                low=data['Low'],
-                                close=data['Close'],
+                                x=candles.index,
+                                open=candles['Open'],
+                                high=candles['High'],
+                                low=candles['Low'],
+                                close=candles['Close'],
                                 name=symbol
                             )])
                             
@@ -275,20 +289,49 @@ if load_chart_btn:
                             
                             st.plotly_chart(fig, use_container_width=True)
                             
-                            # Add technical indicators
+                            # Add technical indicators (memoized and extended bar by bar, see indicators.py)
                             st.markdown("#### 📊 Technical Indicators")
-                            data['SMA_20'] = data['Close'].rolling(window=20).mean()
-                            data['SMA_50'] = data['Close'].rolling(window=50).mean()
-                            
-                            fig2 = go.Figure()
-                            fig2.add_trace(go.Scatter(x=data.index, y=data['Close'], name='Close', line=dict(color='#2962ff')))
-                            fig2.add_trace(go.Scatter(x=data.index, y=data['SMA_20'], name='SMA 20', line=dict(color='#ff6d00', dash='dash')))
-                            fig2.add_trace(go.Scatter(x=data.index, y=data['SMA_50'], name='SMA 50', line=dict(color='#00c853', dash='dash')))
-                            
+                            start = int(data.index[0].timestamp())
+                            tz = data.index.tz
+                            intraday = interval not in ("1d", "5d", "1wk", "1mo", "3mo")
+                            studies = [indicators.SMA(20), indicators.SMA(50), indicators.Bollinger(20),
+                                       indicators.VWAP() if intraday else indicators.VWAP(20),
+                                       indicators.RSI(14), indicators.MACD(), indicators.ATR(14)]
+                            ta = pd.concat([indicators.compute(symbol, interval, study, start, tz)
+                                            for study in studies], axis=1)
+                            vwap_column = studies[3].columns[0]
+                            # Plotted at the bars LTTB keeps from the close; ATR below uses the full series
+                            close_points = downsample.line(data['Close'], key=(symbol, interval))
+                            ta_points = ta.reindex(close_points.index)
+
+                            fig2 = make_subplots(
+                                rows=3, cols=1,
+                                shared_xaxes=True,
+                                vertical_spacing=0.04,
+                                subplot_titles=("Moving Averages & Bollinger Bands", "RSI (14)", "MACD (12, 26, 9)"),
+                                row_heights=[0.55, 0.2, 0.25]
+                            )
+                            fig2.add_trace(go.Scatter(x=ta_points.index, y=ta_points['BB_upper'], name='BB Upper',
+                                                      line=dict(color='rgba(156, 39, 176, 0.4)', width=1)), row=1, col=1)
+                            fig2.add_trace(go.Scatter(x=ta_points.index, y=ta_points['BB_lower'], name='BB Lower',
+                                                      line=dict(color='rgba(156, 39, 176, 0.4)', width=1),
+                                                      fill='tonexty', fillcolor='rgba(156, 39, 176, 0.08)'), row=1, col=1)
+                            fig2.add_trace(go.Scatter(x=close_points.index, y=close_points.to_numpy(), name='Close', line=dict(color='#2962ff')), row=1, col=1)
+                            fig2.add_trace(go.Scatter(x=ta_points.index, y=ta_points['SMA_20'], name='SMA 20', line=dict(color='#ff6d00', dash='dash')), row=1, col=1)
+                            fig2.add_trace(go.Scatter(x=ta_points.index, y=ta_points['SMA_50'], name='SMA 50', line=dict(color='#00c853', dash='dash')), row=1, col=1)
+                            fig2.add_trace(go.Scatter(x=ta_points.index, y=ta_points[vwap_column], name='VWAP', line=dict(color='#e91e63', dash='dot')), row=1, col=1)
+
+                            fig2.add_trace(go.Scatter(x=ta_points.index, y=ta_points['RSI_14'], name='RSI', line=dict(color='#ff9800')), row=2, col=1)
+                            fig2.add_hline(y=70, line=dict(color='#f44336', dash='dot', width=1), row=2, col=1)
+                            fig2.add_hline(y=30, line=dict(color='#00c853', dash='dot', width=1), row=2, col=1)
+
+                            fig2.add_trace(go.Bar(x=ta_points.index, y=ta_points['MACD_hist'], name='Histogram',
+                                                  marker_color=np.where(ta_points['MACD_hist'].to_numpy() >= 0, '#00c853', '#f44336')), row=3, col=1)
+                            fig2.add_trace(go.Scatter(x=ta_points.index, y=ta_points['MACD'], name='MACD', line=dict(color='#2962ff')), row=3, col=1)
+                            fig2.add_trace(go.Scatter(x=ta_points.index, y=ta_points['MACD_signal'], name='Signal', line=dict(color='#ff6d00')), row=3, col=1)
+
                             fig2.update_layout(
-                                title="Moving Averages",
-                                xaxis_title="Date",
-                                yaxis_title="Price ($)",
+                                height=800,
                                 paper_bgcolor='#1a1a1a',
                                 plot_bgcolor='#1a1a1a',
                                 font=dict(color='#d1d5db'),
@@ -298,6 +341,8 @@ if load_chart_btn:
                             fig2.update_yaxes(showgrid=True, gridcolor='#2a2a2a')
                             
                             st.plotly_chart(fig2, use_container_width=True)
+                            if not ta['ATR_14'].dropna().empty:
+                                st.caption(f"ATR (14): ${ta['ATR_14'].dropna().iloc[-1]:,.2f} average true range per bar")
                         else:
                             st.warning(f"No data available for {symbol}")
                         
@@ -309,7 +354,7 @@ if load_chart_btn:
                         st.markdown("### 📊 Volume Analysis")
                         
                         symbol = selected_symbols[0] if selected_symbols else "AAPL"
-                        data = yf.download(symbol, period=period, interval=interval, progress=False)
+                        data = market_cache.get_history(symbol, period, interval)
                         
                         if not data.empty and 'Volume' in data.columns:
                             # Create subplot with price and volume
@@ -322,16 +367,17 @@ if load_chart_btn:
                             )
                             
                             # Price chart
+                            points = downsample.line(data['Close'], key=(symbol, interval))
                             fig.add_trace(
-                                go.Scatter(x=data.index, y=data['Close'], name='Price', line=dict(color='#2962ff')),
+                                go.Scatter(x=points.index, y=points.to_numpy(), name='Price', line=dict(color='#2962ff')),
                                 row=1, col=1
                             )
                             
-                            # Volume chart
-                            colors_vol = ['#00c853' if data['Close'].iloc[i] >= data['Open'].iloc[i] else '#f44336' 
-                                         for i in range(len(data))]
+                            # Volume chart (merged bars sum their volume)
+                            candles = downsample.ohlc(data, key=(symbol, interval))
+                            colors_vol = np.where(candles['Close'].to_numpy() >= candles['Open'].to_numpy(), '#00c853', '#f44336')
                             fig.add_trace(
-                                go.Bar(x=data.index, y=data['Volume'], name='Volume', marker_color=colors_vol),
+                                go.Bar(x=candles.index, y=candles['Volume'], name='Volume', marker_color=colors_vol),
                                 row=2, col=1
                             )
                             
@@ -359,13 +405,19 @@ if load_chart_btn:
                         fig = go.Figure()
                         colors = ['#2962ff', '#ff6d00', '#00c853', '#e91e63', '#9c27b0', '#ff9800']
                         
+                        # One batched fetch, aligned on a shared date index
+                        closes = market_cache.get_close_frame(selected_symbols, period, interval)
                         for idx, symbol in enumerate(selected_symbols):
-                            data = yf.download(symbol, period=period, interval=interval, progress=False)
-                            if not data.empty and 'Close' in data.columns:
-                                # Normalize to percentage change from start
-                                normalized = (data['Close'] / data['Close'].iloc[0] - 1) * 100
+                            if symbol not in closes.columns:
+                                continue
+                            series = closes[symbol].dropna()
+                            if not series.empty:
+                                # Normalize to percentage change from start; LTTB picks the
+                                # same points either way, so the close is downsampled first
+                                points = downsample.line(series, key=(symbol, interval))
+                                normalized = (points.to_numpy() / series.iloc[0] - 1) * 100
                                 fig.add_trace(go.Scatter(
-                                    x=data.index,
+                                    x=points.index,
                                     y=normalized,
                                     mode='lines',
                                     name=symbol,
@@ -396,32 +448,20 @@ if load_chart_btn:
                         
                         portfolio = pm.get_portfolio(selected_portfolio)
                         if portfolio and portfolio.stocks:
-                            # Get all symbols in portfolio
-                            symbols = list(portfolio.stocks.keys())
-                            
-                            # Create portfolio value over time
-                            portfolio_values = []
-                            dates = None
-                            
-                            for symbol in symbols:
-                                stock_data = portfolio.stocks[symbol]
-                                quantity = stock_data['quantity']
-                                
-                                hist_data = yf.download(symbol, period=period, interval=interval, progress=False)
-                                if not hist_data.empty and 'Close' in hist_data.columns:
-                                    if dates is None:
-                                        dates = hist_data.index
-                                    portfolio_values.append(hist_data['Close'] * quantity)
+                            # Value over time from the trade ledger and stored bars,
+                            # aligned across trading calendars (see valuation.py)
+                            total_portfolio_value = valuation.value_series(
+                                st.session_state.username, portfolio, period, interval
+                            )
                             
-                            if portfolio_values and dates is not None:
-                                # Sum all stock values
-                                total_portfolio_value = pd.concat(portfolio_values, axis=1).sum(axis=1)
+                            if not total_portfolio_value.empty:
+                                points = downsample.line(total_portfolio_value)
                                 
                                 # Create chart
                                 fig = go.Figure()
                                 fig.add_trace(go.Scatter(
-                                    x=dates,
-                                    y=total_portfolio_value,
+                                    x=points.index,
+                                    y=points.to_numpy(),
                                     mode='lines',
                                     name='Portfolio Value',
                                     line=dict(color='#2962ff', width=3),
@@ -445,12 +485,10 @@ if load_chart_btn:
                                 
                                 # Portfolio composition pie chart
                                 st.markdown("#### 📊 Current Portfolio Composition")
-                                composition_data = []
-                                for symbol, stock_data in portfolio.stocks.items():
-                                    value = stock_data['stock'].price * stock_data['quantity']
-                                    composition_data.append({'Symbol': symbol, 'Value': value})
-                                
-                                comp_df = pd.DataFrame(composition_data)
+                                comp_df = pd.DataFrame({
+                                    'Symbol': portfolio.symbols(),
+                                    'Value': portfolio.position_values()
+                                })
                                 fig_pie = px.pie(
                                     comp_df,
                                     values='Value',
@@ -469,6 +507,77 @@ if load_chart_btn:
                             st.warning("Portfolio is empty.")
                         
                         st.markdown("</div>", unsafe_allow_html=True)
+
+                    # ========== CORRELATION & RISK ==========
+                    elif chart_type == "Correlation & Risk":
+                        st.markdown("<div class='chart-card'>", unsafe_allow_html=True)
+                        st.markdown(f"### 🧮 Correlation & Risk: {selected_portfolio}")
+
+                        portfolio = pm.get_portfolio(selected_portfolio)
+                        if portfolio and len(portfolio.stocks) >= 2:
+                            # Exponentially weighted covariance from stored bars,
+                            # updated bar by bar between reruns (see covariance.py)
+                            corr_symbols, corr = covariance.correlation(portfolio.symbols(), period, interval)
+                            risk = covariance.risk_contributions(portfolio, period, interval)
+
+                            fig = go.Figure(go.Heatmap(
+                                z=corr,
+                                x=corr_symbols,
+                                y=corr_symbols,
+                                zmin=-1,
+                                zmax=1,
+                                colorscale='RdBu_r',
+                                hovertemplate='%{y} / %{x}: %{z:.2f}<extra></extra>'
+                            ))
+                            fig.update_layout(
+                                title="Return Correlation (EWMA)",
+                                height=max(450, min(1200, 18 * len(corr_symbols))),
+                                paper_bgcolor='#1a1a1a',
+                                plot_bgcolor='#1a1a1a',
+                                font=dict(color='#d1d5db')
+                            )
+                            st.plotly_chart(fig, use_container_width=True)
+
+                            st.markdown("#### 🎯 Risk Contributions")
+                            st.caption(f"Annualized portfolio volatility: {risk.attrs['volatility']:.1%}. "
+                                       "Each bar is a holding's share of it (weight × marginal risk).")
+                            top = risk.head(30)
+                            fig_risk = go.Figure()
+                            fig_risk.add_trace(go.Bar(
+                                x=top['Symbol'],
+                                y=top['Share'] * 100,
+                                name='Share of Risk',
+                                marker_color='#ff6d00',
+                                hovertemplate='%{x}: %{y:.1f}% of risk<extra></extra>'
+                            ))
+                            fig_risk.add_trace(go.Bar(
+                                x=top['Symbol'],
+                                y=top['Weight'] * 100,
+                                name='Weight',
+                                marker_color='#2962ff',
+                                hovertemplate='%{x}: %{y:.1f}% of value<extra></extra>'
+                            ))
+                            fig_risk.update_layout(
+                                barmode='group',
+                                yaxis_title="%",
+                                paper_bgcolor='#1a1a1a',
+                                plot_bgcolor='#1a1a1a',
+                                font=dict(color='#d1d5db')
+                            )
+                            st.plotly_chart(fig_risk, use_container_width=True)
+
+                            st.dataframe(
+                                risk.style.format({
+                                    'Weight': '{:.1%}', 'Volatility': '{:.1%}', 'Marginal': '{:.1%}',
+                                    'Contribution': '{:.2%}', 'Share': '{:.1%}'
+                                }),
+                                use_container_width=True,
+                                hide_index=True
+                            )
+                        else:
+                            st.warning("Correlation needs a portfolio with at least two holdings.")
+
+                        st.markdown("</div>", unsafe_allow_html=True)
                 
             except Exception as e:
                 st.error(f"Error generating chart: {str(e)}")
@@ -484,7 +593,8 @@ tips = {
     "Candlestick Chart": "Analyze OHLC (Open, High, Low, Close) data with technical indicators",
     "Volume Chart": "Understand trading volume patterns and price-volume relationships",
     "Comparison Chart": "Compare relative performance of different stocks (normalized)",
-    "Portfolio Performance": "Monitor your entire portfolio value over time"
+    "Portfolio Performance": "Monitor your entire portfolio value over time",
+    "Correlation & Risk": "See how holdings move together and which ones drive portfolio volatility"
 }
 
 for chart, tip in tips.items():
@@ -1,50 +1,269 @@
 # portfolio.py
 
+from datetime import datetime, timezone
+
+import numpy as np
+
 from stock import Stock
 
+# Starting capacity of the columnar holdings arrays (doubled as needed)
+_INITIAL_ROWS = 8
+
+
+class Holding:
+    """A position: the Stock held, its quantity and its row in the portfolio arrays.
+
+    Also readable/writable as holding['stock'] / holding['quantity'], the
+    shape holdings had when they were plain dicts.
+    """
+    __slots__ = ('stock', 'quantity', '_row')
+    _KEYS = ('stock', 'quantity')
+
+    def __init__(self, stock, quantity, row=-1):
+        self.stock = stock
+        self.quantity = quantity
+        self._row = row
+
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._KEYS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._KEYS else default
+
+    def keys(self):
+        return list(self._KEYS)
+
+    def __repr__(self):
+        return f"Holding({self.stock.symbol!r}, {self.quantity!r})"
+
 class Portfolio:
     def __init__(self, name):
         self.name = name
         self.stocks = {}
+        # Symbols changed since the last save/load, and where that sync went
+        # (see database.save_portfolio). Until synced, a save rewrites everything.
+        self._dirty = set()
+        self._storage_key = None
+        # Trades executed since the last save, oldest first, as
+        # (symbol, side, quantity, price, executed_at); appended to the
+        # transactions ledger by database.save_portfolio
+        self._trades = []
+        # Called as listener(name, symbol, d_value, d_positions) on every
+        # position change; see aggregates.PortfolioAggregates.apply
+        self._listener = None
+        # Columnar mirror of self.stocks for vectorized valuation: row i holds
+        # _symbols[i] with quantity _qty[i] and price _px[i], and each Holding
+        # knows its row. Kept in step by add_stock/remove_stock; rows are
+        # swap-removed so the first len(_symbols) entries are always live.
+        self._symbols = []
+        self._qty = np.zeros(_INITIAL_ROWS)
+        self._px = np.zeros(_INITIAL_ROWS)
+        self._total = None
+
+    def _append_row(self, holding):
+        n = len(self._symbols)
+        if n == len(self._qty):
+            self._qty = np.concatenate([self._qty, np.zeros(n)])
+            self._px = np.concatenate([self._px, np.zeros(n)])
+        self._symbols.append(holding.stock.symbol)
+        holding._row = n
+        self._qty[n] = holding.quantity
+        self._px[n] = holding.stock.price
+
+    def _drop_row(self, holding):
+        row = holding._row
+        last = len(self._symbols) - 1
+        if row != last:
+            moved = self._symbols[last]
+            self._symbols[row] = moved
+            self.stocks[moved]._row = row
+            self._qty[row] = self._qty[last]
+            self._px[row] = self._px[last]
+        self._symbols.pop()
+        self._qty[last] = 0.0
+        self._px[last] = 0.0
 
     def add_stock(self, stock, quantity):
-        if stock.symbol in self.stocks:
-            self.stocks[stock.symbol]['quantity'] += quantity
+        holding = self.stocks.get(stock.symbol)
+        if holding is not None:
+            holding.quantity += quantity
+            self._qty[holding._row] += quantity
+            self._notify(stock.symbol, quantity * self._px[holding._row], 0)
         else:
-            self.stocks[stock.symbol] = {
-                'stock': stock,
-                'quantity': quantity
-            }
+            holding = self.stocks[stock.symbol] = Holding(stock, quantity)
+            self._append_row(holding)
+            self._notify(stock.symbol, quantity * self._px[holding._row], 1)
+        self._dirty.add(stock.symbol)
+        self._total = None
 
     def remove_stock(self, stock, quantity):
-        if stock.symbol in self.stocks:
-            if self.stocks[stock.symbol]['quantity'] >= quantity:
-                self.stocks[stock.symbol]['quantity'] -= quantity
-                if self.stocks[stock.symbol]['quantity'] == 0:
+        holding = self.stocks.get(stock.symbol)
+        if holding is not None:
+            if holding.quantity >= quantity:
+                value = quantity * self._px[holding._row]
+                holding.quantity -= quantity
+                if holding.quantity == 0:
+                    self._drop_row(holding)
                     del self.stocks[stock.symbol]
+                    self._notify(stock.symbol, -value, -1)
+                else:
+                    self._qty[holding._row] -= quantity
+                    self._notify(stock.symbol, -value, 0)
+                self._dirty.add(stock.symbol)
+                self._total = None
+
+    def load_holdings(self, symbols, names, quantities, qty, px):
+        """Replace the holdings with ones loaded from storage: symbols, names
+        and quantities are lists, qty and px float arrays the portfolio takes
+        over as its columns. Nothing is marked changed or reported to the
+        listener."""
+        stocks = self.stocks = {}
+        row = 0
+        for symbol, name, quantity, price in zip(symbols, names, quantities, px.tolist()):
+            stocks[symbol] = Holding(Stock(symbol, name, price), quantity, row)
+            row += 1
+        self._symbols = symbols
+        self._qty = qty
+        self._px = px
+        self._dirty.clear()
+        self._total = None
+
+    def update_prices(self, prices):
+        """Set the price of held symbols from a {symbol: price} mapping"""
+        changed = False
+        for symbol, price in prices.items():
+            holding = self.stocks.get(symbol)
+            if holding is None:
+                continue
+            holding.stock.price = price
+            row = holding._row
+            self._notify(symbol, self._qty[row] * (price - self._px[row]), 0)
+            self._px[row] = price
+            changed = True
+        if changed:
+            self._total = None
+
+    def _notify(self, symbol, d_value, d_positions):
+        if self._listener is not None:
+            self._listener(self.name, symbol, float(d_value), d_positions)
+
+    def set_listener(self, listener):
+        """Report position changes to listener(name, symbol, d_value, d_positions)"""
+        self._listener = listener
+
+    def copy(self):
+        """An independent copy (holdings, stocks, arrays and sync state)"""
+        clone = Portfolio.__new__(Portfolio)
+        clone.name = self.name
+        clone.stocks = {
+            symbol: Holding(Stock(h.stock.symbol, h.stock.name, h.stock.price), h.quantity, h._row)
+            for symbol, h in self.stocks.items()
+        }
+        clone._dirty = set(self._dirty)
+        clone._storage_key = self._storage_key
+        clone._trades = list(self._trades)
+        clone._listener = None
+        clone._symbols = list(self._symbols)
+        clone._qty = self._qty.copy()
+        clone._px = self._px.copy()
+        clone._total = self._total
+        return clone
+
+    def record_trade(self, symbol, side, quantity, price):
+        """Queue a buy/sell for the transactions ledger (written on the next save)"""
+        executed_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+        self._trades.append((symbol, side, quantity, float(price), executed_at))
+
+    def pending_trades(self):
+        """Trades not yet written to the ledger, oldest first"""
+        return list(self._trades)
+
+    def changed_symbols(self):
+        """Symbols added, changed or removed since the last save/load"""
+        return set(self._dirty)
+
+    @property
+    def storage_key(self):
+        return self._storage_key
+
+    def mark_synced(self, storage_key, symbols=None, trades=0):
+        """Record a successful save/load; only `symbols` and the first `trades`
+        pending trades are cleared if given"""
+        self._storage_key = storage_key
+        if symbols is None:
+            self._dirty.clear()
+        else:
+            self._dirty -= symbols
+        del self._trades[:trades]
 
     def calculate_portfolio_value(self):
-        total_value = 0.0
-        for stock_data in self.stocks.values():
-            stock = stock_data['stock']
-            quantity = stock_data['quantity']
-            total_value += stock.price * quantity
-        return total_value
+        # One dot product over the columnar holdings, cached until the next mutation
+        if self._total is None:
+            n = len(self._symbols)
+            self._total = float(np.dot(self._qty[:n], self._px[:n]))
+        return self._total
+
+    def symbols(self):
+        """Held symbols in row order (the order of the arrays below)"""
+        return list(self._symbols)
+
+    def position_values(self):
+        """Market value of every position as a float64 array, in symbols() order"""
+        n = len(self._symbols)
+        return self._qty[:n] * self._px[:n]
+
+    def value_at(self, prices):
+        """Total value with positions priced from {symbol: price} where given, else as held"""
+        n = len(self._symbols)
+        px = self._px[:n].copy()
+        for i, symbol in enumerate(self._symbols):
+            price = prices.get(symbol)
+            if price is not None:
+                px[i] = price
+        return float(np.dot(self._qty[:n], px))
+
+    def weights(self):
+        """Each position's share of total value as a float64 array, in symbols() order"""
+        values = self.position_values()
+        total = self.calculate_portfolio_value()
+        return values / total if total else np.zeros_like(values)
+
+    def top_holdings(self, n=10):
+        """The n largest positions by value as [(symbol, value)], largest first"""
+        values = self.position_values()
+        if n <= 0 or not len(values):
+            return []
+        if n < len(values):
+            idx = np.argpartition(values, -n)[-n:]
+        else:
+            idx = np.arange(len(values))
+        idx = idx[np.argsort(values[idx])[::-1]]
+        return [(self._symbols[i], float(values[i])) for i in idx]
 
     def __str__(self):
         return f"Portfolio: {self.name}, Total Value: ${self.calculate_portfolio_value()}"
 
     def print_stocks(self):
         print(f"\nStocks in Portfolio '{self.name}':")
-        for stock_data in self.stocks.values():
-            print(f"{stock_data['stock']} - Quantity: {stock_data['quantity']}")
+        for holding in self.stocks.values():
+            print(f"{holding.stock} - Quantity: {holding.quantity}")
 
     def has_stock(self, symbol):
         return symbol in self.stocks
 
     def get_stock_quantity(self, symbol):
         if symbol in self.stocks:
-            return self.stocks[symbol]['quantity']
+            return self.stocks[symbol].quantity
         return 0
 
 class PortfolioManager:
@@ -52,6 +271,21 @@ class PortfolioManager:
         # name -> Portfolio
         self.portfolios = {}
         self.current_user = "default"
+        self._aggregates = None
+
+    @property
+    def aggregates(self):
+        """Dashboard totals for self.portfolios (aggregates.PortfolioAggregates).
+
+        Built on first use (and whenever self.portfolios is replaced), then
+        kept current by the portfolios' position-change notifications.
+        """
+        if self._aggregates is None or self._aggregates.source is not self.portfolios:
+            from aggregates import PortfolioAggregates
+            self._aggregates = PortfolioAggregates.build(self.portfolios)
+            for portfolio in self.portfolios.values():
+                portfolio.set_listener(self._aggregates.apply)
+        return self._aggregates
 
     def set_user(self, username: str):
         self.current_user = username or "default"
@@ -72,23 +306,41 @@ class PortfolioManager:
 
     def add_portfolio(self, name):
         if name not in self.portfolios:
-            self.portfolios[name] = Portfolio(name)
+            portfolio = self.portfolios[name] = Portfolio(name)
+            if self._aggregates is not None and self._aggregates.source is self.portfolios:
+                self._aggregates.add_portfolio(name)
+                portfolio.set_listener(self._aggregates.apply)
         else:
             print(f"Portfolio '{name}' already exists.")
 
     def get_portfolio(self, name):
         return self.portfolios.get(name)
 
-    def add_stock_to_portfolio(self, portfolio_name, stock_symbol, quantity):
+    def add_stock_to_portfolio(self, portfolio_name, stock_symbol, quantity, price=None):
+        """Buy at `price`, or the current market price if none is given (a
+        caller that already fetched it passes it in); returns whether the
+        stock was added"""
+        import symbols
         from stock import Stock
         from utils import fetch_stock_price
         portfolio = self.get_portfolio(portfolio_name)
         if not portfolio:
             print(f"Portfolio '{portfolio_name}' does not exist.")
-            return
-        price = fetch_stock_price(stock_symbol)
-        stock = Stock(stock_symbol, "Fetched Stock", price)
+            return False
+        try:
+            stock_symbol = symbols.validate(stock_symbol)
+        except ValueError as e:
+            print(e)
+            return False
+        if price is None:
+            price = fetch_stock_price(stock_symbol)
+        if price is None:
+            print(f"Could not fetch a price for '{stock_symbol}'.")
+            return False
+        stock = Stock(stock_symbol, symbols.name_for(stock_symbol), price)
         portfolio.add_stock(stock, quantity)
+        portfolio.record_trade(stock_symbol, 'buy', quantity, price)
+        return True
 
     def process_transaction(self, portfolio_name, transaction):
         portfolio = self.get_portfolio(portfolio_name)
@@ -96,3 +348,36 @@ class PortfolioManager:
             print(f"Portfolio '{portfolio_name}' does not exist.")
             return
         transaction.execute(portfolio)
+
+    def process_batch(self, portfolio_name, transactions):
+        """Execute a list of Transactions against one portfolio, all or nothing.
+
+        Every leg is checked first, in order, against the quantities the
+        earlier legs leave behind; if any is invalid a ValueError is raised
+        and the portfolio is not touched. The caller saves once afterwards
+        (one database.save_portfolio for the whole batch).
+        """
+        import symbols
+        portfolio = self.get_portfolio(portfolio_name)
+        if not portfolio:
+            raise ValueError(f"Portfolio '{portfolio_name}' does not exist.")
+
+        projected = {}
+        for i, tx in enumerate(transactions, 1):
+            if tx.action not in ('buy', 'sell'):
+                raise ValueError(f"Leg {i}: unknown action '{tx.action}'.")
+            if tx.quantity <= 0 or tx.price < 0:
+                raise ValueError(f"Leg {i}: quantity must be positive and price non-negative.")
+            if tx.action == 'buy' and not symbols.is_tradable(tx.symbol):
+                raise ValueError(f"Leg {i}: unknown symbol '{tx.symbol}'.")
+            held = projected.get(tx.symbol)
+            if held is None:
+                held = portfolio.get_stock_quantity(tx.symbol)
+            if tx.action == 'sell' and held < tx.quantity:
+                raise ValueError(f"Leg {i}: not enough shares of {tx.symbol} to sell. "
+                                 f"Available: {held}, Requested: {tx.quantity}")
+            projected[tx.symbol] = held + tx.quantity if tx.action == 'buy' else held - tx.quantity
+
+        for tx in transactions:
+            tx.execute(portfolio)
+        return len(transactions)
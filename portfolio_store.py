@@ -0,0 +1,330 @@
+# portfolio_store.py
+"""
+Process-wide registry of portfolio managers, one per user.
+
+Every Streamlit session (and the FastAPI app) viewing the same profile
+shares one PortfolioManager, loaded from the database once. Writes are
+copy-on-write: `edit()` hands out a draft, the portfolios it touches are
+copied, and on success the new {name: Portfolio} dict is swapped in with a
+single assignment. Published portfolios are never mutated afterwards, so
+readers can iterate them without locks while another session trades.
+Edits scoped to named portfolios only wait for edits of those portfolios;
+unscoped edits have the user to themselves. Each publish bumps a per-user
+version and notifies subscribers.
+"""
+import threading
+import uuid
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from aggregates import PortfolioAggregates
+from portfolio import PortfolioManager
+
+# Recent (version, writer) pairs kept per user for change notices
+_HISTORY = 32
+
+# Writers whose publishes only re-price holdings (see price_refresher); they
+# are not reported as changes made elsewhere
+QUIET_WRITERS = {"price_refresher"}
+
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_entries = {}
+_listeners = []
+_schema_ready = False
+
+
+class _WriteGate:
+    """Shared/exclusive lock: scoped edits share it, unscoped edits hold it alone"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._exclusive)
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._exclusive and not self._shared)
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+
+class _Entry:
+    __slots__ = ('manager', 'version', 'history', 'gate', 'portfolio_locks', 'load_lock', 'loaded')
+
+    def __init__(self, username):
+        self.manager = PortfolioManager()
+        self.manager.set_user(username)
+        self.version = 0
+        self.history = deque(maxlen=_HISTORY)
+        self.gate = _WriteGate()
+        self.portfolio_locks = {}
+        self.load_lock = threading.Lock()
+        self.loaded = False
+
+    def portfolio_lock(self, name):
+        with _lock:
+            lock = self.portfolio_locks.get(name)
+            if lock is None:
+                lock = self.portfolio_locks[name] = threading.Lock()
+            return lock
+
+
+class _Draft(PortfolioManager):
+    """Manager handed out by edit(): copies a portfolio the first time it is looked up"""
+
+    def __init__(self, base, scope=None):
+        super().__init__()
+        self.current_user = base.current_user
+        self.portfolios = dict(base.portfolios)
+        self._base = base.portfolios
+        self._initial = self.portfolios
+        self._copied = set()
+        self._scope = scope
+        # Position changes and new portfolios, replayed onto the published
+        # aggregates when the edit is published
+        self._deltas = []
+        self._added = []
+
+    def _check_scope(self, name):
+        if self._scope is not None and name not in self._scope:
+            raise ValueError(f"Portfolio '{name}' is not part of this edit.")
+
+    def get_portfolio(self, name):
+        portfolio = self.portfolios.get(name)
+        if portfolio is not None and name not in self._copied:
+            self._check_scope(name)
+            portfolio = self.portfolios[name] = portfolio.copy()
+            portfolio.set_listener(self._record)
+            self._copied.add(name)
+        return portfolio
+
+    def add_portfolio(self, name):
+        self._check_scope(name)
+        if name not in self.portfolios:
+            self._copied.add(name)
+            self._added.append(name)
+            super().add_portfolio(name)
+            self.portfolios[name].set_listener(self._record)
+        else:
+            super().add_portfolio(name)
+
+    def _record(self, *delta):
+        self._deltas.append(delta)
+
+    @property
+    def changed(self):
+        """True if the draft has anything to publish: a position or price
+        change, a new portfolio, or portfolios replaced or removed"""
+        return bool(self._deltas or self._added) or (
+            self.portfolios is not self._initial or self.portfolios.keys() != self._base.keys())
+
+    def publish_aggregates(self, published, portfolios):
+        """Aggregates for `portfolios` (the dict about to be published), derived
+        from the currently published ones by replaying this draft's changes"""
+        if self.portfolios is not self._initial or any(n not in portfolios for n in self._copied):
+            # portfolios were replaced or removed wholesale: start over
+            return PortfolioAggregates.build(portfolios)
+        aggregates = published.copy()
+        for name in self._added:
+            aggregates.add_portfolio(name)
+        aggregates.apply_all(self._deltas)
+        aggregates.source = portfolios
+        return aggregates
+
+
+def _entry(username):
+    username = username or "default"
+    entry = _entries.get(username)
+    if entry is None:
+        with _lock:
+            entry = _entries.get(username)
+            if entry is None:
+                entry = _entries[username] = _Entry(username)
+    if not entry.loaded:
+        # Concurrent first requests for a user share one database load
+        with entry.load_lock:
+            if not entry.loaded:
+                _load(entry, username)
+    return entry
+
+
+def _load(entry, username):
+    global _schema_ready
+    import database
+    if not _schema_ready:
+        database.init_database()
+        _schema_ready = True
+    entry.manager.portfolios = {p.name: p for p in database.load_portfolios(username)}
+    entry.loaded = True
+
+
+def get_manager(username):
+    """The shared PortfolioManager for a user, loading it on first use.
+
+    Treat it as read-only; make changes through edit().
+    """
+    return _entry(username).manager
+
+
+def version(username):
+    return _entry(username).version
+
+
+@contextmanager
+def edit(username, writer=None, portfolios=None):
+    """Change a user's portfolios: yields a draft manager, published when the block exits.
+
+    With `portfolios` (a name or list of names) the edit may only touch
+    those portfolios and runs concurrently with edits of other ones;
+    without it the edit excludes every other edit for the user. If the
+    block raises, the draft is discarded and the shared portfolios are left
+    as they were; if it changed nothing (see _Draft.changed), e.g. it
+    returned early after a failed check, nothing is published and the
+    version stays put. `writer` identifies the caller in change notices (see
+    changed_by_others).
+    """
+    username = username or "default"
+    entry = _entry(username)
+    if isinstance(portfolios, str):
+        portfolios = [portfolios]
+    scope = None if portfolios is None else set(portfolios)
+
+    with ExitStack() as stack:
+        if scope is None:
+            stack.enter_context(entry.gate.exclusive())
+        else:
+            stack.enter_context(entry.gate.shared())
+            # sorted, so overlapping multi-portfolio edits can't deadlock
+            for name in sorted(scope):
+                stack.enter_context(entry.portfolio_lock(name))
+        draft = _Draft(entry.manager, scope)
+        yield draft
+        if not draft.changed:
+            return
+        with _lock:
+            if scope is None:
+                published = draft.portfolios
+            else:
+                # Other portfolios may have been published meanwhile; merge
+                # in only the ones this edit owns.
+                published = dict(entry.manager.portfolios)
+                for name in scope:
+                    if name in draft.portfolios:
+                        published[name] = draft.portfolios[name]
+                    else:
+                        published.pop(name, None)
+            aggregates = draft.publish_aggregates(entry.manager.aggregates, published)
+            # Published portfolios are never mutated, so they need no listener
+            # (and must not keep drafts or old aggregates alive).
+            for portfolio in published.values():
+                portfolio.set_listener(None)
+            entry.manager.portfolios = published
+            entry.manager._aggregates = aggregates
+            entry.version += 1
+            entry.history.append((entry.version, writer))
+            current = entry.version
+            listeners = list(_listeners)
+            _changed.notify_all()
+    for callback in listeners:
+        try:
+            callback(username, current)
+        except Exception as e:
+            print(f"Portfolio change listener failed: {e}")
+
+
+def reload(username):
+    """Re-read a user's portfolios from the database and publish them"""
+    import database
+    with edit(username) as draft:
+        draft.portfolios = {p.name: p for p in database.load_portfolios(username or "default")}
+
+
+def changed_by_others(username, since, writer):
+    """True if someone other than `writer` published a change after version `since`"""
+    entry = _entry(username)
+    with _lock:
+        if entry.version == since:
+            return False
+        known = [w for v, w in entry.history if v > since]
+        # Older changes than the history keeps count as foreign
+        if len(known) < entry.version - since:
+            return True
+        return any(w != writer and w not in QUIET_WRITERS for w in known)
+
+
+def wait_for_change(username, since, timeout=None):
+    """Block until the user's version moves past `since` (or timeout); returns the version"""
+    entry = _entry(username)
+    with _changed:
+        _changed.wait_for(lambda: entry.version != since, timeout)
+        return entry.version
+
+
+def subscribe(callback):
+    """Call callback(username, version) after every published change (once, however often subscribed)"""
+    with _lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def bind_session(state):
+    """Attach a UI session to its user's shared manager.
+
+    `state` is the session's dict-like store (st.session_state). Returns the
+    manager and whether another session changed it since this one last looked.
+    Also makes sure the background price refresher is running.
+    """
+    import price_refresher
+    if "username" not in state:
+        state["username"] = "default"
+    if "pm_session_id" not in state:
+        state["pm_session_id"] = uuid.uuid4().hex
+    username = state["username"]
+    manager = get_manager(username)
+    current = version(username)
+    seen = state.get("pm_seen")
+    changed = (seen is not None and seen[0] == username
+               and changed_by_others(username, seen[1], state["pm_session_id"]))
+    state["pm_seen"] = (username, current)
+    price_refresher.start()
+    return manager, changed
+
+
+def loaded_users():
+    """Users whose portfolios are currently loaded in this process"""
+    with _lock:
+        return [username for username, entry in _entries.items() if entry.loaded]
+
+
+def evict(username=None):
+    """Drop cached managers (all users if username is None); they reload on next use"""
+    with _lock:
+        if username is None:
+            _entries.clear()
+        else:
+            _entries.pop(username, None)
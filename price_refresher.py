@@ -0,0 +1,170 @@
+# price_refresher.py
+"""
+Background mark-to-market of every held symbol.
+
+A daemon thread wakes every PRICE_REFRESH_SECONDS, collects the distinct
+symbols held across all users (saved holdings plus any loaded, unsaved
+ones), downloads their latest daily bars in batched multi-ticker requests
+(market_fetch) and writes last close and previous close to the shared
+quotes table (database.save_quotes). The new prices are then applied to
+the portfolios loaded in this process through portfolio_store.edit, so
+dashboards, reports and the API value holdings at current prices without
+fetching anything while rendering. Portfolios loaded later pick the
+prices up from the quotes table (see database.load_portfolios).
+
+    python price_refresher.py [--once]
+"""
+import os
+import threading
+import time
+
+# 0 disables the background thread (refresh_once still works)
+REFRESH_SECONDS = float(os.environ.get("PRICE_REFRESH_SECONDS", 60))
+# Symbols per market_fetch call (which splits them into its own batches)
+FETCH_CHUNK = 200
+WRITER = "price_refresher"
+
+_thread = None
+_stop = threading.Event()
+_start_lock = threading.Lock()
+_last_run = {'at': None, 'symbols': 0, 'priced': 0, 'seconds': 0.0, 'error': None}
+
+
+def _held_symbols():
+    import database
+    import portfolio_store
+
+    symbols = set(database.held_symbols())
+    for username in portfolio_store.loaded_users():
+        for portfolio in portfolio_store.get_manager(username).portfolios.values():
+            symbols.update(portfolio.stocks)
+    return sorted(symbols)
+
+
+def fetch_quotes(symbols):
+    """{symbol: (last close, previous close)} for the symbols that returned data"""
+    import market_fetch
+
+    quotes = {}
+    for lo in range(0, len(symbols), FETCH_CHUNK):
+        chunk = symbols[lo:lo + FETCH_CHUNK]
+        for symbol, frame in market_fetch.fetch_histories(chunk, period="5d", interval="1d").items():
+            if frame is None or frame.empty or 'Close' not in frame.columns:
+                continue
+            closes = frame['Close'].dropna()
+            if closes.empty:
+                continue
+            last = float(closes.iloc[-1])
+            previous = float(closes.iloc[-2]) if len(closes) > 1 else None
+            quotes[symbol] = (last, previous)
+    return quotes
+
+
+def apply_quotes(prices):
+    """Re-price the loaded portfolios that hold any of {symbol: price}; returns
+    the number of portfolios changed"""
+    import portfolio_store
+
+    changed = 0
+    for username in portfolio_store.loaded_users():
+        manager = portfolio_store.get_manager(username)
+        names = [
+            name for name, portfolio in manager.portfolios.items()
+            if any(symbol in prices and holding.stock.price != prices[symbol]
+                   for symbol, holding in portfolio.stocks.items())
+        ]
+        if not names:
+            continue
+        # Scoped, so trades in other portfolios are not held up
+        with portfolio_store.edit(username, writer=WRITER, portfolios=names) as draft:
+            for name in names:
+                portfolio = draft.get_portfolio(name)
+                if portfolio is not None:
+                    portfolio.update_prices({s: prices[s] for s in portfolio.stocks if s in prices})
+        changed += len(names)
+    return changed
+
+
+def refresh_once():
+    """One refresh pass; returns {'symbols', 'priced', 'portfolios', 'seconds'}"""
+    import database
+
+    start = time.perf_counter()
+    symbols = _held_symbols()
+    quotes = fetch_quotes(symbols) if symbols else {}
+    if quotes:
+        database.save_quotes(quotes, time.time())
+    portfolios = apply_quotes({symbol: price for symbol, (price, _) in quotes.items()})
+    stats = {'symbols': len(symbols), 'priced': len(quotes), 'portfolios': portfolios,
+             'seconds': time.perf_counter() - start}
+    _last_run.update(stats, at=time.time(), error=None)
+    return stats
+
+
+def _run(interval):
+    import database
+    database.init_database()
+    while not _stop.is_set():
+        try:
+            refresh_once()
+        except Exception as e:
+            _last_run.update(at=time.time(), error=str(e))
+            print(f"Price refresh failed: {e}")
+        _stop.wait(interval)
+
+
+def start(interval=None):
+    """Start the refresh thread once per process (later calls are no-ops)"""
+    global _thread
+    interval = REFRESH_SECONDS if interval is None else interval
+    if interval <= 0:
+        return None
+    with _start_lock:
+        if _thread is not None and _thread.is_alive():
+            return _thread
+        _stop.clear()
+        _thread = threading.Thread(target=_run, args=(interval,),
+                                   name="price-refresher", daemon=True)
+        _thread.start()
+        return _thread
+
+
+def stop(timeout=None):
+    """Stop the refresh thread after its current pass"""
+    global _thread
+    _stop.set()
+    with _start_lock:
+        thread, _thread = _thread, None
+    if thread is not None:
+        thread.join(timeout)
+
+
+def status():
+    """When the last pass ran and what it did"""
+    return dict(_last_run, running=_thread is not None and _thread.is_alive())
+
+
+def main():
+    import argparse
+    import database
+
+    parser = argparse.ArgumentParser(description="Refresh quotes for every held symbol")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    parser.add_argument("--interval", type=float, default=REFRESH_SECONDS)
+    args = parser.parse_args()
+
+    database.init_database()
+    if args.once:
+        stats = refresh_once()
+        print(f"Priced {stats['priced']}/{stats['symbols']} symbols in {stats['seconds']:.2f}s")
+        return
+    start(args.interval)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+# providers.py
+"""
+Market data providers.
+
+Everything that needs prices goes through one provider: market_fetch
+batches, retries and parallelizes its history() calls. history_store,
+market_cache, the pages, the API and the price refresher all sit on top of
+market_fetch, and so does utils.fetch_stock_price (through market_cache) for
+symbols the quotes table doesn't have yet. The provider is chosen with
+MARKET_DATA_PROVIDER:
+
+    yfinance   (default) Yahoo Finance over the network
+    synthetic  Reproducible geometric Brownian motion OHLCV for any symbol,
+               offline. MARKET_DATA_SEED picks the universe; MARKET_DATA_NOW
+               (epoch seconds or ISO date) pins the clock so runs are identical.
+    replay     OHLCV recorded to CSV files under MARKET_DATA_DIR
+               (<dir>/<interval>/<SYMBOL>.csv), e.g. by `python providers.py record`
+
+history() returns {symbol: DataFrame} with Open/High/Low/Close/Volume
+columns on a tz-aware index (empty frames for unknown symbols), the shape
+yfinance produces.
+"""
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+EXCHANGE_TZ = "America/New_York"
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+class Provider:
+    """Base class: subclasses implement history()"""
+    name = "base"
+    offline = False
+
+    def history(self, symbols, interval="1d", period=None, start=None, timeout=None):
+        raise NotImplementedError
+
+    def last_price(self, symbol):
+        """Latest close for a symbol, or None"""
+        frame = self.history([symbol], interval="1d", period="5d").get(symbol)
+        if frame is None or frame.empty or 'Close' not in frame.columns:
+            return None
+        closes = frame['Close'].dropna()
+        return float(closes.iloc[-1]) if not closes.empty else None
+
+
+class YFinanceProvider(Provider):
+    name = "yfinance"
+    # Older yfinance releases keep download() scratch state in module globals,
+    # so concurrent calls must be serialized there.
+    _download_lock = threading.Lock()
+
+    def history(self, symbols, interval="1d", period=None, start=None, timeout=None):
+        import pandas as pd
+        import yfinance as yf
+
+        window = {"start": start} if start is not None else {"period": period}
+        if len(symbols) == 1:
+            symbol = symbols[0]
+            return {symbol: yf.Ticker(symbol).history(interval=interval, timeout=timeout, **window)}
+
+        reentrant = hasattr(getattr(yf, "multi", None), "_DownloadCtx")
+        lock = self._download_lock if not reentrant else None
+        if lock:
+            lock.acquire()
+        try:
+            data = yf.download(symbols, interval=interval, group_by='ticker', auto_adjust=True,
+                               threads=False, progress=False, timeout=timeout, **window)
+        finally:
+            if lock:
+                lock.release()
+
+        histories = {}
+        available = set(data.columns.get_level_values(0)) if data is not None and not data.empty else set()
+        for symbol in symbols:
+            if symbol in available:
+                histories[symbol] = data[symbol].dropna(how='all')
+            else:
+                histories[symbol] = pd.DataFrame()
+        return histories
+
+
+def _parse_now(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        import pandas as pd
+        return pd.Timestamp(value, tz="UTC").timestamp()
+
+
+def _window_start(period, start, now):
+    """Epoch seconds a period/start window begins at. Periods in days count
+    sessions (weekdays) back from now, like yfinance's "5d"."""
+    import pandas as pd
+    import history_store
+    if start is not None:
+        stamp = pd.Timestamp(start)
+        return (stamp if stamp.tzinfo else stamp.tz_localize("UTC")).timestamp()
+    period = period or "1mo"
+    if period.endswith("d") and period[:-1].isdigit():
+        today = pd.Timestamp(now, unit="s", tz="UTC").tz_convert(EXCHANGE_TZ)
+        day = np.busday_offset(np.datetime64(today.date(), "D"), 1 - int(period[:-1]), roll="backward")
+        return pd.Timestamp(day).tz_localize(EXCHANGE_TZ).timestamp()
+    return history_store.period_start(period, now)
+
+
+class SyntheticProvider(Provider):
+    """Deterministic GBM bars on a weekday calendar (sessions 09:30-16:00 New York time).
+
+    Every symbol gets its own start price, drift and volatility from a hash
+    of its name and the seed. A bar's values depend only on (seed, symbol,
+    interval, bar index), never on the window requested, so overlapping
+    requests agree and the history can be extended forever: the path is a
+    Brownian motion drawn block by block (BLOCK bars, each a Brownian bridge
+    between block-level steps from a coarse stream). Prices are anchored at
+    REFERENCE, so today's levels stay near each symbol's start price.
+    """
+    name = "synthetic"
+    offline = True
+    ORIGIN = np.datetime64("2000-01-03")
+    REFERENCE = np.datetime64("2025-01-02")
+    SESSION_OPEN = 9 * 3600 + 30 * 60  # after local midnight
+    SESSION_SECONDS = 390 * 60
+    BLOCK = 1024
+    RESAMPLE = {"5d": "W-MON", "1wk": "W-MON", "1mo": "MS", "3mo": "QS"}
+
+    def __init__(self, seed=0, now=None):
+        self.seed = int(seed)
+        self.now = now
+
+    def _params(self, symbol):
+        h = zlib.crc32(f"{self.seed}:{symbol}".encode())
+        u = [((h >> shift) & 0xFFFF) / 0xFFFF for shift in (0, 8, 16)]
+        price = float(np.exp(np.log(10) + u[0] * np.log(50)))  # 10 .. 500
+        drift = -0.05 + 0.20 * u[1]
+        volatility = 0.15 + 0.45 * u[2]
+        volume = 1e5 * (1 + 99 * u[1] * u[2])
+        return h, price, drift, volatility, volume
+
+    def _calendar(self, interval, start, end):
+        """Bar timestamps (epoch seconds) in [start, end], their global bar indexes and the bar length"""
+        import pandas as pd
+        import history_store
+        first = max(np.datetime64(int(start // history_store.DAY) - 1, "D"), self.ORIGIN)
+        last = np.datetime64(int(end // history_store.DAY) + 1, "D")
+        days = np.arange(first, last + 1) if last >= first else np.empty(0, dtype="datetime64[D]")
+        days = days[np.is_busday(days)]
+        day_index = np.busday_count(self.ORIGIN, days).astype("i8")
+        # Local midnight of each session day, in UTC epoch seconds
+        midnight = pd.DatetimeIndex(days).tz_localize(EXCHANGE_TZ).as_unit("s").asi8
+        step = history_store.INTERVAL_SECONDS.get(interval, history_store.DAY)
+        if step >= history_store.DAY:
+            ts, index, step = midnight, day_index, history_store.DAY
+        else:
+            per_day = -(-self.SESSION_SECONDS // step)
+            slots = np.arange(per_day, dtype="i8")
+            ts = (midnight[:, None] + self.SESSION_OPEN + slots[None, :] * step).ravel()
+            index = (day_index[:, None] * per_day + slots[None, :]).ravel()
+        keep = (ts >= start) & (ts <= end)
+        return ts[keep], index[keep], step
+
+    def _path(self, h, code, index):
+        """Brownian motion at the start and end of each bar index, plus the
+        bar's wick and volume draws"""
+        L = self.BLOCK
+        blocks = np.unique(index // L)
+        coarse = np.random.default_rng([self.seed, h, code, 0]).standard_normal(int(blocks[-1]) + 1) * np.sqrt(L)
+        levels = np.concatenate([[0.0], np.cumsum(coarse)])
+
+        w_prev, w_end, extra = [], [], []
+        i = np.arange(1, L + 1)
+        for block in blocks.tolist():
+            rng = np.random.default_rng([self.seed, h, code, block + 1])
+            z = rng.standard_normal(L)
+            extra.append(rng.standard_normal((3, L)))
+            c = np.cumsum(z)
+            path = levels[block] + c - i / L * c[-1] + i / L * coarse[block]
+            w_end.append(path)
+            w_prev.append(np.concatenate([[levels[block]], path[:-1]]))
+        offset = np.searchsorted(blocks, index // L) * L + index % L
+        extra = np.concatenate(extra, axis=1)[:, offset]
+        return np.concatenate(w_prev)[offset], np.concatenate(w_end)[offset], np.abs(extra[:2]), extra[2]
+
+    def _bars(self, symbol, code, index, step):
+        """OHLCV arrays for the given global bar indexes (ascending)"""
+        h, price, drift, volatility, base_volume = self._params(symbol)
+        dt = step / (self.SESSION_SECONDS * 252) if step < 86400 else 1 / 252
+        per_day = -(-self.SESSION_SECONDS // step) if step < 86400 else 1
+        ref = int(np.busday_count(self.ORIGIN, self.REFERENCE)) * per_day
+        w_prev, w_end, wick, noise = self._path(h, code, np.append(index, ref))
+        w_ref = w_prev[-1]
+        w_prev, w_end, wick, noise = w_prev[:-1] - w_ref, w_end[:-1] - w_ref, wick[:, :-1], noise[:-1]
+
+        growth = (drift - volatility ** 2 / 2) * dt
+        scale = volatility * np.sqrt(dt)
+        close = price * np.exp(growth * (index + 1 - ref) + scale * w_end)
+        open_ = price * np.exp(growth * (index - ref) + scale * w_prev)
+        high = np.maximum(open_, close) * (1 + 0.5 * scale * wick[0])
+        low = np.minimum(open_, close) * (1 - 0.5 * scale * wick[1])
+        volume = np.round(base_volume * np.sqrt(step / 86400 if step < 86400 else 1) * np.exp(0.3 * noise))
+        return open_, high, low, close, volume
+
+    def history(self, symbols, interval="1d", period=None, start=None, timeout=None):
+        import pandas as pd
+
+        now = self.now if self.now is not None else time.time()
+        begin = _window_start(period, start, now)
+        daily = interval in self.RESAMPLE
+        ts, index, step = self._calendar("1d" if daily else interval, begin, now)
+        code = zlib.crc32(("1d" if daily else interval).encode())
+        stamps = pd.to_datetime(ts, unit="s", utc=True).tz_convert(EXCHANGE_TZ)
+
+        histories = {}
+        for symbol in symbols:
+            if not len(ts):
+                histories[symbol] = pd.DataFrame()
+                continue
+            o, hi, lo, c, v = self._bars(symbol, code, index, step)
+            frame = pd.DataFrame({"Open": o, "High": hi, "Low": lo, "Close": c, "Volume": v}, index=stamps)
+            if daily:
+                frame = frame.resample(self.RESAMPLE[interval], label="left", closed="left").agg(
+                    {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}).dropna()
+            histories[symbol] = frame
+        return histories
+
+
+class ReplayProvider(Provider):
+    """Bars recorded to <directory>/<interval>/<SYMBOL>.csv, served for any window"""
+    name = "replay"
+    offline = True
+
+    def __init__(self, directory, now=None):
+        self.directory = directory
+        self.now = now
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def path(self, symbol, interval):
+        return os.path.join(self.directory, interval, f"{symbol.replace('/', '_')}.csv")
+
+    def _load(self, symbol, interval):
+        import pandas as pd
+
+        key = (symbol, interval)
+        with self._lock:
+            if key in self._frames:
+                return self._frames[key]
+        path = self.path(symbol, interval)
+        if os.path.exists(path):
+            frame = pd.read_csv(path, index_col=0)
+            frame.index = pd.to_datetime(frame.index, utc=True).tz_convert(EXCHANGE_TZ)
+        else:
+            frame = pd.DataFrame()
+        with self._lock:
+            self._frames[key] = frame
+        return frame
+
+    def history(self, symbols, interval="1d", period=None, start=None, timeout=None):
+        now = self.now
+        if now is None:
+            # The recording's own end stands in for "now", so periods are
+            # measured back from the last recorded bar
+            ends = [f.index[-1].timestamp() for f in map(lambda s: self._load(s, interval), symbols) if not f.empty]
+            now = max(ends) if ends else time.time()
+        begin = _window_start(period, start, now)
+        histories = {}
+        for symbol in symbols:
+            frame = self._load(symbol, interval)
+            if not frame.empty:
+                seconds = frame.index.as_unit("s").asi8
+                frame = frame[(seconds >= begin) & (seconds <= now)]
+            histories[symbol] = frame
+        return histories
+
+
+def record(source, symbols, directory, period="1y", interval="1d"):
+    """Write source.history(...) for the symbols as replay files; returns the number written"""
+    os.makedirs(os.path.join(directory, interval), exist_ok=True)
+    replay = ReplayProvider(directory)
+    written = 0
+    for symbol, frame in source.history(list(symbols), interval=interval, period=period).items():
+        if frame is not None and not frame.empty:
+            frame.to_csv(replay.path(symbol, interval), index_label="Datetime")
+            written += 1
+    return written
+
+
+def from_env():
+    """The provider named by MARKET_DATA_PROVIDER (see module docstring)"""
+    kind = os.environ.get("MARKET_DATA_PROVIDER", "yfinance").strip().lower()
+    now = _parse_now(os.environ.get("MARKET_DATA_NOW"))
+    if kind == "synthetic":
+        return SyntheticProvider(seed=int(os.environ.get("MARKET_DATA_SEED", 0)), now=now)
+    if kind == "replay":
+        return ReplayProvider(os.environ.get("MARKET_DATA_DIR", "market_replay"), now=now)
+    if kind != "yfinance":
+        raise ValueError(f"Unknown MARKET_DATA_PROVIDER '{kind}'")
+    return YFinanceProvider()
+
+
+def get():
+    """The process-wide provider (from the environment on first use)"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = from_env()
+    return _provider
+
+
+def use(provider):
+    """Replace the process-wide provider (e.g. SyntheticProvider() in benchmarks); returns the old one"""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record market data for the replay provider")
+    parser.add_argument("command", choices=("record",))
+    parser.add_argument("directory")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--interval", default="1d")
+    args = parser.parse_args()
+
+    written = record(get(), args.symbols, args.directory, args.period, args.interval)
+    print(f"Recorded {written}/{len(args.symbols)} symbols from {get().name} to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
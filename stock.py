@@ -1,6 +1,9 @@
 # stock.py
 
 class Stock:
+    # Slotted: sessions can hold a Stock per position, so skip the per-instance dict
+    __slots__ = ('symbol', 'name', 'price')
+
     def __init__(self, symbol, name, price):
         self.symbol = symbol
         self.name = name
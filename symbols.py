@@ -0,0 +1,212 @@
+# symbols.py
+"""
+Symbol master: the tickers the app knows, with name, exchange, currency and
+sector, loaded from a bundled CSV (data/symbols.csv, or SYMBOL_MASTER_FILE).
+
+The table is held as sorted NumPy string arrays: the symbols, and every
+word of every name (lower-cased) with the row it came from. A prefix search
+is then two binary searches (np.searchsorted) per array, well under a
+millisecond for any prefix, and feeds the autocomplete suggestions; exact
+lookups go through a symbol -> row dict. validate() is what the symbol inputs
+and /add_stock call before anything is priced, and it only consults the
+master, so an invalid ticker is rejected without a network round-trip.
+Tickers the master lacks are accepted only with SYMBOL_ALLOW_UNLISTED=1, and
+then only if the market data provider can price them (remembered per
+process); otherwise point SYMBOL_MASTER_FILE at a fuller list.
+"""
+import csv
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+MASTER_FILE = os.environ.get(
+    "SYMBOL_MASTER_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "symbols.csv"))
+FIELDS = ('symbol', 'name', 'exchange', 'currency', 'sector')
+# Opt-in: accept tickers outside the master that the provider can price
+ALLOW_UNLISTED = os.environ.get("SYMBOL_ALLOW_UNLISTED", "").lower() in ("1", "true", "yes")
+# Shape of a ticker worth asking the provider about (as the importer accepts)
+SYMBOL_PATTERN = re.compile(r"[A-Z0-9.^=-]{1,15}")
+# Seconds a symbol the provider couldn't price stays rejected before it is retried
+UNRESOLVED_TTL = 300
+
+_master = None
+_master_lock = threading.Lock()
+_resolved = {}  # symbol outside the master -> (priced, time.monotonic() checked)
+_resolved_lock = threading.Lock()
+
+
+def _prefix_range(values, prefix):
+    """[lo, hi) of the entries of a sorted string array starting with prefix"""
+    if len(prefix) > values.dtype.itemsize // 4:
+        return 0, 0
+    # Probes of the array's own dtype, so searchsorted doesn't cast the array
+    # (the upper bound is the prefix with its last character bumped)
+    probes = np.array([prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)], dtype=values.dtype)
+    lo, hi = np.searchsorted(values, probes)
+    return int(lo), int(hi)
+
+
+class SymbolMaster:
+    """Sorted arrays over the symbol table (see module docstring)"""
+
+    def __init__(self, rows):
+        rows = sorted({row['symbol'].strip().upper(): row for row in rows if row.get('symbol')}.items())
+        self.symbols = np.array([symbol for symbol, _ in rows], dtype=str)
+        self.columns = {field: np.array([row.get(field) or "" for _, row in rows], dtype=object)
+                        for field in FIELDS[1:]}
+        self.columns['symbol'] = self.symbols
+        # Exact lookups (one per holding when portfolios load) skip the binary search
+        self.positions = {symbol: i for i, (symbol, _) in enumerate(rows)}
+        words, owners = [], []
+        for i, (_, row) in enumerate(rows):
+            for word in set(re.findall(r"[a-z0-9]+", (row.get('name') or "").lower())):
+                words.append(word)
+                owners.append(i)
+        order = np.argsort(np.array(words, dtype=str), kind='stable')
+        self.words = np.array(words, dtype=str)[order]
+        self.word_rows = np.array(owners, dtype=np.int64)[order]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _find(self, symbol):
+        return self.positions.get(symbol)
+
+    def row(self, i):
+        return {field: str(self.columns[field][i]) for field in FIELDS}
+
+    def lookup(self, symbol):
+        """The symbol's row as a dict, or None if unknown"""
+        i = self._find(normalize(symbol))
+        return self.row(i) if i is not None else None
+
+    def search(self, query, limit=10):
+        """Rows whose symbol, then any word of whose name, starts with query"""
+        query = (query or "").strip()
+        if not query:
+            return []
+        lo, hi = _prefix_range(self.symbols, query.upper())
+        found = list(range(lo, min(hi, lo + limit)))
+        if len(found) < limit:
+            lo, hi = _prefix_range(self.words, query.lower())
+            seen = set(found)
+            for i in map(int, self.word_rows[lo:hi]):
+                if i not in seen:
+                    seen.add(i)
+                    found.append(i)
+                    if len(found) == limit:
+                        break
+        return [self.row(i) for i in found]
+
+
+def load(path=None):
+    """A SymbolMaster from a CSV with the FIELDS columns"""
+    with open(path or MASTER_FILE, newline="", encoding="utf-8") as f:
+        return SymbolMaster(list(csv.DictReader(f)))
+
+
+def get():
+    """The process-wide symbol master (loaded on first use)"""
+    global _master
+    if _master is None:
+        with _master_lock:
+            if _master is None:
+                _master = load()
+    return _master
+
+
+def normalize(symbol):
+    return (symbol or "").strip().upper()
+
+
+def lookup(symbol):
+    return get().lookup(symbol)
+
+
+def search(query, limit=10):
+    return get().search(query, limit)
+
+
+def is_known(symbol):
+    """True if the symbol is in the master"""
+    return get()._find(normalize(symbol)) is not None
+
+
+def resolves(symbol):
+    """True if the market data provider can price a symbol (one lookup per
+    process; failures are retried after UNRESOLVED_TTL seconds)"""
+    import utils
+
+    text = normalize(symbol)
+    if not SYMBOL_PATTERN.fullmatch(text):
+        return False
+    with _resolved_lock:
+        entry = _resolved.get(text)
+    if entry is not None and (entry[0] or time.monotonic() - entry[1] < UNRESOLVED_TTL):
+        return entry[0]
+    try:
+        priced = utils.fetch_stock_price(text) is not None
+    except Exception as e:
+        print(f"Could not look up symbol {text}: {e}")
+        priced = False
+    with _resolved_lock:
+        _resolved[text] = (priced, time.monotonic())
+    return priced
+
+
+def is_tradable(symbol):
+    """True if the symbol is in the master or, with ALLOW_UNLISTED, the
+    provider can price it"""
+    return is_known(symbol) or (ALLOW_UNLISTED and resolves(symbol))
+
+
+def name_for(symbol):
+    """The company/instrument name, or the symbol itself if it isn't in the master"""
+    master = get()
+    i = master._find(normalize(symbol))
+    return str(master.columns['name'][i]) if i is not None else symbol
+
+
+def names_for(symbols):
+    """name_for over a sequence of already normalized symbols, in one pass"""
+    master = get()
+    names, positions = master.columns['name'], master.positions
+    return [str(names[i]) if (i := positions.get(symbol)) is not None else symbol for symbol in symbols]
+
+
+def suggestions(symbol, limit=5):
+    """Known symbols close to a mistyped one: those starting with it, or with its
+    longest prefix that matches anything"""
+    text = normalize(symbol)
+    for end in range(len(text), 0, -1):
+        found = search(text[:end], limit)
+        if found:
+            return [row['symbol'] for row in found]
+    return []
+
+
+def validate(symbol):
+    """The normalized symbol; raises ValueError if it isn't tradable (see
+    is_tradable)"""
+    text = normalize(symbol)
+    if not text:
+        raise ValueError("A stock symbol is required")
+    if not is_tradable(text):
+        close = suggestions(text)
+        hint = f" Did you mean {', '.join(close)}?" if close else ""
+        raise ValueError(f"Unknown symbol '{text}'.{hint}")
+    return text
+
+
+def split_known(text):
+    """(known, unknown) normalized symbols from a comma-separated input, in
+    input order and without duplicates; known ones are tradable (is_tradable)"""
+    known, unknown = [], []
+    for part in (text or "").split(","):
+        symbol = normalize(part)
+        if symbol and symbol not in known and symbol not in unknown:
+            (known if is_tradable(symbol) else unknown).append(symbol)
+    return known, unknown
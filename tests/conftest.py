@@ -0,0 +1,21 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh portfolio database, with no managers cached from other tests"""
+    import database
+    import portfolio_store
+
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "portfolio.db"))
+    monkeypatch.setattr(portfolio_store, "_schema_ready", False)
+    portfolio_store.evict()
+    database.init_database()
+    yield database
+    portfolio_store.evict()
@@ -0,0 +1,76 @@
+# tests/test_aggregates.py
+import numpy as np
+
+import portfolio_store
+from aggregates import PortfolioAggregates, exposure_matrix
+from portfolio import PortfolioManager
+from stock import Stock
+
+
+def _assert_matches_rebuild(aggregates, portfolios):
+    fresh = PortfolioAggregates.build(portfolios)
+    assert np.isclose(aggregates.total_value, fresh.total_value)
+    assert aggregates.total_positions == fresh.total_positions
+    assert aggregates.portfolio_positions == fresh.portfolio_positions
+    assert aggregates.holders == fresh.holders
+    assert aggregates.exposure.keys() == fresh.exposure.keys()
+    for symbol, value in fresh.exposure.items():
+        assert np.isclose(aggregates.exposure[symbol], value)
+    for name, value in fresh.portfolio_values.items():
+        assert np.isclose(aggregates.portfolio_values[name], value)
+
+
+def test_deltas_keep_the_aggregates_equal_to_a_rebuild():
+    rng = np.random.default_rng(11)
+    manager = PortfolioManager()
+    for name in ("Main", "Savings", "Kids"):
+        manager.add_portfolio(name)
+    aggregates = manager.aggregates
+    symbols = ["AAPL", "MSFT", "KO", "NVDA", "SAP.DE"]
+    for step in range(1500):
+        portfolio = manager.portfolios[("Main", "Savings", "Kids")[rng.integers(3)]]
+        symbol = symbols[rng.integers(len(symbols))]
+        held = portfolio.get_stock_quantity(symbol)
+        if held and rng.random() < 0.4:
+            portfolio.remove_stock(Stock(symbol, symbol, 0.0), int(rng.integers(1, held + 1)))
+        elif held and rng.random() < 0.2:
+            portfolio.update_prices({symbol: float(rng.uniform(1, 500))})
+        else:
+            portfolio.add_stock(Stock(symbol, symbol, float(rng.uniform(1, 500))), int(rng.integers(1, 20)))
+        if step % 100 == 0:
+            _assert_matches_rebuild(aggregates, manager.portfolios)
+    assert manager.aggregates is aggregates
+
+
+def test_top_holdings_and_rows_read_across_portfolios():
+    manager = PortfolioManager()
+    for name, symbol, quantity, price in (("Main", "AAPL", 10, 100.0), ("Main", "KO", 5, 60.0),
+                                          ("Savings", "AAPL", 2, 100.0), ("Savings", "MSFT", 1, 500.0)):
+        manager.add_portfolio(name)
+        manager.portfolios[name].add_stock(Stock(symbol, symbol, price), quantity)
+    aggregates = manager.aggregates
+    assert aggregates.top_holdings(2) == [("AAPL", 1200.0), ("MSFT", 500.0)]
+    assert aggregates.holders["AAPL"] == 2 and aggregates.unique_symbols() == 3
+    assert aggregates.average_position() == 2000.0 / 4
+    assert aggregates.portfolio_rows() == [{'name': 'Main', 'value': 1300.0, 'positions': 2},
+                                           {'name': 'Savings', 'value': 700.0, 'positions': 2}]
+
+    manager.portfolios["Main"].remove_stock(Stock("AAPL", "AAPL", 100.0), 10)
+    assert aggregates.top_holdings(2) == [("MSFT", 500.0), ("KO", 300.0)]
+    assert aggregates.holders["AAPL"] == 1
+
+    names, symbols, matrix = exposure_matrix(manager.portfolios)
+    assert names == ["Main", "Savings"] and symbols == ["KO", "AAPL", "MSFT"]
+    assert matrix.tolist() == [[300.0, 0.0, 0.0], [0.0, 200.0, 500.0]]
+
+
+def test_published_edits_carry_the_aggregates_forward(db):
+    with portfolio_store.edit("alice") as draft:
+        draft.add_portfolio("Main")
+        draft.get_portfolio("Main").add_stock(Stock("AAPL", "AAPL", 100.0), 10)
+    with portfolio_store.edit("alice", portfolios="Savings") as draft:
+        draft.add_portfolio("Savings")
+        draft.get_portfolio("Savings").add_stock(Stock("AAPL", "AAPL", 100.0), 3)
+    manager = portfolio_store.get_manager("alice")
+    assert manager.aggregates.exposure == {"AAPL": 1300.0}
+    _assert_matches_rebuild(manager.aggregates, manager.portfolios)
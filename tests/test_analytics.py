@@ -0,0 +1,35 @@
+# tests/test_analytics.py
+import numpy as np
+import pytest
+
+import analytics
+import history_store
+
+
+def test_rolling_window_matches_numpy_over_the_last_bars():
+    rng = np.random.default_rng(1)
+    r, m = rng.normal(0, 0.01, 300), rng.normal(0, 0.01, 300)
+    window = analytics.RollingWindow(50)
+    for i in range(300):
+        window.push(r[i], m[i], 100.0 + i)
+    last_r, last_m = r[-50:], m[-50:]
+
+    assert window.mean() == pytest.approx(last_r.mean())
+    assert window.variance() == pytest.approx(last_r.var(ddof=1))
+    assert window.beta() == pytest.approx(np.cov(last_r, last_m)[0, 1] / last_m.var(ddof=1))
+    assert window.quantile(0.05) == pytest.approx(np.quantile(last_r, 0.05))
+    assert window.values().tolist() == [100.0 + i for i in range(250, 300)]
+
+
+def test_render_path_reads_only_stored_bars(monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(history_store, "refresh", lambda *args, **kwargs: pytest.fail("fetched on render"))
+    monkeypatch.setattr(history_store, "read_array", lambda symbol, interval: np.empty(0, history_store.BAR_DTYPE))
+    monkeypatch.setattr(analytics, "_refresh_later", lambda *args: refreshed.append(args))
+    monkeypatch.setattr(analytics, "_states", analytics.OrderedDict())
+
+    metrics = analytics._metrics(("alice", None, "1y", "1d"), {"AAPL": 10}, {"AAPL": 1900.0},
+                                 "1y", "1d", fetch=False)
+    assert metrics['volatility'] is None
+    assert refreshed == [(["AAPL", analytics.BENCHMARK], "1y", "1d")]
+    assert not analytics._states
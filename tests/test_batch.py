@@ -0,0 +1,74 @@
+# tests/test_batch.py
+import pytest
+
+import symbols
+import utils
+from portfolio import PortfolioManager
+from stock import Stock
+from transaction import Transaction
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(utils, "fetch_stock_price", lambda symbol: None)
+    monkeypatch.setattr(symbols, "_resolved", {})
+    pm = PortfolioManager()
+    pm.add_portfolio("Main")
+    pm.get_portfolio("Main").add_stock(Stock("AAPL", "Apple Inc.", 150.0), 10)
+    return pm
+
+
+def _state(portfolio):
+    return ({s: (h.quantity, h.stock.price) for s, h in portfolio.stocks.items()},
+            portfolio.calculate_portfolio_value(), list(portfolio.pending_trades()))
+
+
+def test_batch_applies_every_leg_in_order(manager):
+    legs = [Transaction("MSFT", 'buy', 5, 300.0), Transaction("MSFT", 'sell', 2, 310.0),
+            Transaction("AAPL", 'sell', 10, 155.0)]
+    assert manager.process_batch("Main", legs) == 3
+    portfolio = manager.get_portfolio("Main")
+    assert {s: h.quantity for s, h in portfolio.stocks.items()} == {"MSFT": 3}
+    assert [trade[:3] for trade in portfolio.pending_trades()] == [
+        ("MSFT", 'buy', 5), ("MSFT", 'sell', 2), ("AAPL", 'sell', 10)]
+
+
+@pytest.mark.parametrize("bad_leg", [
+    Transaction("AAPL", 'sell', 12, 155.0),       # more than held after the earlier legs
+    Transaction("MSFT", 'sell', 6, 310.0),        # more than the batch bought
+    Transaction("NOTAREALTICKER", 'buy', 1, 1.0),  # unknown symbol the provider can't price
+    Transaction("MSFT", 'hold', 1, 1.0),
+    Transaction("MSFT", 'buy', 0, 1.0),
+], ids=["oversell-held", "oversell-bought", "unknown-symbol", "bad-action", "zero-quantity"])
+def test_a_failing_leg_leaves_the_portfolio_unchanged(manager, bad_leg):
+    portfolio = manager.get_portfolio("Main")
+    before = _state(portfolio)
+    legs = [Transaction("MSFT", 'buy', 5, 300.0), Transaction("AAPL", 'buy', 1, 150.0), bad_leg]
+    with pytest.raises(ValueError, match="Leg 3"):
+        manager.process_batch("Main", legs)
+    assert _state(portfolio) == before
+
+
+def test_missing_portfolio_is_rejected(manager):
+    with pytest.raises(ValueError, match="does not exist"):
+        manager.process_batch("Nope", [Transaction("AAPL", 'buy', 1, 1.0)])
+
+
+def test_rejected_api_batch_is_neither_saved_nor_published(db):
+    import portfolio_store
+    import web_app
+
+    with portfolio_store.edit("alice") as draft:
+        draft.add_portfolio("Main")
+        draft.get_portfolio("Main").add_stock(Stock("AAPL", "Apple Inc.", 150.0), 10)
+        db.save_portfolio(draft.get_portfolio("Main"), "alice")
+    version = portfolio_store.version("alice")
+
+    legs = [web_app.TradeLeg(symbol="MSFT", action="buy", quantity=5, price=300.0),
+            web_app.TradeLeg(symbol="AAPL", action="sell", quantity=11, price=155.0)]
+    with pytest.raises(ValueError, match="Leg 2"):
+        web_app.execute_batch("alice", "Main", legs)
+    assert portfolio_store.version("alice") == version
+    assert set(portfolio_store.get_manager("alice").get_portfolio("Main").stocks) == {"AAPL"}
+    saved = {p.name: p for p in db.load_portfolios("alice")}["Main"]
+    assert {s: h.quantity for s, h in saved.stocks.items()} == {"AAPL": 10}
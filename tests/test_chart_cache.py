@@ -0,0 +1,46 @@
+# tests/test_chart_cache.py
+import json
+
+import plotly.graph_objects as go
+import pytest
+
+import chart_cache
+import portfolio_store
+import web_app
+from market_cache import MarketDataCache
+from stock import Stock
+
+
+@pytest.fixture
+def charts(monkeypatch):
+    monkeypatch.setattr(chart_cache, "cache", MarketDataCache(max_bytes=chart_cache.MAX_BYTES))
+    builds = []
+    build = web_app.build_dashboard
+    monkeypatch.setattr(web_app, "build_dashboard", lambda pm: builds.append(1) or build(pm))
+    return builds
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_figure_json_round_trips_and_is_safe_to_inline(compact):
+    fig = go.Figure(go.Bar(x=["</script>", "KO"], y=[1.5, 2.0]))
+    text = chart_cache.figure_json(fig, compact=compact)
+    assert "</" not in text
+    assert json.loads(text)["data"][0]["x"] == ["</script>", "KO"]
+
+
+def test_dashboard_charts_are_rebuilt_only_when_holdings_change(db, charts):
+    with portfolio_store.edit("alice") as draft:
+        draft.add_portfolio("Main")
+        draft.get_portfolio("Main").add_stock(Stock("AAPL", "AAPL", 100.0), 10)
+
+    first = web_app.cached_dashboard("alice")
+    assert set(first["charts"]) == {"portfolio_values", "portfolio_positions", "top_holdings"}
+    assert web_app.cached_dashboard("alice") is first
+    assert len(charts) == 1
+
+    with portfolio_store.edit("alice", portfolios="Main") as draft:
+        draft.get_portfolio("Main").add_stock(Stock("KO", "KO", 60.0), 5)
+    assert web_app.cached_dashboard("alice")["total_value"] == 1300.0
+    assert len(charts) == 2
+    assert web_app.cached_dashboard("bob")["charts"] == {}
+    assert len(charts) == 3 and chart_cache.stats()["hits"] == 1
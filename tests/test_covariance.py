@@ -0,0 +1,75 @@
+# tests/test_covariance.py
+import numpy as np
+import pytest
+
+import covariance
+import history_store
+import market_cache
+from portfolio import Portfolio
+from stock import Stock
+
+DAY = history_store.DAY
+START = 1_735_776_000  # 2025-01-02 00:00 UTC
+
+
+def _bars(closes, first_day=0):
+    bars = np.zeros(len(closes), dtype=history_store.BAR_DTYPE)
+    bars['ts'] = START + (first_day + np.arange(len(closes))) * DAY
+    bars['close'] = closes
+    return bars
+
+
+@pytest.fixture
+def market(monkeypatch):
+    rng = np.random.default_rng(3)
+    closes = {s: 100 * np.cumprod(1 + rng.normal(0, 0.02, 60)) for s in ("AAPL", "MSFT", "KO")}
+    bars = {s: _bars(c[:40]) for s, c in closes.items()}
+    monkeypatch.setattr(history_store, "refresh", lambda symbols, period, interval: {})
+    monkeypatch.setattr(history_store, "read_array", lambda symbol, interval: bars.get(symbol, _bars([])))
+    monkeypatch.setattr(market_cache, "ttl_for", lambda interval: 0)  # always look for new bars
+    monkeypatch.setattr(covariance, "_matrices", type(covariance._matrices)())
+    return bars, closes
+
+
+def _ewma(closes):
+    """The RiskMetrics recursion, one bar at a time, over all but the newest bar"""
+    matrix = np.column_stack(closes)[:-1]
+    returns = matrix[1:] / matrix[:-1] - 1
+    raw, weight = np.zeros((returns.shape[1],) * 2), 0.0
+    for r in returns:
+        raw = covariance.DECAY * raw + (1 - covariance.DECAY) * np.outer(r, r)
+        weight = covariance.DECAY * weight + (1 - covariance.DECAY)
+    return raw / weight
+
+
+def test_rank_one_updates_match_a_full_rebuild(market):
+    bars, closes = market
+    symbols, first = covariance.covariance(["MSFT", "AAPL", "KO", "AAPL"])
+    assert symbols == ["AAPL", "KO", "MSFT"] and first.dtype == np.float32
+    assert np.allclose(first, _ewma([bars[s]['close'] for s in symbols]), rtol=1e-4, atol=1e-9)
+
+    for s in symbols:
+        bars[s] = _bars(closes[s])
+    _, updated = covariance.covariance(symbols)
+    covariance.invalidate()
+    _, rebuilt = covariance.covariance(symbols)
+    assert np.allclose(updated, rebuilt, rtol=1e-4, atol=1e-9)
+    assert np.allclose(updated, _ewma([closes[s] for s in symbols]), rtol=1e-4, atol=1e-9)
+
+
+def test_correlation_and_a_symbol_without_history(market):
+    symbols, corr = covariance.correlation(["AAPL", "MSFT", "NEW"])
+    assert symbols == ["AAPL", "MSFT", "NEW"]
+    assert np.allclose(np.diag(corr), 1.0) and np.allclose(corr, corr.T)
+    assert corr[2, 0] == 0.0 and corr[0, 2] == 0.0
+
+
+def test_risk_contributions_add_up_to_the_portfolio_volatility(market):
+    portfolio = Portfolio("Main")
+    for symbol, quantity in (("AAPL", 10), ("MSFT", 5), ("KO", 20)):
+        portfolio.add_stock(Stock(symbol, symbol, 100.0), quantity)
+    frame = covariance.risk_contributions(portfolio)
+    assert np.isclose(frame['Weight'].sum(), 1.0)
+    assert np.isclose(frame['Contribution'].sum(), frame.attrs['volatility'])
+    assert np.isclose(frame['Share'].sum(), 1.0)
+    assert frame['Contribution'].is_monotonic_decreasing
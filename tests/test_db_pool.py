@@ -0,0 +1,65 @@
+# tests/test_db_pool.py
+import queue
+import threading
+
+import pytest
+
+import db_pool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = db_pool.ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    yield pool
+    pool.close()
+
+
+def test_connections_are_reused_and_configured(pool):
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pool.connection() as conn:
+        assert conn is first
+    metrics = pool.metrics()
+    assert metrics["open"] == 1 and metrics["reused"] == 2 and metrics["in_use"] == 0
+
+
+def test_transaction_commits_or_rolls_back_as_a_whole(pool):
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("abort")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(1,)]
+        assert not conn.in_transaction
+
+
+def test_a_full_pool_makes_callers_wait_for_a_release(pool):
+    held = [pool.acquire(), pool.acquire()]
+    assert pool.metrics()["open"] == 2
+    with pytest.raises(queue.Empty):
+        pool.acquire(timeout=0.05)
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=5)))
+    waiter.start()
+    pool.release(held.pop())
+    waiter.join(5)
+    assert got and pool.metrics()["open"] == 2 and pool.metrics()["waits"] >= 1
+    pool.release(got[0])
+    pool.release(held.pop())
+
+
+def test_get_pool_is_shared_per_file_and_replaced_once_closed(tmp_path):
+    path = str(tmp_path / "shared.db")
+    pool = db_pool.get_pool(path)
+    assert db_pool.get_pool(path) is pool
+    pool.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        pool.acquire()
+    assert db_pool.get_pool(path) is not pool
+    db_pool.get_pool(path).close()
@@ -0,0 +1,73 @@
+# tests/test_downsample.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import downsample
+
+
+def _lttb_reference(x, y, threshold):
+    """Textbook LTTB, one point at a time, over the same bucket edges"""
+    n, buckets = len(x), threshold - 2
+    edges = [i * (n - 2) // buckets + 1 for i in range(buckets + 1)]
+    kept, a = [0], 0
+    for j in range(buckets):
+        if j + 1 < buckets:
+            nx, ny = np.mean(x[edges[j + 1]:edges[j + 2]]), np.mean(y[edges[j + 1]:edges[j + 2]])
+        else:
+            nx, ny = x[-1], y[-1]
+        areas = [abs((x[a] - nx) * (y[k] - y[a]) - (x[a] - x[k]) * (ny - y[a])) for k in range(edges[j], edges[j + 1])]
+        a = edges[j] + int(np.argmax(areas))
+        kept.append(a)
+    return kept + [n - 1], edges
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_lttb_matches_the_reference_and_keeps_endpoints_and_extremes(seed):
+    rng = np.random.default_rng(seed)
+    n, threshold = int(rng.integers(100, 3000)), int(rng.integers(3, 200))
+    x = np.sort(rng.uniform(0, 1e6, n))
+    y = np.cumsum(rng.standard_normal(n))
+
+    kept = downsample.lttb_indices(x, y, threshold)
+    reference, edges = _lttb_reference(x, y, threshold)
+
+    assert kept[0] == 0 and kept[-1] == n - 1
+    assert np.all(np.diff(kept) > 0)
+    assert y.argmin() in kept and y.argmax() in kept
+    assert len(kept) in (threshold, threshold + 1)
+    # Every bucket's pick is the reference's, except where an extreme took its place
+    extreme_buckets = {int(np.searchsorted(edges, k, side='right')) for k in (y.argmin(), y.argmax())}
+    for bucket in range(1, threshold - 1):
+        if bucket not in extreme_buckets and len(kept) == threshold:
+            assert kept[bucket] == reference[bucket]
+
+
+def test_short_series_are_returned_whole():
+    assert downsample.lttb_indices([1, 2, 3], [5, 4, 6], 10).tolist() == [0, 1, 2]
+
+
+def test_ohlc_buckets_keep_every_high_low_and_the_volume():
+    rng = np.random.default_rng(0)
+    n = 1003
+    close = 100 + np.cumsum(rng.standard_normal(n))
+    high, low = close + rng.uniform(0, 1, n), close - rng.uniform(0, 1, n)
+    volume = rng.uniform(1, 100, n)
+    starts, o, h, l, c, v = downsample.ohlc_buckets(close, high, low, close, volume, 50)
+
+    assert len(starts) <= 50
+    ends = np.r_[starts[1:], n] - 1
+    assert o.tolist() == close[starts].tolist() and c.tolist() == close[ends].tolist()
+    assert h.max() == high.max() and l.min() == low.min()
+    assert v.sum() == pytest.approx(volume.sum())
+
+
+def test_line_caches_until_the_series_changes():
+    index = pd.date_range("2024-01-01", periods=5000, freq="min", tz="UTC")
+    series = pd.Series(np.sin(np.arange(5000) / 50.0), index=index)
+    downsample.invalidate("T")
+    first = downsample.line(series, 400, key=("T", "1m"))
+    assert downsample.line(series, 400, key=("T", "1m")) is first
+    grown = pd.concat([series, pd.Series([2.0], index=[index[-1] + pd.Timedelta(minutes=1)])])
+    assert downsample.line(grown, 400, key=("T", "1m")).iloc[-1] == 2.0
+    downsample.invalidate("T")
@@ -0,0 +1,41 @@
+# tests/test_history_store.py
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import history_store
+import market_fetch
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_DB", str(tmp_path / "history.db"))
+    monkeypatch.setattr(history_store, "ARRAY_DIR", str(tmp_path / "arrays"))
+    monkeypatch.setattr(history_store, "_arrays", {})
+    return history_store
+
+
+def _daily(days, tz="America/New_York"):
+    index = pd.DatetimeIndex(pd.to_datetime(days)).tz_localize(tz)
+    close = np.arange(100.0, 100.0 + len(days))
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': np.full(len(days), 1000.0)}, index=index)
+
+
+def test_day_periods_count_sessions_across_a_weekend(store, monkeypatch):
+    frame = _daily(["2025-01-08", "2025-01-09", "2025-01-10", "2025-01-13"])  # Wed Thu Fri Mon
+    monkeypatch.setattr(market_fetch, "fetch_histories", lambda symbols, **kw: {s: frame for s in symbols})
+
+    two = store.get_frames(["AAPL"], period="2d")["AAPL"]
+    assert [d.day for d in two.index] == [10, 13]
+    assert two['Close'].tolist() == [102.0, 103.0]
+    assert len(store.get_frames(["AAPL"], period="1d")["AAPL"]) == 1
+
+
+def test_fetch_start_reaches_back_past_the_weekend(store):
+    monday = datetime(2025, 1, 13, 18, tzinfo=timezone.utc).timestamp()
+    start = datetime.fromtimestamp(store._fetch_start("2d", monday), timezone.utc)
+    assert start.date().isoformat() == "2025-01-09"  # two sessions plus one: Thursday
+    assert store._fetch_start("1mo", monday) == store.period_start("1mo", monday)
@@ -0,0 +1,50 @@
+# tests/test_importer.py
+import io
+
+import pytest
+
+import database
+import importer
+import portfolio_store
+
+HEADER = "portfolio,symbol,side,quantity,price,date\n"
+
+
+def _import(text, username="alice"):
+    return importer.import_file(io.StringIO(HEADER + text), username)
+
+
+def test_import_applies_net_positions(db):
+    stats = _import("Brokerage,AAPL,buy,10,150,2024-01-02\n"
+                    "Brokerage,AAPL,sell,4,155,2024-01-03\n"
+                    "Brokerage,MSFT,buy,5,300,2024-01-03\n"
+                    "Brokerage,MSFT,bogus,5,300,2024-01-03\n")
+    assert (stats['imported'], stats['rejected']) == (3, 1)
+    portfolio = portfolio_store.get_manager("alice").get_portfolio("Brokerage")
+    assert portfolio.get_stock_quantity("AAPL") == 6
+    assert portfolio.get_stock_quantity("MSFT") == 5
+
+
+def test_portfolio_whose_trades_cancel_out_is_created(db):
+    stats = _import("NewP,AAPL,buy,10,150,2024-01-02\n"
+                    "NewP,AAPL,sell,10,155,2024-01-03\n")
+    assert stats['imported'] == 2
+    portfolio = portfolio_store.get_manager("alice").get_portfolio("NewP")
+    assert portfolio is not None and not portfolio.stocks
+    assert [row[1:3] for row in database.trade_log("alice", "NewP")] == [("AAPL", "buy"), ("AAPL", "sell")]
+
+
+def test_oversell_aborts_the_whole_import(db):
+    with pytest.raises(ValueError, match=r"^Trade #2 sells 2 AAPL but portfolio 'Brokerage' holds only 1$"):
+        _import("Brokerage,AAPL,buy,1,150,2024-01-02\n"
+                "Brokerage,AAPL,sell,2,155,2024-01-03\n")
+    assert "Brokerage" not in portfolio_store.get_manager("alice").portfolios
+    assert database.trade_log("alice", "Brokerage") == []
+
+
+def test_fractional_quantities_survive_a_reload(db):
+    _import("Funds,VTI,buy,1.5,200,2024-01-02\n")
+    assert database.replay_positions("alice", "Funds")["VTI"]['quantity'] == 1.5
+    portfolio_store.evict()
+    reloaded = portfolio_store.get_manager("alice").get_portfolio("Funds")
+    assert reloaded.get_stock_quantity("VTI") == 1.5
@@ -0,0 +1,87 @@
+# tests/test_indicators.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import history_store
+import indicators
+
+
+def _bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    bars = np.zeros(n, dtype=history_store.BAR_DTYPE)
+    bars['ts'] = 1_700_000_000 + 86_400 * np.arange(n)
+    bars['open'], bars['close'] = np.r_[close[0], close[:-1]], close
+    bars['high'], bars['low'] = close * 1.01, close * 0.99
+    bars['volume'] = rng.integers(1_000, 10_000, n)
+    return bars
+
+
+def _one_pass(indicator, bars):
+    return indicator.run(bars, indicator.initial())[0]
+
+
+def _in_pieces(indicator, bars, cuts):
+    state, parts = indicator.initial(), []
+    for piece in np.split(bars, cuts):
+        out, state = indicator.run(piece, state)
+        parts.append(out)
+    return {c: np.concatenate([p[c] for p in parts]) for c in indicator.columns}
+
+
+def _rsi_reference(close, window):
+    change = close.diff().iloc[1:]
+    gain = change.clip(lower=0).ewm(alpha=1 / window, adjust=False).mean()
+    loss = (-change).clip(lower=0).ewm(alpha=1 / window, adjust=False).mean()
+    rsi = (100 - 100 / (1 + gain / loss)).where(loss > 0, 100.0)
+    rsi.iloc[:window - 1] = np.nan
+    return pd.concat([pd.Series([np.nan]), rsi]).to_numpy()
+
+
+def test_indicators_match_pandas():
+    bars = _bars(400)
+    close = pd.Series(bars['close'])
+
+    np.testing.assert_allclose(_one_pass(indicators.SMA(20), bars)["SMA_20"],
+                               close.rolling(20).mean(), rtol=1e-10)
+    np.testing.assert_allclose(_one_pass(indicators.EMA(12), bars)["EMA_12"],
+                               close.ewm(span=12, adjust=False).mean(), rtol=1e-10)
+    np.testing.assert_allclose(_one_pass(indicators.RSI(14), bars)["RSI_14"],
+                               _rsi_reference(close, 14), rtol=1e-9)
+
+    macd = _one_pass(indicators.MACD(), bars)
+    line = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    np.testing.assert_allclose(macd["MACD"], line, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(macd["MACD_signal"], line.ewm(span=9, adjust=False).mean(), rtol=1e-9, atol=1e-12)
+
+    bands = _one_pass(indicators.Bollinger(20, 2.0), bars)
+    std = close.rolling(20).std(ddof=0)
+    np.testing.assert_allclose(bands["BB_mid"], close.rolling(20).mean(), rtol=1e-10)
+    np.testing.assert_allclose(bands["BB_upper"], close.rolling(20).mean() + 2 * std, rtol=1e-9)
+
+
+@pytest.mark.parametrize("indicator", [
+    indicators.SMA(20), indicators.SMA(10), indicators.EMA(12), indicators.MACD(), indicators.RSI(14),
+    indicators.Bollinger(20), indicators.VWAP(), indicators.VWAP(10), indicators.ATR(14),
+], ids=lambda ind: "-".join(map(str, ind.key())))
+def test_running_in_pieces_equals_one_pass(indicator):
+    bars = _bars(300, seed=1)
+    whole = _one_pass(indicator, bars)
+    pieces = _in_pieces(indicator, bars, [1, 7, 8, 150, 299])
+    for column in indicator.columns:
+        np.testing.assert_allclose(pieces[column], whole[column], rtol=1e-9, atol=1e-12)
+
+
+def test_compute_extends_the_cached_state_as_bars_arrive(monkeypatch):
+    bars = _bars(250, seed=2)
+    stored = {'n': 200}
+    monkeypatch.setattr(history_store, "read_array", lambda symbol, interval: bars[:stored['n']])
+    indicators.invalidate()
+
+    indicators.compute("TEST", "1d", indicators.RSI(14))
+    stored['n'] = 250
+    grown = indicators.compute("TEST", "1d", indicators.RSI(14))
+    assert indicators._results[("TEST", "1d", ("RSI", 14))].count == 249
+    np.testing.assert_allclose(grown["RSI_14"], _rsi_reference(pd.Series(bars['close']), 14), rtol=1e-9)
+    indicators.invalidate()
@@ -0,0 +1,26 @@
+# tests/test_lazy_imports.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("pandas", "plotly", "yfinance")
+
+
+def _loaded_after_import(module):
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    return result.stdout.split()
+
+
+# web_app and the modules pages import at the top; each loads pandas,
+# plotly and yfinance only when a function needs them
+@pytest.mark.parametrize("module", [
+    "web_app", "portfolio_store", "market_cache", "providers", "symbols",
+    "report", "valuation", "covariance", "indicators", "analytics", "downsample",
+])
+def test_heavy_dependencies_are_not_imported_at_startup(module):
+    assert _loaded_after_import(module) == []
@@ -0,0 +1,51 @@
+# tests/test_ledger.py
+import numpy as np
+
+import database
+from portfolio import Portfolio
+from transaction import Transaction
+
+
+def _recompute(username, name):
+    """Positions from a full pass over the ledger, ignoring checkpoints"""
+    rows = database.trade_log(username, name)
+    positions = {}
+    for _, symbol, side, quantity, _ in rows:
+        positions[symbol] = positions.get(symbol, 0) + (quantity if side == 'buy' else -quantity)
+    return {symbol: quantity for symbol, quantity in positions.items() if quantity > 0}
+
+
+def test_checkpointed_replay_equals_a_fresh_recompute(db, monkeypatch):
+    monkeypatch.setattr(database, "CHECKPOINT_EVERY", 7)
+    rng = np.random.default_rng(3)
+    portfolio = Portfolio("Ledger")
+    symbols = ["AAPL", "MSFT", "NVDA"]
+    for step in range(120):
+        symbol = symbols[rng.integers(len(symbols))]
+        held = portfolio.get_stock_quantity(symbol)
+        if held and rng.random() < 0.4:
+            Transaction(symbol, 'sell', int(rng.integers(1, held + 1)), 100.0 + step).execute(portfolio)
+        else:
+            Transaction(symbol, 'buy', int(rng.integers(1, 20)), 100.0 + step).execute(portfolio)
+        if step % 3 == 0:
+            database.save_portfolio(portfolio, "alice")
+    database.save_portfolio(portfolio, "alice")
+
+    with database._pool().connection() as conn:
+        checkpoints = conn.execute('SELECT COUNT(*) FROM checkpoints WHERE txn_id > 0').fetchone()[0]
+    assert checkpoints >= 1
+
+    replayed = {s: p['quantity'] for s, p in database.replay_positions("alice", "Ledger").items()}
+    held = {s: h.quantity for s, h in portfolio.stocks.items()}
+    assert replayed == _recompute("alice", "Ledger") == held
+    assert len(database.trade_log("alice", "Ledger")) == 120
+
+
+def test_replay_reports_the_last_traded_price(db):
+    portfolio = Portfolio("Prices")
+    Transaction("AAPL", 'buy', 5, 150.0).execute(portfolio)
+    Transaction("AAPL", 'buy', 5, 160.0).execute(portfolio)
+    Transaction("AAPL", 'sell', 10, 170.0).execute(portfolio)
+    Transaction("MSFT", 'buy', 2, 300.0).execute(portfolio)
+    database.save_portfolio(portfolio, "alice")
+    assert database.replay_positions("alice", "Prices") == {"MSFT": {'quantity': 2.0, 'price': 300.0}}
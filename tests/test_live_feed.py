@@ -0,0 +1,114 @@
+# tests/test_live_feed.py
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+import live_feed
+import market_cache
+import market_fetch
+
+
+def test_market_feed_reads_stored_quotes_and_caches_the_rest(db, monkeypatch):
+    db.save_quotes({"AAPL": (190.0, 188.0)}, 0.0)
+    requested = []
+
+    def histories(symbols, period, interval):
+        requested.append((tuple(symbols), period, interval))
+        return {s: pd.DataFrame({'Close': [100.0, 101.0]}) for s in symbols}
+
+    def no_download(*args, **kwargs):
+        raise AssertionError("the live feed must not download bars itself")
+
+    monkeypatch.setattr(market_cache, "get_histories", histories)
+    monkeypatch.setattr(market_fetch, "fetch_histories", no_download)
+
+    quotes = live_feed.MarketFeed().quotes(["AAPL", "^GSPC"])
+    assert quotes == {"AAPL": (190.0, 188.0), "^GSPC": (101.0, 100.0)}
+    assert requested == [(("^GSPC",), "2d", "1d")]
+
+
+class _Feed:
+    """Serves whatever quotes the test sets"""
+
+    def __init__(self):
+        self.current = {}
+
+    def quotes(self, symbols):
+        return {s: self.current[s] for s in symbols if s in self.current}
+
+
+def _drain(subscriber):
+    """(event, data) of every message queued for a subscriber"""
+    messages = []
+    while not subscriber.queue.empty():
+        lines = dict(line.split(": ", 1) for line in subscriber.queue.get_nowait().strip().split("\n"))
+        messages.append((lines["event"], json.loads(lines["data"])))
+    return messages
+
+
+@pytest.fixture
+def hub(db, monkeypatch):
+    import portfolio_store
+    from stock import Stock
+
+    with portfolio_store.edit("alice") as draft:
+        draft.add_portfolio("Main")
+        draft.get_portfolio("Main").add_stock(Stock("AAPL", "Apple Inc.", 150.0), 10)
+    monkeypatch.setattr(market_cache, "MARKET_INDICES", {"^GSPC": "S&P 500"})
+    hub = live_feed.LiveHub(_Feed())
+    # Polls are driven by the test, not the poller thread
+    monkeypatch.setattr(hub, "start", lambda: None)
+    return hub
+
+
+def test_hub_fans_each_change_out_to_every_subscriber_once(hub):
+    async def run():
+        loop = asyncio.get_running_loop()
+        first, second = hub.subscribe("alice", loop), hub.subscribe("alice", loop)
+
+        hub.feed.current = {"AAPL": (160.0, 150.0), "^GSPC": (5000.0, 4990.0)}
+        hub.poll_once()
+        await asyncio.sleep(0)
+        received = _drain(first)
+        assert received == _drain(second)
+        assert [event for event, _ in received] == ["quotes", "portfolios"]
+        assert set(received[0][1]["quotes"]) == {"AAPL", "^GSPC"}
+        assert received[1][1]["total_value"] == 1600.0
+
+        # Only the index moved: just it is sent, and the holdings' value is not
+        hub.feed.current = {"AAPL": (160.0, 150.0), "^GSPC": (5010.0, 4990.0)}
+        hub.poll_once()
+        await asyncio.sleep(0)
+        received = _drain(first)
+        assert received == _drain(second)
+        assert [(event, set(data["quotes"])) for event, data in received] == [("quotes", {"^GSPC"})]
+
+        # Nothing moved: nothing is re-sent
+        hub.poll_once()
+        await asyncio.sleep(0)
+        assert _drain(first) == _drain(second) == []
+
+    asyncio.run(run())
+
+
+def test_hub_drops_a_subscriber_once_it_disconnects(hub):
+    async def run():
+        loop = asyncio.get_running_loop()
+        staying = hub.subscribe("alice", loop)
+        hub.feed.current = {"AAPL": (160.0, 150.0), "^GSPC": (5000.0, 4990.0)}
+
+        async def disconnected():
+            return True
+
+        # The stream sends its snapshot, sees the client gone, and unsubscribes
+        stream = [message async for message in hub.events("alice", disconnected)]
+        assert any("event: portfolios" in message for message in stream)
+        assert hub._subscribers == {staying}
+
+        hub.poll_once()
+        await asyncio.sleep(0)
+        assert [event for event, _ in _drain(staying)] == ["quotes", "portfolios"]
+
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+# tests/test_load_portfolios.py
+import numpy as np
+
+import database
+from portfolio import Portfolio
+from stock import Stock
+
+
+def _save(name, holdings, username="alice"):
+    portfolio = Portfolio(name)
+    for symbol, quantity, price in holdings:
+        portfolio.add_stock(Stock(symbol, symbol, price), quantity)
+    database.save_portfolio(portfolio, username)
+    return portfolio
+
+
+def _by_name(username="alice"):
+    return {p.name: p for p in database.load_portfolios(username)}
+
+
+def test_round_trip_keeps_each_portfolio_apart(db):
+    _save("Growth", [("AAPL", 3, 190.0), ("NVDA", 2, 900.0)])
+    _save("Empty", [])
+    _save("Income", [("KO", 10, 60.0), ("AAPL", 1, 190.0)])
+    _save("Growth", [("MSFT", 4, 410.0)], username="bob")
+
+    loaded = _by_name()
+    assert set(loaded) == {"Growth", "Empty", "Income"}
+    assert {s: h.quantity for s, h in loaded["Growth"].stocks.items()} == {"AAPL": 3, "NVDA": 2}
+    assert {s: h.quantity for s, h in loaded["Income"].stocks.items()} == {"KO": 10, "AAPL": 1}
+    assert loaded["Empty"].stocks == {}
+    assert set(_by_name("bob")["Growth"].stocks) == {"MSFT"}
+
+
+def test_loaded_columns_match_the_holdings(db):
+    _save("Growth", [("AAPL", 3, 190.0), ("NVDA", 2, 900.0), ("KO", 5, 60.0)])
+    portfolio = _by_name()["Growth"]
+
+    assert portfolio.calculate_portfolio_value() == 3 * 190.0 + 2 * 900.0 + 5 * 60.0
+    for symbol, holding in portfolio.stocks.items():
+        assert portfolio._symbols[holding._row] == symbol
+        assert portfolio._qty[holding._row] == holding.quantity
+        assert portfolio._px[holding._row] == holding.stock.price
+    assert not portfolio._dirty
+
+    # A loaded portfolio still grows and shrinks like any other
+    portfolio.add_stock(Stock("MSFT", "MSFT", 410.0), 1)
+    portfolio.remove_stock(Stock("AAPL", "AAPL", 190.0), 3)
+    assert np.isclose(portfolio.calculate_portfolio_value(), 2 * 900.0 + 5 * 60.0 + 410.0)
+    assert portfolio._dirty == {"MSFT", "AAPL"}
+
+
+def test_quantities_load_as_saved(db):
+    _save("Funds", [("VTI", 12, 250.0), ("VXUS", 2.5, 60.0)])
+    stocks = _by_name()["Funds"].stocks
+    assert stocks["VTI"].quantity == 12 and isinstance(stocks["VTI"].quantity, int)
+    assert stocks["VXUS"].quantity == 2.5
+
+
+def test_prices_come_from_the_quotes_table_when_present(db):
+    _save("Growth", [("AAPL", 3, 190.0), ("NVDA", 2, 900.0)])
+    database.save_quotes({"AAPL": (200.0, 195.0)}, "2026-10-18T00:00:00")
+    stocks = _by_name()["Growth"].stocks
+    assert stocks["AAPL"].stock.price == 200.0
+    assert stocks["NVDA"].stock.price == 900.0
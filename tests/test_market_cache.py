@@ -0,0 +1,89 @@
+# tests/test_market_cache.py
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import market_cache
+
+
+def test_hits_within_ttl_and_reloads_after_expiry(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(market_cache.time, "monotonic", lambda: clock[0])
+    cache = market_cache.MarketDataCache()
+    loads = []
+
+    def load():
+        loads.append(clock[0])
+        return len(loads)
+
+    assert cache.get("k", load, ttl=60) == 1
+    clock[0] += 59
+    assert cache.get("k", load, ttl=60) == 1
+    clock[0] += 2
+    assert cache.get("k", load, ttl=60) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_misses_are_loaded_in_one_batch_and_frames_are_detached():
+    cache = market_cache.MarketDataCache()
+    batches = []
+
+    def load(keys):
+        batches.append(list(keys))
+        return {key: pd.DataFrame({'Close': [1.0, 2.0]}) for key in keys}
+
+    first = cache.get_many(["A", "B"], load, ttl=60)
+    first["A"]["SMA"] = 0.0  # callers add columns to what they get back
+    again = cache.get_many(["A", "B", "C"], load, ttl=60)
+    assert batches == [["A", "B"], ["C"]]
+    assert list(again["A"].columns) == ["Close"]
+
+
+def test_concurrent_requests_for_a_key_share_one_load():
+    cache = market_cache.MarketDataCache()
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get("k", slow, ttl=60)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get("k", slow, ttl=60)))
+    waiter.start()
+    while not cache.stats()["coalesced"]:
+        time.sleep(0.001)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == ["value", "value"] and loads == [1]
+    assert cache.stats()["coalesced"] == 1
+
+
+def test_failed_loads_are_not_cached_and_waiters_see_the_error():
+    cache = market_cache.MarketDataCache()
+
+    def fail():
+        raise ConnectionError("provider down")
+
+    with pytest.raises(ConnectionError):
+        cache.get("k", fail, ttl=60)
+    assert cache.get("k", lambda: "ok", ttl=60) == "ok"
+
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_budget():
+    cache = market_cache.MarketDataCache(max_bytes=3 * market_cache._sizeof("x" * 1000))
+    for key in "abc":
+        cache.get(key, lambda: "x" * 1000, ttl=60)
+    cache.get("a", lambda: "unused", ttl=60)  # touch: "b" is now the oldest
+    cache.get("d", lambda: "x" * 1000, ttl=60)
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("b", lambda: "reloaded", ttl=60) == "reloaded"
+    assert cache.get("a", lambda: "unused", ttl=60) == "x" * 1000
@@ -0,0 +1,59 @@
+# tests/test_market_fetch.py
+import threading
+
+import pandas as pd
+
+import market_fetch
+
+
+def _frame(*closes, start="2024-01-02", tz="America/New_York"):
+    index = pd.date_range(start, periods=len(closes), freq="D", tz=tz)
+    return pd.DataFrame({'Close': list(closes)}, index=index)
+
+
+def test_symbols_are_fetched_in_batches_and_returned_in_order(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def download(symbols, window, interval, timeout):
+        with lock:
+            calls.append(list(symbols))
+        return {s: _frame(1.0) for s in symbols if s != "BAD"}
+
+    monkeypatch.setattr(market_fetch, "_download", download)
+    symbols = [f"S{i}" for i in range(5)] + ["BAD", "S0"]
+    result = market_fetch.fetch_histories(symbols, period="1mo", batch_size=2, backoff=0)
+
+    assert list(result) == [f"S{i}" for i in range(5)] + ["BAD"]
+    assert result["BAD"].empty and not result["S4"].empty
+    # A batch that returned anything is not retried for its unknown symbols
+    assert sorted(map(tuple, calls)) == [("S0", "S1"), ("S2", "S3"), ("S4", "BAD")]
+
+
+def test_a_batch_that_fails_outright_is_retried(monkeypatch):
+    attempts = []
+
+    def download(symbols, window, interval, timeout):
+        attempts.append(list(symbols))
+        if len(attempts) < 3:
+            raise TimeoutError("upstream timed out")
+        return {s: _frame(1.0) for s in symbols}
+
+    monkeypatch.setattr(market_fetch, "_download", download)
+    result = market_fetch.fetch_histories(["AAPL", "MSFT"], period="5d", retries=2, backoff=0)
+    assert len(attempts) == 3 and not result["AAPL"].empty
+
+    attempts.clear()
+    result = market_fetch.fetch_histories(["AAPL"], period="5d", retries=1, backoff=0)
+    assert len(attempts) == 2 and result["AAPL"].empty
+
+
+def test_align_closes_lines_up_exchanges_by_trading_date():
+    closes = market_fetch.align_closes({
+        "AAPL": _frame(1.0, 2.0, 3.0),
+        "SAP.DE": _frame(10.0, 20.0, start="2024-01-03", tz="Europe/Berlin"),
+        "EMPTY": pd.DataFrame(),
+    }, by_date=True)
+    assert list(closes.columns) == ["AAPL", "SAP.DE"]
+    assert closes.index.tz is None and len(closes) == 3
+    assert closes["SAP.DE"].isna().tolist() == [True, False, False]
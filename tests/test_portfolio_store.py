@@ -0,0 +1,96 @@
+# tests/test_portfolio_store.py
+import pytest
+
+import portfolio_store
+import utils
+import web_app
+from stock import Stock
+
+
+def _seed(db, user="alice"):
+    with portfolio_store.edit(user) as draft:
+        draft.add_portfolio("Main")
+        draft.get_portfolio("Main").add_stock(Stock("AAPL", "Apple Inc.", 150.0), 10)
+        db.save_portfolio(draft.get_portfolio("Main"), user)
+    return portfolio_store.version(user)
+
+
+def test_an_edit_that_changes_nothing_is_not_published(db, monkeypatch):
+    version = _seed(db)
+    published = portfolio_store.get_manager("alice").portfolios
+    notified = []
+    monkeypatch.setattr(portfolio_store, "_listeners", [])
+    portfolio_store.subscribe(lambda user, v: notified.append(v))
+    with portfolio_store.edit("alice", portfolios="Main") as draft:
+        draft.get_portfolio("Main")  # copied, but left alone
+    assert portfolio_store.version("alice") == version
+    assert portfolio_store.get_manager("alice").portfolios is published
+    assert notified == []
+
+
+def test_rejected_add_stock_leaves_the_version_unchanged(db, monkeypatch):
+    version = _seed(db)
+    monkeypatch.setattr(utils, "fetch_stock_price", lambda symbol: None)
+    assert web_app.add_stock_to("alice", "Main", "MSFT", 1) is False
+    assert web_app.add_stock_to("alice", "Missing", "MSFT", 1) is None
+    assert portfolio_store.version("alice") == version
+
+    monkeypatch.setattr(utils, "fetch_stock_price", lambda symbol: 300.0)
+    assert web_app.add_stock_to("alice", "Main", "MSFT", 1) is True
+    assert portfolio_store.version("alice") == version + 1
+
+
+def test_batch_for_a_missing_portfolio_leaves_the_version_unchanged(db):
+    version = _seed(db)
+    legs = [web_app.TradeLeg(symbol="AAPL", action="sell", quantity=1, price=155.0)]
+    assert web_app.execute_batch("alice", "Missing", legs) is None
+    assert portfolio_store.version("alice") == version
+    assert web_app.execute_batch("alice", "Main", legs)["positions"] == 1
+    assert portfolio_store.version("alice") == version + 1
+
+
+def test_sessions_share_one_manager_and_see_edits_copy_on_write(db):
+    _seed(db)
+    manager = portfolio_store.get_manager("alice")
+    assert portfolio_store.get_manager("alice") is manager
+    before = manager.portfolios["Main"]
+
+    with portfolio_store.edit("alice", writer="tab-1") as draft:
+        draft.get_portfolio("Main").add_stock(Stock("AAPL", "Apple Inc.", 150.0), 5)
+        assert manager.portfolios["Main"] is before  # not visible until published
+    assert before.get_stock_quantity("AAPL") == 10
+    assert manager.portfolios["Main"].get_stock_quantity("AAPL") == 15
+
+    # Evicted managers are loaded again on next use
+    portfolio_store.evict("alice")
+    assert portfolio_store.get_manager("alice") is not manager
+
+
+def test_a_failed_edit_is_discarded(db):
+    version = _seed(db)
+    with pytest.raises(RuntimeError):
+        with portfolio_store.edit("alice") as draft:
+            draft.get_portfolio("Main").add_stock(Stock("MSFT", "Microsoft", 300.0), 1)
+            raise RuntimeError("abort")
+    assert portfolio_store.version("alice") == version
+    assert not portfolio_store.get_manager("alice").portfolios["Main"].has_stock("MSFT")
+
+
+def test_scoped_edits_may_only_touch_their_portfolios(db):
+    _seed(db)
+    with portfolio_store.edit("alice") as draft:
+        draft.add_portfolio("Savings")
+    with pytest.raises(ValueError, match="'Savings' is not part of this edit"):
+        with portfolio_store.edit("alice", portfolios="Main") as draft:
+            draft.get_portfolio("Savings")
+
+
+def test_changed_by_others_ignores_own_and_quiet_writes(db):
+    since = _seed(db)
+    with portfolio_store.edit("alice", writer="tab-1") as draft:
+        draft.add_portfolio("Savings")
+    with portfolio_store.edit("alice", writer="price_refresher") as draft:
+        draft.get_portfolio("Main").update_prices({"AAPL": 151.0})
+    assert not portfolio_store.changed_by_others("alice", since, "tab-1")
+    assert portfolio_store.changed_by_others("alice", since, "tab-2")
+    assert not portfolio_store.changed_by_others("alice", portfolio_store.version("alice"), "tab-2")
@@ -0,0 +1,56 @@
+# tests/test_portfolio_valuation.py
+import numpy as np
+
+from portfolio import Portfolio
+from stock import Stock
+
+
+def _naive(portfolio):
+    return {s: h.quantity * h.stock.price for s, h in portfolio.stocks.items()}
+
+
+def test_columns_follow_random_adds_removes_and_repricing():
+    rng = np.random.default_rng(7)
+    portfolio = Portfolio("Main")
+    universe = [f"S{i}" for i in range(40)]  # more than the initial row capacity
+    for step in range(2000):
+        symbol = universe[rng.integers(len(universe))]
+        held = portfolio.get_stock_quantity(symbol)
+        if held and rng.random() < 0.45:
+            portfolio.remove_stock(Stock(symbol, symbol, 0.0), int(rng.integers(1, held + 1)))
+        elif rng.random() < 0.1:
+            portfolio.update_prices({symbol: float(rng.uniform(1, 500))})
+        else:
+            portfolio.add_stock(Stock(symbol, symbol, float(rng.uniform(1, 500))), int(rng.integers(1, 50)))
+
+        if step % 50 == 0:
+            expected = _naive(portfolio)
+            assert sorted(portfolio.symbols()) == sorted(expected)
+            values = dict(zip(portfolio.symbols(), portfolio.position_values().tolist()))
+            assert values == expected
+            assert np.isclose(portfolio.calculate_portfolio_value(), sum(expected.values()))
+
+
+def test_weights_top_holdings_and_value_at():
+    portfolio = Portfolio("Main")
+    for symbol, quantity, price in (("AAPL", 10, 100.0), ("MSFT", 1, 300.0), ("KO", 4, 60.0)):
+        portfolio.add_stock(Stock(symbol, symbol, price), quantity)
+
+    weights = dict(zip(portfolio.symbols(), portfolio.weights().tolist()))
+    assert np.isclose(weights["AAPL"], 1000 / 1540) and np.isclose(sum(weights.values()), 1.0)
+    assert portfolio.top_holdings(2) == [("AAPL", 1000.0), ("MSFT", 300.0)]
+    assert portfolio.top_holdings(0) == []
+    assert portfolio.value_at({"KO": 70.0, "UNHELD": 1.0}) == 1580.0
+    assert portfolio.calculate_portfolio_value() == 1540.0  # value_at leaves prices alone
+    assert Portfolio("Empty").weights().tolist() == []
+
+
+def test_a_copy_is_independent():
+    portfolio = Portfolio("Main")
+    portfolio.add_stock(Stock("AAPL", "AAPL", 100.0), 10)
+    clone = portfolio.copy()
+    clone.add_stock(Stock("AAPL", "AAPL", 100.0), 5)
+    clone.update_prices({"AAPL": 110.0})
+    assert portfolio.calculate_portfolio_value() == 1000.0
+    assert portfolio.stocks["AAPL"].stock.price == 100.0
+    assert clone.calculate_portfolio_value() == 1650.0
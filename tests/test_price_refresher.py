@@ -0,0 +1,54 @@
+# tests/test_price_refresher.py
+import pandas as pd
+
+import market_fetch
+import portfolio_store
+import price_refresher
+from stock import Stock
+
+
+def test_a_pass_prices_every_held_symbol_and_reprices_loaded_portfolios(db, monkeypatch):
+    with portfolio_store.edit("alice") as draft:
+        draft.add_portfolio("Main")
+        draft.get_portfolio("Main").add_stock(Stock("AAPL", "AAPL", 100.0), 10)
+        db.save_portfolio(draft.get_portfolio("Main"), "alice")
+        draft.add_portfolio("Unsaved")
+        draft.get_portfolio("Unsaved").add_stock(Stock("MSFT", "MSFT", 300.0), 1)
+    since = portfolio_store.version("alice")
+
+    requested = []
+
+    def fetch_histories(symbols, period, interval):
+        requested.append(list(symbols))
+        closes = {"AAPL": [100.0, 110.0], "MSFT": [310.0]}
+        return {s: pd.DataFrame({'Close': closes[s]}) for s in symbols if s in closes}
+
+    monkeypatch.setattr(market_fetch, "fetch_histories", fetch_histories)
+    stats = price_refresher.refresh_once()
+    assert requested == [["AAPL", "MSFT"]]
+    assert stats['symbols'] == 2 and stats['priced'] == 2 and stats['portfolios'] == 2
+
+    assert db.load_quotes(["AAPL"])["AAPL"]["price"] == 110.0
+    assert db.load_quotes(["AAPL"])["AAPL"]["previous_close"] == 100.0
+    assert db.load_quotes(["MSFT"])["MSFT"]["previous_close"] is None
+    manager = portfolio_store.get_manager("alice")
+    assert manager.portfolios["Main"].calculate_portfolio_value() == 1100.0
+    assert manager.aggregates.total_value == 1100.0 + 310.0
+    # Re-pricing is not reported to sessions as a change made elsewhere
+    assert not portfolio_store.changed_by_others("alice", since, "tab-1")
+
+    # Unchanged prices publish nothing
+    version = portfolio_store.version("alice")
+    assert price_refresher.refresh_once()['portfolios'] == 0
+    assert portfolio_store.version("alice") == version
+
+
+def test_the_thread_is_started_once_and_can_be_disabled(db, monkeypatch):
+    monkeypatch.setattr(market_fetch, "fetch_histories", lambda symbols, period, interval: {})
+    assert price_refresher.start(0) is None
+    thread = price_refresher.start(3600)
+    try:
+        assert price_refresher.start(3600) is thread and price_refresher.status()['running']
+    finally:
+        price_refresher.stop(5)
+    assert not thread.is_alive() and not price_refresher.status()['running']
@@ -0,0 +1,68 @@
+# tests/test_providers.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import providers
+
+NOW = providers._parse_now("2025-03-14T21:00")  # a Friday, after the close
+
+
+def test_synthetic_bars_are_reproducible_and_window_independent():
+    provider = providers.SyntheticProvider(seed=1, now=NOW)
+    month = provider.history(["AAPL", "MSFT"], interval="1d", period="1mo")
+    week = providers.SyntheticProvider(seed=1, now=NOW).history(["AAPL"], interval="1d", period="5d")["AAPL"]
+
+    assert len(week) == 5 and week.index.dayofweek.tolist() == [0, 1, 2, 3, 4]
+    pd.testing.assert_frame_equal(week, month["AAPL"].loc[week.index])
+    assert (month["AAPL"].index.dayofweek < 5).all()
+    assert not np.allclose(month["AAPL"]["Close"], month["MSFT"]["Close"])
+
+    # A later clock only appends bars
+    later = providers.SyntheticProvider(seed=1, now=NOW + 7 * 86400).history(["AAPL"], period="1mo")["AAPL"]
+    pd.testing.assert_frame_equal(later.loc[week.index], week)
+
+    other_seed = providers.SyntheticProvider(seed=2, now=NOW).history(["AAPL"], period="5d")["AAPL"]
+    assert not np.allclose(other_seed["Close"], week["Close"])
+
+
+@pytest.mark.parametrize("interval", ["1d", "1h", "1wk"])
+def test_synthetic_bars_are_well_formed(interval):
+    frame = providers.SyntheticProvider(now=NOW).history(["KO"], interval=interval, period="3mo")["KO"]
+    assert list(frame.columns) == ["Open", "High", "Low", "Close", "Volume"]
+    assert str(frame.index.tz) == providers.EXCHANGE_TZ and frame.index.is_monotonic_increasing
+    assert (frame["High"] >= frame[["Open", "Close"]].max(axis=1)).all()
+    assert (frame["Low"] <= frame[["Open", "Close"]].min(axis=1)).all()
+    assert (frame["Low"] > 0).all() and (frame["Volume"] > 0).all()
+
+
+def test_replay_serves_what_was_recorded(tmp_path):
+    source = providers.SyntheticProvider(seed=3, now=NOW)
+    assert providers.record(source, ["AAPL", "BRK/B"], str(tmp_path), period="3mo") == 2
+
+    replay = providers.ReplayProvider(str(tmp_path), now=NOW)
+    histories = replay.history(["AAPL", "BRK/B", "MISSING"], interval="1d", period="1mo")
+    expected = source.history(["AAPL"], interval="1d", period="1mo")["AAPL"]
+    assert np.allclose(histories["AAPL"]["Close"], expected["Close"])
+    assert histories["AAPL"].index.equals(expected.index)
+    assert not histories["BRK/B"].empty and histories["MISSING"].empty
+    assert replay.last_price("AAPL") == pytest.approx(expected["Close"].iloc[-1])
+
+
+def test_the_provider_is_chosen_by_environment(monkeypatch):
+    monkeypatch.setenv("MARKET_DATA_PROVIDER", "synthetic")
+    monkeypatch.setenv("MARKET_DATA_SEED", "7")
+    monkeypatch.setenv("MARKET_DATA_NOW", "2025-03-14")
+    provider = providers.from_env()
+    assert isinstance(provider, providers.SyntheticProvider)
+    assert provider.seed == 7 and provider.now == pd.Timestamp("2025-03-14", tz="UTC").timestamp()
+
+    monkeypatch.setenv("MARKET_DATA_PROVIDER", "carrier-pigeon")
+    with pytest.raises(ValueError, match="Unknown MARKET_DATA_PROVIDER 'carrier-pigeon'"):
+        providers.from_env()
+
+    previous = providers.use(provider)
+    try:
+        assert providers.get() is provider
+    finally:
+        providers.use(previous)
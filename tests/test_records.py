@@ -0,0 +1,30 @@
+# tests/test_records.py
+import pytest
+
+from portfolio import Holding, Portfolio
+from stock import Stock
+
+
+def test_stock_and_holding_are_slotted():
+    stock = Stock("AAPL", "Apple Inc.", 150.0)
+    holding = Holding(stock, 10)
+    for record in (stock, holding):
+        assert not hasattr(record, "__dict__")
+        with pytest.raises(AttributeError):
+            record.note = "no per-instance dict"
+
+
+def test_holdings_keep_their_dict_shape():
+    portfolio = Portfolio("Main")
+    portfolio.add_stock(Stock("AAPL", "Apple Inc.", 150.0), 10)
+    holding = portfolio.stocks["AAPL"]
+
+    assert holding["stock"].name == "Apple Inc." and holding["quantity"] == 10
+    assert "quantity" in holding and "row" not in holding
+    assert holding.get("missing", 0) == 0 and holding.keys() == ["stock", "quantity"]
+    holding["quantity"] = 12
+    assert holding.quantity == 12
+    with pytest.raises(KeyError):
+        holding["_row"]
+    with pytest.raises(KeyError):
+        holding["price"] = 1.0
@@ -0,0 +1,52 @@
+# tests/test_save_portfolio.py
+import database
+from portfolio import Portfolio
+from stock import Stock
+
+
+def _rows(name="Main"):
+    with database._pool().connection() as conn:
+        return {symbol: (row_id, quantity, price) for row_id, symbol, quantity, price in conn.execute(
+            'SELECT h.id, h.symbol, h.quantity, h.price FROM holdings h '
+            'JOIN portfolios p ON p.id = h.portfolio_id WHERE p.name = ?', (name,))}
+
+
+def _portfolio():
+    portfolio = Portfolio("Main")
+    for symbol, price in (("AAPL", 150.0), ("MSFT", 300.0), ("KO", 60.0)):
+        portfolio.add_stock(Stock(symbol, symbol, price), 10)
+    return portfolio
+
+
+def test_later_saves_write_only_the_changed_holdings(db):
+    portfolio = _portfolio()
+    database.save_portfolio(portfolio, "alice")
+    before = _rows()
+
+    portfolio.add_stock(Stock("AAPL", "AAPL", 150.0), 5)
+    portfolio.remove_stock(Stock("KO", "KO", 60.0), 10)
+    portfolio.add_stock(Stock("NVDA", "NVDA", 900.0), 1)
+    assert portfolio.changed_symbols() == {"AAPL", "KO", "NVDA"}
+    database.save_portfolio(portfolio, "alice")
+
+    after = _rows()
+    assert after["MSFT"] == before["MSFT"]
+    assert after["AAPL"] == (before["AAPL"][0], 15, 150.0)  # updated in place
+    assert "KO" not in after and after["NVDA"][1:] == (1, 900.0)
+    assert not portfolio.changed_symbols()
+
+
+def test_an_unchanged_portfolio_is_not_written(db):
+    portfolio = _portfolio()
+    database.save_portfolio(portfolio, "alice")
+    acquired = database.pool_metrics()["acquired"]
+    database.save_portfolio(portfolio, "alice")
+    assert database.pool_metrics()["acquired"] == acquired
+
+
+def test_a_portfolio_synced_elsewhere_is_written_in_full(db):
+    portfolio = _portfolio()
+    database.save_portfolio(portfolio, "alice")
+    database.save_portfolio(portfolio, "bob")  # different storage key: full rewrite
+    bob = {p.name: p for p in database.load_portfolios("bob")}["Main"]
+    assert {s: h.quantity for s, h in bob.stocks.items()} == {"AAPL": 10, "MSFT": 10, "KO": 10}
@@ -0,0 +1,53 @@
+# tests/test_symbols.py
+import pytest
+
+import symbols
+import utils
+
+
+@pytest.fixture
+def prices(monkeypatch):
+    """Provider prices by symbol; lookups are counted"""
+    quotes = {"ZZZZ": 12.5}
+    calls = []
+
+    def fetch(symbol):
+        calls.append(symbol)
+        return quotes.get(symbol)
+
+    monkeypatch.setattr(utils, "fetch_stock_price", fetch)
+    monkeypatch.setattr(symbols, "_resolved", {})
+    return calls
+
+
+def test_listed_symbols_need_no_lookup(prices):
+    assert symbols.validate(" aapl ") == "AAPL"
+    assert prices == []
+
+
+def test_unlisted_symbols_are_rejected_without_a_lookup_by_default(prices):
+    with pytest.raises(ValueError, match="Unknown symbol 'ZZZZ'"):
+        symbols.validate("zzzz")
+    assert symbols.split_known("AAPL, zzzz") == (["AAPL"], ["ZZZZ"])
+    assert prices == []
+
+
+def test_unlisted_symbol_the_provider_prices_is_accepted_once_looked_up(prices, monkeypatch):
+    monkeypatch.setattr(symbols, "ALLOW_UNLISTED", True)
+    assert not symbols.is_known("ZZZZ")
+    assert symbols.validate("zzzz") == "ZZZZ"
+    assert symbols.split_known("AAPL, zzzz") == (["AAPL", "ZZZZ"], [])
+    assert prices == ["ZZZZ"]
+
+
+def test_unpriced_symbol_is_rejected_with_suggestions(prices, monkeypatch):
+    monkeypatch.setattr(symbols, "ALLOW_UNLISTED", True)
+    with pytest.raises(ValueError, match="Did you mean"):
+        symbols.validate("AAPLX")
+    assert symbols.split_known("AAPLX, not a ticker") == ([], ["AAPLX", "NOT A TICKER"])
+    assert prices == ["AAPLX"]
+
+
+def test_search_matches_symbol_then_name_prefix():
+    assert symbols.search("AAP", 3)[0]['symbol'] == "AAPL"
+    assert "AAPL" in [row['symbol'] for row in symbols.search("apple", 5)]
@@ -0,0 +1,25 @@
+# tests/test_utils.py
+import pandas as pd
+
+import database
+import history_store
+import market_cache
+import utils
+
+
+def test_price_comes_from_quotes_then_cached_history(db, monkeypatch):
+    calls = []
+
+    def get_frames(symbols, period, interval):
+        calls.append((tuple(symbols), period, interval))
+        return {s: pd.DataFrame({'Close': [10.0, 11.0, float('nan')]}) for s in symbols}
+
+    monkeypatch.setattr(history_store, "get_frames", get_frames)
+    monkeypatch.setattr(market_cache, "cache", market_cache.MarketDataCache())
+    database.save_quotes({"AAPL": (200.0, 195.0)}, "2026-10-18T00:00:00")
+
+    assert utils.fetch_stock_price("AAPL") == 200.0
+    assert calls == []
+    assert utils.fetch_stock_price("ZZZZ") == 11.0
+    assert utils.fetch_stock_price("ZZZZ") == 11.0
+    assert calls == [(("ZZZZ",), "5d", "1d")]
@@ -0,0 +1,70 @@
+# tests/test_valuation.py
+import numpy as np
+import pytest
+
+import database
+import history_store
+import valuation
+from portfolio import Portfolio
+from stock import Stock
+
+DAY = history_store.DAY
+START = 1_735_776_000  # 2025-01-02 00:00 UTC
+
+
+def _bars(days, closes):
+    bars = np.zeros(len(days), dtype=history_store.BAR_DTYPE)
+    bars['ts'] = [START + d * DAY for d in days]
+    bars['close'] = closes
+    return bars
+
+
+@pytest.fixture
+def market(monkeypatch):
+    bars = {"AAPL": _bars(range(5), [10.0, 11.0, 12.0, 13.0, 14.0]),
+            "SAP.DE": _bars([1, 2, 4], [100.0, 101.0, 102.0])}  # a different calendar
+    # SAP.DE was bought during the bar of day 2, after the AAPL position was opened
+    trades = [(1, "SAP.DE", "buy", 1, "2025-01-04 15:00:00.000000")]
+    monkeypatch.setattr(history_store, "refresh", lambda symbols, period, interval: {"AAPL": "America/New_York"})
+    monkeypatch.setattr(history_store, "read_array", lambda symbol, interval: bars[symbol])
+    monkeypatch.setattr(database, "trade_log",
+                        lambda user, name, after_id=0: [row for row in trades if row[0] > after_id])
+    monkeypatch.setattr(valuation, "_series", type(valuation._series)())
+    return bars, trades
+
+
+def _portfolio():
+    portfolio = Portfolio("Main")
+    portfolio.add_stock(Stock("AAPL", "AAPL", 14.0), 2)
+    portfolio.add_stock(Stock("SAP.DE", "SAP.DE", 102.0), 1)
+    return portfolio
+
+
+def test_positions_count_from_their_trade_on_an_aligned_timeline(market):
+    series = valuation.value_series("alice", _portfolio())
+    assert series.tolist() == [20.0, 22.0, 125.0, 127.0, 130.0]  # SAP.DE carried into day 3
+    assert str(series.index.tz) == "America/New_York" and series.name == "Main"
+
+
+def test_new_bars_and_trades_extend_the_cached_series(market):
+    bars, trades = market
+    portfolio = _portfolio()
+    valuation.value_series("alice", portfolio)
+
+    bars["AAPL"] = np.concatenate([bars["AAPL"], _bars([5], [15.0])])
+    trades.append((2, "AAPL", "buy", 1, "2025-01-07 15:00:00.000000"))
+    portfolio.add_stock(Stock("AAPL", "AAPL", 15.0), 1)
+    extended = valuation.value_series("alice", portfolio)
+    assert extended.tolist() == [20.0, 22.0, 125.0, 127.0, 130.0, 147.0]
+
+    valuation.invalidate("alice")
+    assert valuation.value_series("alice", portfolio).tolist() == extended.tolist()
+
+
+def test_close_asof_forward_fills_and_is_nan_before_the_first_bar():
+    series = _bars([1, 3], [5.0, 7.0])
+    timeline = START + np.array([0, 1, 2, 3, 4]) * DAY
+    closes = valuation.close_asof(series, timeline)
+    assert np.isnan(closes[0]) and closes[1:].tolist() == [5.0, 5.0, 7.0, 7.0]
+    assert valuation.union_timeline({"A": series, "B": _bars([0, 3], [1.0, 1.0])},
+                                    start=START + DAY).tolist() == [START + DAY, START + 3 * DAY]
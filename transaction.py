@@ -1,5 +1,6 @@
 # transaction.py
 
+import symbols
 from stock import Stock
 
 class Transaction:
@@ -19,15 +20,17 @@ class Transaction:
             self.execute_sell(portfolio)
 
     def execute_buy(self, portfolio):
-        stock = Stock(self.symbol, "Dummy Stock", self.price)
+        stock = Stock(self.symbol, symbols.name_for(self.symbol), self.price)
         portfolio.add_stock(stock, self.quantity)
+        portfolio.record_trade(self.symbol, 'buy', self.quantity, self.price)
 
     def execute_sell(self, portfolio):
         if portfolio.has_stock(self.symbol):
             current_quantity = portfolio.get_stock_quantity(self.symbol)
             if current_quantity >= self.quantity:
-                stock = Stock(self.symbol, "Dummy Stock", self.price)
+                stock = Stock(self.symbol, symbols.name_for(self.symbol), self.price)
                 portfolio.remove_stock(stock, self.quantity)
+                portfolio.record_trade(self.symbol, 'sell', self.quantity, self.price)
             else:
                 raise ValueError(f"Not enough shares of {self.symbol} to sell. Available: {current_quantity}, Requested: {self.quantity}")
         else:
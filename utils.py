@@ -1,9 +1,21 @@
 # utils.py
 
-# Example of a utility function
 def fetch_stock_price(symbol):
-    # Placeholder function to fetch stock price from an API
-    # Replace with actual implementation using APIs like Alpha Vantage, Yahoo Finance, etc.
-    # Returns a dummy price for demonstration purposes
-    import random
-    return random.uniform(50, 200)
+    """Latest price for a symbol, or None if it can't be priced.
+
+    The shared quote written by price_refresher is used when there is one,
+    otherwise the last close of the symbol's recent daily history, read
+    through market_cache (so repeated lookups within its TTL, and concurrent
+    ones, share a single batched, retried market_fetch call).
+    """
+    import database
+    import market_cache
+
+    quote = database.load_quotes([symbol]).get(symbol)
+    if quote is not None:
+        return quote['price']
+    frame = market_cache.get_history(symbol, period="5d", interval="1d")
+    if frame is None or frame.empty or 'Close' not in frame.columns:
+        return None
+    closes = frame['Close'].dropna()
+    return float(closes.iloc[-1]) if not closes.empty else None
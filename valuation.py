@@ -0,0 +1,182 @@
+# valuation.py
+"""
+Historical portfolio value series.
+
+A portfolio's value at a point in time is the sum over its symbols of the
+quantity held then times the last close at or before it. It is evaluated on
+the union of every symbol's bar timestamps (from history_store). Closes are
+looked up as of each timestamp with a binary search, which forward-fills
+them, so symbols on different trading calendars line up. Quantities follow
+the trade ledger, so a position counts only from the bar in which it was
+bought. Holdings that predate the ledger count over the whole history.
+
+Series are cached per (user, portfolio, interval). When a later call only
+finds new bars or new trades, just the affected tail of the series is
+recomputed and appended to the cached one.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import history_store
+
+MAX_ENTRIES = 128
+
+_lock = threading.Lock()
+_series = OrderedDict()  # (user, portfolio name, interval) -> _Entry
+
+
+class _Entry:
+    """A cached value series and what it was computed from"""
+    __slots__ = ('ts', 'values', 'base', 'marks', 'trades', 'last_txn')
+
+    def __init__(self):
+        self.ts = np.empty(0, dtype='i8')
+        self.values = np.empty(0)
+        self.base = {}      # symbol -> quantity held before the first ledger trade
+        self.marks = {}     # symbol -> (first bar ts, last bar ts) at computation
+        self.trades = {}    # symbol -> (trade times, cumulative signed quantity), time-sorted
+        self.last_txn = 0   # highest ledger id included in trades
+
+
+def _merge_trades(trades, rows):
+    """Fold new ledger rows into {symbol: (times, cumulative quantity)}; returns
+    the time of the earliest new trade (or None)"""
+    if not rows:
+        return None
+    _, symbols, sides, quantities, stamps = zip(*rows)
+    times = np.array(stamps, dtype='datetime64[us]').astype('i8') // 1_000_000
+    signed = np.where(np.array(sides) == 'buy', 1.0, -1.0) * np.array(quantities, dtype=float)
+    symbols = np.array(symbols)
+    for symbol in np.unique(symbols).tolist():
+        mask = symbols == symbol
+        new_t, new_q = times[mask], signed[mask]
+        if symbol in trades:
+            old_t, old_cum = trades[symbol]
+            old_q = np.diff(old_cum, prepend=0.0)
+            new_t, new_q = np.concatenate([old_t, new_t]), np.concatenate([old_q, new_q])
+        order = np.argsort(new_t, kind='stable')
+        trades[symbol] = (new_t[order], np.cumsum(new_q[order]))
+    return int(times.min())
+
+
+def close_asof(series, timeline):
+    """Each timestamp's last close at or before it (NaN before the first bar)"""
+    idx = np.searchsorted(series['ts'], timeline, side='right') - 1
+    return np.where(idx >= 0, np.asarray(series['close'])[np.maximum(idx, 0)], np.nan)
+
+
+def _evaluate(base, trades, bars, timeline, interval):
+    """Portfolio value on `timeline` (epoch seconds) of the symbols in bars,
+    and a mask of the timestamps where a held symbol has no close yet"""
+    # A trade counts from the bar it happened in, i.e. trades before the bar's end
+    bar_end = timeline + history_store.INTERVAL_SECONDS.get(interval, history_store.DAY)
+    value = np.zeros(len(timeline))
+    missing = np.zeros(len(timeline), dtype=bool)
+    for symbol in bars:
+        quantity = np.full(len(timeline), float(base.get(symbol, 0)))
+        if symbol in trades:
+            times, cumulative = trades[symbol]
+            idx = np.searchsorted(times, bar_end, side='left') - 1
+            quantity += np.where(idx >= 0, cumulative[np.maximum(idx, 0)], 0.0)
+
+        close = close_asof(bars[symbol], timeline)
+
+        held = quantity > 1e-9
+        missing |= held & np.isnan(close)
+        value += np.where(held, quantity * np.nan_to_num(close), 0.0)
+    return value, missing
+
+
+def union_timeline(bars, start=None):
+    """Union of the symbols' bar timestamps (at or after start), sorted"""
+    parts = []
+    for series in bars.values():
+        ts = np.asarray(series['ts'])
+        if start is not None:
+            ts = ts[np.searchsorted(ts, start, side='left'):]
+        parts.append(ts)
+    return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype='i8')
+
+
+def value_series(username, portfolio, period="1mo", interval="1d"):
+    """The portfolio's value over `period` as a pandas Series on a tz-aware index"""
+    import pandas as pd
+    import database
+
+    key = (username, portfolio.name, interval)
+    with _lock:
+        cached = _series.get(key)
+
+    entry = _Entry()
+    if cached is not None:
+        entry.trades = dict(cached.trades)
+        entry.last_txn = cached.last_txn
+    rows = database.trade_log(username, portfolio.name, after_id=entry.last_txn)
+    first_new_trade = _merge_trades(entry.trades, rows)
+    if rows:
+        entry.last_txn = rows[-1][0]
+
+    held = {symbol: holding.quantity for symbol, holding in portfolio.stocks.items()}
+    symbols = sorted(set(held) | set(entry.trades))
+    entry.base = {
+        symbol: held.get(symbol, 0) - (entry.trades[symbol][1][-1] if symbol in entry.trades else 0.0)
+        for symbol in symbols
+    }
+
+    timezones = history_store.refresh(symbols, period, interval) if symbols else {}
+    bars = {symbol: history_store.read_array(symbol, interval) for symbol in symbols}
+    bars = {symbol: series for symbol, series in bars.items() if len(series)}
+    entry.marks = {symbol: (int(series['ts'][0]), int(series['ts'][-1])) for symbol, series in bars.items()}
+
+    # Recompute only the tail when nothing before it can have changed: same
+    # symbols, same pre-ledger holdings, no older bars backfilled. The last
+    # bar of each symbol may have been revised, and new trades move the
+    # quantities from their bar on.
+    start = None
+    if cached is not None and cached.base == entry.base and \
+            {s: m[0] for s, m in cached.marks.items()} == {s: m[0] for s, m in entry.marks.items()}:
+        cuts = [mark[1] for mark in cached.marks.values()]
+        if first_new_trade is not None:
+            cuts.append(first_new_trade - history_store.INTERVAL_SECONDS.get(interval, history_store.DAY))
+        start = min(cuts) if cuts else None
+
+    timeline = union_timeline(bars, start)
+    values, missing = _evaluate(entry.base, entry.trades, bars, timeline, interval)
+    timeline, values = timeline[~missing], values[~missing]
+    if start is not None:
+        keep = np.searchsorted(cached.ts, start, side='left')
+        entry.ts = np.concatenate([cached.ts[:keep], timeline])
+        entry.values = np.concatenate([cached.values[:keep], values])
+    else:
+        entry.ts, entry.values = timeline, values
+
+    with _lock:
+        _series[key] = entry
+        _series.move_to_end(key)
+        while len(_series) > MAX_ENTRIES:
+            _series.popitem(last=False)
+
+    ts, values = entry.ts, entry.values
+    span = history_store.PERIOD_SECONDS.get(period)
+    if period == "ytd":
+        first = np.searchsorted(ts, history_store.period_start(period, time.time()), side='left')
+        ts, values = ts[first:], values[first:]
+    elif span is not None and len(ts):
+        first = np.searchsorted(ts, ts[-1] - span, side='left')
+        ts, values = ts[first:], values[first:]
+
+    index = pd.to_datetime(ts, unit='s', utc=True)
+    tz = next((tz for tz in map(timezones.get, symbols) if tz), None)
+    if tz:
+        index = index.tz_convert(tz)
+    return pd.Series(values, index=index, name=portfolio.name)
+
+
+def invalidate(username=None):
+    """Drop cached series (all of them, or one user's)"""
+    with _lock:
+        for key in [k for k in _series if username is None or k[0] == username]:
+            del _series[key]
@@ -3,136 +3,172 @@ Portfolio Manager Web Application using FastAPI
 Converts the Streamlit portfolio application to run on localhost
 """
 from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import uvicorn
-import json
-import os
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from pathlib import Path
-from typing import Optional
-from datetime import datetime
+from typing import List, Literal
 
 # Import the existing portfolio management logic
-from portfolio import PortfolioManager
-from transaction import Transaction
-from report import ReportGenerator
 import database
-import yfinance as yf
-import pandas as pd
-import plotly
-import plotly.express as px
-import plotly.graph_objects as go
+import market_cache
+import portfolio_store
+import chart_cache
+import live_feed
+import symbols
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_USER = "default"
+USER_COOKIE = "portfolio_user"
+# Most legs accepted in one /api/portfolios/{name}/transactions request
+MAX_BATCH_LEGS = 5000
 
 # Create FastAPI application
 app = FastAPI(title="Portfolio Manager", description="Advanced Portfolio Management Platform")
 
-# Mount static files directory
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static files directory (optional; the templates load assets from CDNs)
+if (BASE_DIR / "static").is_dir():
+    app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
 
 # Set up Jinja2 templates
-templates = Jinja2Templates(directory="templates")
-
-# Global state
-portfolio_manager = None
-report_generator = None
-current_user = "default"
-
-def init_app():
-    """Initialize the application and load data"""
-    global portfolio_manager, report_generator
-
-    # Initialize database
-    database.init_database()
+templates = Jinja2Templates(directory=BASE_DIR / "templates")
+
+# Handlers are async but never block the event loop: database access, market
+# data and chart building run in the threadpool. Portfolio state lives in
+# portfolio_store, shared with the Streamlit app and resolved per request.
+
+@app.on_event("startup")
+def start_price_refresher():
+    """Keep held symbols marked to market while the API is up (see price_refresher)"""
+    import price_refresher
+    price_refresher.start()
+
+def resolve_user(request: Request) -> str:
+    """The profile a request acts for: ?user=..., then the profile cookie, then the default"""
+    user = request.query_params.get("user") or request.cookies.get(USER_COOKIE) or DEFAULT_USER
+    return user.strip() or DEFAULT_USER
+
+def remember_user(request: Request, response):
+    # A ?user= switch sticks for the following requests
+    if request.query_params.get("user"):
+        response.set_cookie(USER_COOKIE, resolve_user(request), httponly=True, samesite="lax")
+    return response
+
+def build_dashboard(pm):
+    """Summary numbers, per-portfolio rows and charts for the home page"""
+    # All of these are read from the precomputed aggregates (aggregates.py)
+    aggregates = pm.aggregates
+    portfolio_data = aggregates.portfolio_rows()
+    return {
+        "total_portfolios": len(portfolio_data),
+        "total_positions": aggregates.total_positions,
+        "total_value": aggregates.total_value,
+        "portfolio_data": portfolio_data,
+        "charts": generate_charts(portfolio_data, aggregates.top_holdings(10))
+    }
 
-    # Initialize portfolio manager
-    portfolio_manager = PortfolioManager()
-    portfolio_manager.set_user(current_user)
-    portfolio_manager.load_portfolios(current_user)
+def cached_dashboard(user):
+    """build_dashboard for a user, served from chart_cache until their holdings change"""
+    # Read the version before the portfolios: a publish in between can then
+    # only store newer content under the older key, never the reverse.
+    version = portfolio_store.version(user)
+    pm = portfolio_store.get_manager(user)
+    return chart_cache.get(("dashboard", user, version), lambda: build_dashboard(pm))
 
-    report_generator = ReportGenerator(portfolio_manager)
+def list_portfolios(pm):
+    portfolios_data = []
+    for name, portfolio in pm.portfolios.items():
+        portfolios_data.append({
+            'name': name,
+            'value': portfolio.calculate_portfolio_value(),
+            'stocks_count': len(portfolio.stocks),
+            'stocks': [{'symbol': s.symbol, 'name': s.name, 'quantity': qty, 'price': s.price, 'value': s.price * qty}
+                      for (symbol, data) in portfolio.stocks.items()
+                      for (s, qty) in [(data['stock'], data['quantity'])] if s.symbol and s.symbol.strip()]
+        })
+    return portfolios_data
+
+def create_portfolio(user, name):
+    # Writes are serialized per portfolio by portfolio_store
+    with portfolio_store.edit(user, portfolios=name) as draft:
+        draft.add_portfolio(name)
+        portfolio = draft.get_portfolio(name)
+        if portfolio:
+            database.save_portfolio(portfolio, user)
+
+class TradeLeg(BaseModel):
+    symbol: str = Field(min_length=1, max_length=15)
+    action: Literal["buy", "sell"]
+    quantity: int = Field(gt=0)
+    price: float = Field(ge=0)
+
+class TradeBatch(BaseModel):
+    transactions: List[TradeLeg] = Field(min_length=1, max_length=MAX_BATCH_LEGS)
+
+def execute_batch(user, portfolio_name, legs):
+    """Apply a batch of trade legs to one portfolio and save it once; None if
+    the portfolio doesn't exist. Raises ValueError (nothing applied) if any
+    leg is invalid."""
+    from transaction import Transaction
+    transactions = [Transaction(leg.symbol.strip().upper(), leg.action, leg.quantity, leg.price) for leg in legs]
+    with portfolio_store.edit(user, portfolios=portfolio_name) as draft:
+        portfolio = draft.get_portfolio(portfolio_name)
+        if portfolio is None:
+            return None
+        draft.process_batch(portfolio_name, transactions)
+        database.save_portfolio(portfolio, user)
+    return {
+        "portfolio": portfolio_name,
+        "executed": len(transactions),
+        "value": portfolio.calculate_portfolio_value(),
+        "positions": len(portfolio.stocks),
+    }
 
-    return portfolio_manager, report_generator
+def add_stock_to(user, portfolio_name, symbol, quantity):
+    """Buy at the market price; None if the portfolio is missing, False if the symbol can't be priced"""
+    from utils import fetch_stock_price
+    # Priced once, outside the edit, and that price is the one traded at
+    price = fetch_stock_price(symbol)
+    with portfolio_store.edit(user, portfolios=portfolio_name) as draft:
+        if draft.get_portfolio(portfolio_name) is None:
+            return None
+        if price is None or not draft.add_stock_to_portfolio(portfolio_name, symbol, quantity, price):
+            return False
+        database.save_portfolio(draft.get_portfolio(portfolio_name), user)
+    return True
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Main dashboard/home page"""
-    global portfolio_manager, report_generator
-
-    if portfolio_manager is None:
-        portfolio_manager, report_generator = init_app()
-
-    # Get portfolio statistics
-    total_portfolios = len(portfolio_manager.portfolios)
-    total_positions = sum(len(p.stocks) for p in portfolio_manager.portfolios.values())
-    total_value = sum(p.calculate_portfolio_value() for p in portfolio_manager.portfolios.values())
-
-    # Get market data
-    market_data = get_market_data()
-
-    # Get portfolio data for charts
-    portfolio_data = []
-    all_stocks_data = []
-
-    for portfolio_name, portfolio in portfolio_manager.portfolios.items():
-        portfolio_value = portfolio.calculate_portfolio_value()
-        positions = len(portfolio.stocks)
-        portfolio_data.append({
-            'name': portfolio_name,
-            'value': portfolio_value,
-            'positions': positions
-        })
-
-        for symbol, stock_data in portfolio.stocks.items():
-            stock = stock_data['stock']
-            quantity = stock_data['quantity']
-            if stock.symbol and stock.symbol.strip():
-                value = stock.price * quantity
-                all_stocks_data.append({
-                    'portfolio': portfolio_name,
-                    'symbol': stock.symbol.upper(),
-                    'quantity': quantity,
-                    'price': stock.price,
-                    'value': value,
-                    'name': stock.name
-                })
-
-    # Generate charts
-    charts = generate_charts(portfolio_data, all_stocks_data)
-
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "total_portfolios": total_portfolios,
-        "total_positions": total_positions,
-        "total_value": total_value,
-        "current_user": current_user,
-        "portfolio_data": portfolio_data,
+    user = resolve_user(request)
+    dashboard = await run_in_threadpool(cached_dashboard, user)
+    market_data = await run_in_threadpool(get_market_data)
+    # The first call imports plotly, so it stays off the event loop too
+    plotly_js = await run_in_threadpool(chart_cache.plotly_js_url)
+
+    response = templates.TemplateResponse(request, "index.html", {
+        **dashboard,
+        "current_user": user,
         "market_data": market_data,
-        "charts": charts
+        "market_symbols": {name: symbol for symbol, name in market_cache.MARKET_INDICES.items()},
+        "plotly_js": plotly_js,
     })
+    return remember_user(request, response)
 
 @app.get("/portfolios", response_class=HTMLResponse)
 async def portfolios(request: Request):
     """Portfolios management page"""
-    if portfolio_manager is None:
-        portfolio_manager, report_generator = init_app()
+    user = resolve_user(request)
+    pm = await run_in_threadpool(portfolio_store.get_manager, user)
+    portfolios_data = await run_in_threadpool(list_portfolios, pm)
 
-    portfolios_data = []
-    for name, portfolio in portfolio_manager.portfolios.items():
-        portfolios_data.append({
-            'name': name,
-            'value': portfolio.calculate_portfolio_value(),
-            'stocks_count': len(portfolio.stocks),
-            'stocks': [{'symbol': s.symbol, 'name': s.name, 'quantity': qty, 'price': s.price, 'value': s.price * qty}
-                      for (symbol, data) in portfolio.stocks.items()
-                      for (s, qty) in [(data['stock'], data['quantity'])] if s.symbol and s.symbol.strip()]
-        })
-
-    return templates.TemplateResponse("portfolios.html", {
-        "request": request,
+    response = templates.TemplateResponse(request, "portfolios.html", {
         "portfolios": portfolios_data,
-        "current_user": current_user
+        "current_user": user
     })
+    return remember_user(request, response)
 
 @app.post("/add_portfolio")
 async def add_portfolio(request: Request, name: str = Form(...)):
@@ -140,14 +176,7 @@ async def add_portfolio(request: Request, name: str = Form(...)):
     if not name.strip():
         raise HTTPException(status_code=400, detail="Portfolio name is required")
 
-    if portfolio_manager is None:
-        portfolio_manager, report_generator = init_app()
-
-    portfolio_manager.add_portfolio(name.strip())
-    portfolio = portfolio_manager.get_portfolio(name.strip())
-    if portfolio:
-        database.save_portfolio(portfolio, current_user)
-
+    await run_in_threadpool(create_portfolio, resolve_user(request), name.strip())
     return RedirectResponse(url="/portfolios", status_code=303)
 
 @app.post("/add_stock")
@@ -158,47 +187,59 @@ async def add_stock(
     quantity: int = Form(...)
 ):
     """Add stock to portfolio"""
-    if portfolio_manager is None:
-        portfolio_manager, report_generator = init_app()
-
-    portfolio_manager.add_stock_to_portfolio(portfolio_name, symbol.strip().upper(), quantity)
-    portfolio = portfolio_manager.get_portfolio(portfolio_name)
-    if portfolio:
-        database.save_portfolio(portfolio, current_user)
-
+    if quantity <= 0:
+        raise HTTPException(status_code=400, detail="A symbol and a positive quantity are required")
+    # Checked against the symbol master before anything is priced (the
+    # provider is only asked with SYMBOL_ALLOW_UNLISTED, hence the threadpool)
+    try:
+        symbol = await run_in_threadpool(symbols.validate, symbol)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    added = await run_in_threadpool(add_stock_to, resolve_user(request), portfolio_name, symbol, quantity)
+    if added is None:
+        raise HTTPException(status_code=404, detail=f"Portfolio '{portfolio_name}' does not exist")
+    if not added:
+        raise HTTPException(status_code=400, detail=f"Could not fetch a price for {symbol}")
     return RedirectResponse(url="/portfolios", status_code=303)
 
+@app.get("/api/stream")
+async def stream(request: Request):
+    """Server-Sent Events: quote changes and live portfolio values, fanned out
+    from one shared poller (see live_feed)"""
+    events = live_feed.get().events(resolve_user(request), request.is_disconnected)
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/symbols")
+async def search_symbols(q: str = "", limit: int = 10):
+    """Symbol master rows matching a symbol or name prefix, for autocomplete"""
+    return {"results": symbols.search(q, max(1, min(limit, 50)))}
+
+@app.post("/api/portfolios/{portfolio_name}/transactions")
+async def post_transactions(request: Request, portfolio_name: str, batch: TradeBatch):
+    """Execute a batch of buy/sell legs (e.g. a rebalance) atomically, with one save"""
+    try:
+        result = await run_in_threadpool(execute_batch, resolve_user(request), portfolio_name, batch.transactions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Portfolio '{portfolio_name}' does not exist")
+    return result
+
 def get_market_data():
     """Get current market data for major indices"""
-    indices = {
-        "^GSPC": "S&P 500",
-        "^DJI": "Dow Jones",
-        "^IXIC": "NASDAQ",
-        "^VIX": "VIX"
-    }
+    try:
+        return market_cache.get_index_quotes()
+    except Exception:
+        return {}
+
+def generate_charts(portfolio_data, top_holdings):
+    """Generate charts for the dashboard; top_holdings is [(symbol, value)], largest first"""
+    # pandas/plotly are imported on first use so they stay out of app startup
+    import pandas as pd
+    import plotly.express as px
 
-    market_data = {}
-    for symbol, name in indices.items():
-        try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period="2d")
-            if not hist.empty:
-                current = hist['Close'].iloc[-1]
-                previous = hist['Close'].iloc[-2] if len(hist) > 1 else current
-                change = current - previous
-                change_pct = (change / previous * 100) if previous != 0 else 0
-                market_data[name] = {
-                    'current': float(current),
-                    'change': float(change),
-                    'change_pct': float(change_pct)
-                }
-        except:
-            continue
-
-    return market_data
-
-def generate_charts(portfolio_data, all_stocks_data):
-    """Generate charts for the dashboard"""
     charts = {}
 
     if portfolio_data:
@@ -218,7 +259,7 @@ def generate_charts(portfolio_data, all_stocks_data):
             font_color='white',
             showlegend=False
         )
-        charts['portfolio_values'] = json.dumps(fig_bar, cls=plotly.utils.PlotlyJSONEncoder)
+        charts['portfolio_values'] = chart_cache.figure_json(fig_bar)
 
         # Portfolio positions pie chart
         fig_pie = px.pie(
@@ -231,14 +272,10 @@ def generate_charts(portfolio_data, all_stocks_data):
             paper_bgcolor='rgba(0,0,0,0)',
             font_color='white'
         )
-        charts['portfolio_positions'] = json.dumps(fig_pie, cls=plotly.utils.PlotlyJSONEncoder)
-
-    if all_stocks_data:
-        df_stocks = pd.DataFrame(all_stocks_data)
+        charts['portfolio_positions'] = chart_cache.figure_json(fig_pie)
 
-        # Top holdings chart
-        stock_totals = df_stocks.groupby('symbol')['value'].sum().reset_index()
-        stock_totals = stock_totals.sort_values('value', ascending=False).head(10)
+    if top_holdings:
+        stock_totals = pd.DataFrame(top_holdings, columns=['symbol', 'value'])
 
         fig_holdings = px.bar(
             stock_totals,
@@ -254,9 +291,10 @@ def generate_charts(portfolio_data, all_stocks_data):
             font_color='white',
             showlegend=False
         )
-        charts['top_holdings'] = json.dumps(fig_holdings, cls=plotly.utils.PlotlyJSONEncoder)
+        charts['top_holdings'] = chart_cache.figure_json(fig_holdings)
 
     return charts
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8001)